@@ -0,0 +1 @@
+"""Offline benchmarks of the backend, run against local stand-ins of the LLM, search and paper providers."""
@@ -0,0 +1,185 @@
+"""Synthetic papers served by the stand-ins: text generated from a seed, rendered as PDF or HTML."""
+
+import random
+import textwrap
+from html import escape
+
+WORDS = (
+    "model training data attention layer transformer retrieval benchmark evaluation loss gradient "
+    "dataset accuracy baseline method results experiment architecture token embedding inference "
+    "latency throughput scaling parameter optimization regularization convergence analysis sample "
+    "distribution objective representation contrastive language vision agent reasoning search"
+).split()
+SECTIONS = [
+    "Abstract",
+    "Introduction",
+    "Related Work",
+    "Method",
+    "Experiments",
+    "Results",
+    "Discussion",
+    "Conclusion",
+]
+APPENDIX_SECTIONS = ["Additional Results", "Implementation Details"]
+VENUES = ["NeurIPS", "ICML", "ICLR", "ACL", "EMNLP", "CVPR", "arXiv preprint"]
+
+LINES_PER_PAGE = 60
+CHARS_PER_LINE = 95
+
+
+def _author(rng: random.Random) -> str:
+    return f"{rng.choice('ABCDEFGHJKLMNPRST')}. {rng.choice(WORDS).title()}"
+
+
+def _paragraphs(rng: random.Random, num_words: int) -> list[str]:
+    paragraphs = []
+    while num_words > 0:
+        length = min(num_words, rng.randint(80, 160))
+        sentence_words = [rng.choice(WORDS) for _ in range(length)]
+        for i in range(0, length, rng.randint(10, 20)):
+            sentence_words[i] = sentence_words[i].capitalize()
+        paragraphs.append(" ".join(sentence_words) + ".")
+        num_words -= length
+    return paragraphs
+
+
+def make_paper(seed: int | str, num_pages: int) -> dict:
+    """Generate the title, authors, sections, references and appendix of a paper, about `num_pages` pages long.
+
+    As in typical papers, the body takes about 70% of the pages, the references 10% and the appendix 20%.
+    """
+    rng = random.Random(seed)
+    title = " ".join(rng.choice(WORDS) for _ in range(6)).title()
+    authors = ", ".join(_author(rng) for _ in range(rng.randint(2, 5)))
+    num_words = num_pages * LINES_PER_PAGE * CHARS_PER_LINE // 12
+    sections = [
+        (name, _paragraphs(rng, int(num_words * 0.7) // len(SECTIONS)))
+        for name in SECTIONS
+    ]
+    references = [
+        f"{', '.join(_author(rng) for _ in range(rng.randint(1, 4)))}. "
+        f"{' '.join(rng.choice(WORDS) for _ in range(rng.randint(5, 10))).capitalize()}. "
+        f"In {rng.choice(VENUES)}, {rng.randint(2010, 2024)}."
+        for _ in range(max(int(num_words * 0.1) // 16, 3))
+    ]
+    appendix = [
+        (name, _paragraphs(rng, int(num_words * 0.2) // len(APPENDIX_SECTIONS)))
+        for name in APPENDIX_SECTIONS
+    ]
+    return {
+        "title": title,
+        "authors": authors,
+        "sections": sections,
+        "references": references,
+        "appendix": appendix,
+    }
+
+
+def paper_lines(paper: dict) -> list[str]:
+    lines = [paper["title"], paper["authors"], ""]
+    for i, (name, paragraphs) in enumerate(paper["sections"]):
+        lines.append(name if name == "Abstract" else f"{i} {name}")
+        for paragraph in paragraphs:
+            lines.extend(textwrap.wrap(paragraph, CHARS_PER_LINE))
+            lines.append("")
+    lines.append("References")
+    for i, reference in enumerate(paper["references"], start=1):
+        lines.extend(textwrap.wrap(f"[{i}] {reference}", CHARS_PER_LINE))
+    lines.extend(["", "Appendix"])
+    for letter, (name, paragraphs) in zip("ABCDEFGH", paper["appendix"]):
+        lines.append(f"{letter} {name}")
+        for paragraph in paragraphs:
+            lines.extend(textwrap.wrap(paragraph, CHARS_PER_LINE))
+            lines.append("")
+    return lines
+
+
+def _pdf_string(text: str) -> str:
+    return (
+        "(" + text.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)") + ")"
+    )
+
+
+def make_pdf(paper: dict) -> bytes:
+    """Render a paper as a PDF with one text stream per page, in Helvetica."""
+    lines = paper_lines(paper)
+    pages = [
+        lines[i : i + LINES_PER_PAGE] for i in range(0, len(lines), LINES_PER_PAGE)
+    ]
+
+    # Objects: 1 catalog, 2 pages, 3 font, then a page and its content per page
+    objects = [
+        b"<< /Type /Catalog /Pages 2 0 R >>",
+        None,
+        b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica /Encoding /WinAnsiEncoding >>",
+    ]
+    page_refs = []
+    for page in pages:
+        content = "BT /F1 9 Tf 12 TL 40 800 Td " + " ".join(
+            f"{_pdf_string(line)} '" for line in page
+        )
+        content += " ET"
+        stream = content.encode("latin-1", errors="replace")
+        page_number, content_number = len(objects) + 1, len(objects) + 2
+        page_refs.append(f"{page_number} 0 R")
+        objects.append(
+            f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 595 842] /Contents {content_number} 0 R "
+            "/Resources << /Font << /F1 3 0 R >> >> >>".encode()
+        )
+        objects.append(
+            f"<< /Length {len(stream)} >>\nstream\n".encode() + stream + b"\nendstream"
+        )
+    objects[1] = (
+        f"<< /Type /Pages /Kids [{' '.join(page_refs)}] /Count {len(pages)} >>".encode()
+    )
+
+    pdf = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for number, obj in enumerate(objects, start=1):
+        offsets.append(len(pdf))
+        pdf += f"{number} 0 obj\n".encode() + obj + b"\nendobj\n"
+    xref = len(pdf)
+    pdf += f"xref\n0 {len(objects) + 1}\n0000000000 65535 f \n".encode()
+    for offset in offsets:
+        pdf += f"{offset:010d} 00000 n \n".encode()
+    pdf += (
+        f"trailer\n<< /Size {len(objects) + 1} /Root 1 0 R >>\nstartxref\n{xref}\n%%EOF\n"
+    ).encode()
+    return bytes(pdf)
+
+
+def make_html(paper: dict) -> bytes:
+    """Render a paper as the HTML page of a publisher, with navigation, sidebar and footer around the article."""
+    nav = "".join(
+        f'<li><a href="/{word}">{word.title()}</a></li>' for word in WORDS[:12]
+    )
+    sections = "".join(
+        f"<section><h2>{escape(name)}</h2>"
+        + "".join(f"<p>{escape(paragraph)}</p>" for paragraph in paragraphs)
+        + "</section>"
+        for name, paragraphs in paper["sections"]
+    )
+    sections += (
+        '<section class="references"><h2>References</h2><ol>'
+        + "".join(f"<li>{escape(reference)}</li>" for reference in paper["references"])
+        + "</ol></section>"
+    )
+    sections += "".join(
+        f'<section class="appendix"><h2>{"ABCDEFGH"[i]} {escape(name)}</h2>'
+        + "".join(f"<p>{escape(paragraph)}</p>" for paragraph in paragraphs)
+        + "</section>"
+        for i, (name, paragraphs) in enumerate(paper["appendix"])
+    )
+    return (
+        "<!DOCTYPE html><html><head>"
+        f"<title>{escape(paper['title'])}</title>"
+        "<script>window.analytics = {track: function () {}};</script>"
+        "<style>body { font-family: serif; } nav li { display: inline; }</style>"
+        "</head><body>"
+        f"<header><nav><ul>{nav}</ul></nav></header>"
+        f"<main><article><h1>{escape(paper['title'])}</h1>"
+        f'<p class="authors">{escape(paper["authors"])}</p>{sections}</article></main>'
+        f"<aside><h3>Related articles</h3><ul>{nav}</ul></aside>"
+        "<footer><p>Copyright. All rights reserved. Privacy policy. Cookie settings.</p></footer>"
+        "</body></html>"
+    ).encode()
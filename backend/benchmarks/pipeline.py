@@ -0,0 +1,369 @@
+"""Micro-benchmarks of the stages of the paper pipeline, over the papers of `benchmarks/corpus`.
+
+Times each stage in isolation on each paper of the corpus, and measures its allocations and peak memory with
+tracemalloc: URL rewriting, download, PDF and HTML extraction, splitting, embedding filter, and cache encoding
+and decoding. The stages are sorted by time, so the hottest one stands out. With `--baseline`, exits with an
+error when a stage is slower or uses more memory than in the baseline report by more than `--threshold`.
+
+Downloads and embeddings go through local stand-ins, so they measure the client side only.
+
+Usage:
+    python -m benchmarks.pipeline --json pipeline.json
+    python -m benchmarks.pipeline --baseline pipeline.json --threshold 0.25
+    python -m benchmarks.pipeline --generate  # regenerate the corpus
+"""
+
+import argparse
+import json
+import os
+import statistics
+import sys
+import time
+import tracemalloc
+from pathlib import Path
+from typing import Any, Callable
+
+from benchmarks.fixtures import make_html, make_paper, make_pdf
+from benchmarks.stand_ins import Latency, StandInHandler, StandInServer, StandIns
+
+CORPUS_DIR = Path(__file__).parent / "corpus"
+# Pages of the papers of the corpus, each rendered as PDF and HTML. The long one exceeds MAX_PAGES.
+CORPUS_PAPERS = {"short": 3, "medium": 10, "long": 24}
+QUERY = "retrieval benchmark results"
+CONTENT_TYPES = {".pdf": "application/pdf", ".html": "text/html; charset=utf-8"}
+
+
+def generate_corpus() -> None:
+    CORPUS_DIR.mkdir(exist_ok=True)
+    for name, pages in CORPUS_PAPERS.items():
+        paper = make_paper(name, pages)
+        (CORPUS_DIR / f"{name}.pdf").write_bytes(make_pdf(paper))
+        (CORPUS_DIR / f"{name}.html").write_bytes(make_html(paper))
+
+
+class CorpusHandler(StandInHandler):
+    """Serves the files of the corpus."""
+
+    def do_GET(self) -> None:
+        path = CORPUS_DIR / self.path.lstrip("/")
+        if path.parent != CORPUS_DIR or not path.is_file():
+            self.send(b"Not found", "text/plain", 404)
+            return
+        self.send(path.read_bytes(), CONTENT_TYPES.get(path.suffix, "text/plain"))
+
+
+def measure(run: Callable[[], Any], repeat: int) -> dict:
+    """Time a function, after a warm-up call, then measure its allocations in a separate call."""
+    run()
+    durations = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        run()
+        durations.append(time.perf_counter() - start)
+
+    tracemalloc.start()
+    try:
+        run()
+        current, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return {
+        "median": statistics.median(durations),
+        "min": min(durations),
+        "peak_kb": peak / 1024,
+        "retained_kb": current / 1024,
+    }
+
+
+def benchmark(args: argparse.Namespace, corpus_url: str) -> dict:
+    import cloudscraper
+    from langchain_text_splitters import RecursiveCharacterTextSplitter
+    from nexusai.config import MAX_PAGES, REQUEST_TIMEOUT
+    from nexusai.tools.paper_downloader import PaperDownloader
+    from nexusai.utils.extraction import (
+        extract_html_text,
+        extract_pdf_pages,
+        label_sections,
+        select_pages,
+    )
+    from nexusai.utils.strings import arxiv_abs_to_pdf_url
+
+    files = {path.name: path.read_bytes() for path in sorted(CORPUS_DIR.iterdir())}
+    html_files = {
+        name: content.decode()
+        for name, content in files.items()
+        if name.endswith(".html")
+    }
+    pdf_pages = {
+        name: extract_pdf_pages(content)
+        for name, content in files.items()
+        if name.endswith(".pdf")
+    }
+    texts = {
+        **{name: "\n\n".join(pages) for name, pages in pdf_pages.items()},
+        **{name: extract_html_text(html) for name, html in html_files.items()},
+    }
+    splitter = RecursiveCharacterTextSplitter(
+        chunk_size=PaperDownloader.chars_per_page, chunk_overlap=0
+    )
+    chunks = {name: splitter.split_text(text) for name, text in texts.items()}
+    sections = {name: label_sections(pages) for name, pages in chunks.items()}
+    scraper = cloudscraper.create_scraper()
+    downloader = PaperDownloader(QUERY)
+    urls = [
+        f"https://arxiv.org/abs/2401.{i:05d}" if i % 2 else f"https://example.org/{i}"
+        for i in range(1000)
+    ]
+
+    # Stages and their inputs, as functions running the stage on one input
+    stages: dict[str, dict[str, Callable[[], Any]]] = {
+        "arxiv_abs_to_pdf_url": {
+            "1000 urls": lambda: [arxiv_abs_to_pdf_url(url) for url in urls]
+        },
+        "download": {
+            name: lambda name=name: scraper.get(
+                f"{corpus_url}/{name}", timeout=REQUEST_TIMEOUT
+            ).content
+            for name in files
+        },
+        "pdf_pages": {
+            name: lambda content=content: extract_pdf_pages(content)
+            for name, content in files.items()
+            if name.endswith(".pdf")
+        },
+        # Main content only, with lxml if it is installed
+        "html_text": {
+            name: lambda html=html: extract_html_text(html)
+            for name, html in html_files.items()
+        },
+        "html_text_full_page": {
+            name: lambda html=html: extract_html_text(html, main_content=False)
+            for name, html in html_files.items()
+        },
+        "html_text_html_parser": {
+            name: lambda html=html: extract_html_text(
+                html, main_content=False, parser="html.parser"
+            )
+            for name, html in html_files.items()
+        },
+        "split": {
+            name: lambda text=text: splitter.split_text(text)
+            for name, text in texts.items()
+        },
+        "sections": {
+            name: lambda pages=pages: select_pages(label_sections(pages))
+            for name, pages in pdf_pages.items()
+        },
+        # Ranks the pages by relevance to the query, as for papers longer than MAX_PAGES
+        "embedding_filter": {
+            name: lambda pages=pages: downloader._PaperDownloader__filter_pages(pages)
+            for name, pages in {**pdf_pages, **chunks}.items()
+            if len(pages) > MAX_PAGES
+        },
+        # Encoding of the labelled pages stored by CacheManager.store_content and read by get_content
+        "cache_encode": {
+            name: lambda parts=parts: json.dumps(parts)
+            for name, parts in sections.items()
+        },
+        "cache_decode": {
+            name: lambda data=json.dumps(parts): json.loads(data)
+            for name, parts in sections.items()
+        },
+    }
+
+    report = {"corpus": {name: len(content) for name, content in files.items()}}
+    # Pages and text of the PDFs left for the embedding filter and the LLM once the low-value sections are dropped
+    report["pdf_sections"] = {}
+    for name, pages in pdf_pages.items():
+        kept = select_pages(label_sections(pages))
+        report["pdf_sections"][name] = {
+            "pages": len(pages),
+            "kept_pages": len(kept),
+            "chars": sum(len(page) for page in pages),
+            "kept_chars": sum(len(page) for page in kept),
+            "reduction": 1 - sum(map(len, kept)) / max(sum(map(len, pages)), 1),
+            "embedded": len(pages) > MAX_PAGES,
+            "kept_embedded": len(kept) > MAX_PAGES,
+        }
+    # Text passed on to the splitter, the embeddings and the LLM, with and without the boilerplate
+    report["html_extraction"] = {}
+    for name, html in html_files.items():
+        full_page = extract_html_text(html, main_content=False)
+        main_content = extract_html_text(html, main_content=True)
+        report["html_extraction"][name] = {
+            "full_page_chars": len(full_page),
+            "main_content_chars": len(main_content),
+            "reduction": 1 - len(main_content) / max(len(full_page), 1),
+            "full_page_chunks": len(splitter.split_text(full_page)),
+            "main_content_chunks": len(splitter.split_text(main_content)),
+        }
+    results = {}
+    for stage, inputs in stages.items():
+        if args.stages and stage not in args.stages:
+            continue
+        try:
+            measurements = {
+                name: measure(run, args.repeat) for name, run in inputs.items()
+            }
+        except Exception as e:
+            print(f"Stage {stage} failed: {e}", file=sys.stderr)
+            results[stage] = {"error": str(e)}
+            continue
+        results[stage] = {
+            "seconds": sum(m["median"] for m in measurements.values()),
+            "peak_kb": max(m["peak_kb"] for m in measurements.values()),
+            "inputs": measurements,
+        }
+    report["stages"] = results
+    return report
+
+
+def print_report(report: dict) -> None:
+    stages = {
+        stage: result
+        for stage, result in report["stages"].items()
+        if "error" not in result
+    }
+    total = sum(result["seconds"] for result in stages.values()) or 1
+    print(f"\n{'stage':<22} {'seconds':>10} {'share':>7} {'peak KiB':>10}")
+    for stage, result in sorted(stages.items(), key=lambda item: -item[1]["seconds"]):
+        print(
+            f"{stage:<22} {result['seconds']:>10.4f} {result['seconds'] / total:>7.1%} "
+            f"{result['peak_kb']:>10.0f}"
+        )
+        for name, measurement in result["inputs"].items():
+            print(
+                f"  {name:<20} {measurement['median']:>10.4f} {'':>7} {measurement['peak_kb']:>10.0f}"
+            )
+    for stage, result in report["stages"].items():
+        if "error" in result:
+            print(f"{stage:<22} failed: {result['error']}")
+
+    print(f"\n{'pdf':<22} {'pages':>7} {'kept':>9} {'chars':>10} {'reduction':>10}")
+    for name, sizes in report["pdf_sections"].items():
+        skipped = sizes["embedded"] and not sizes["kept_embedded"]
+        print(
+            f"{name:<22} {sizes['pages']:>7} {sizes['kept_pages']:>9} {sizes['chars']:>10} "
+            f"{sizes['reduction']:>10.1%}{'  no embeddings needed' if skipped else ''}"
+        )
+
+    print(
+        f"\n{'html page':<22} {'MB/s':>7} {'chars':>9} {'full page':>10} {'reduction':>10}"
+    )
+    html_stages = {
+        stage: stages[stage]
+        for stage in ("html_text", "html_text_full_page", "html_text_html_parser")
+        if stage in stages
+    }
+    for name, sizes in report["html_extraction"].items():
+        throughputs = [
+            report["corpus"][name] / result["inputs"][name]["median"] / 1e6
+            for result in html_stages.values()
+        ]
+        throughput = f"{throughputs[0]:.1f}" if throughputs else "-"
+        print(
+            f"{name:<22} {throughput:>7} {sizes['main_content_chars']:>9} "
+            f"{sizes['full_page_chars']:>10} {sizes['reduction']:>10.1%}"
+        )
+    for stage, result in html_stages.items():
+        throughput = (
+            sum(report["corpus"][name] for name in result["inputs"]) / result["seconds"]
+        )
+        print(f"  {stage:<24} {throughput / 1e6:>7.1f} MB/s")
+
+
+def find_regressions(
+    report: dict, baseline: dict, threshold: float, min_seconds: float
+) -> list[str]:
+    """Stages slower or using more memory than in the baseline by more than the threshold."""
+    regressions = []
+    for stage, before in baseline["stages"].items():
+        after = report["stages"].get(stage)
+        if "error" in before or after is None:
+            continue
+        if "error" in after:
+            regressions.append(f"{stage}: failed with {after['error']}")
+            continue
+        if (
+            after["seconds"] > before["seconds"] * (1 + threshold)
+            and after["seconds"] - before["seconds"] > min_seconds
+        ):
+            regressions.append(
+                f"{stage}: {after['seconds']:.4f}s instead of {before['seconds']:.4f}s"
+            )
+        if after["peak_kb"] > before["peak_kb"] * (1 + threshold):
+            regressions.append(
+                f"{stage}: peak of {after['peak_kb']:.0f} KiB instead of {before['peak_kb']:.0f} KiB"
+            )
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Benchmark the stages of the paper pipeline over the corpus."
+    )
+    parser.add_argument(
+        "--repeat", type=int, default=5, help="Timed runs per stage and input."
+    )
+    parser.add_argument(
+        "--stages", nargs="*", default=None, help="Only run these stages."
+    )
+    parser.add_argument(
+        "--baseline",
+        type=Path,
+        default=None,
+        help="Fail when a stage regresses compared to this report.",
+    )
+    parser.add_argument(
+        "--threshold",
+        type=float,
+        default=0.25,
+        help="Relative increase of the time or peak memory of a stage counted as a regression.",
+    )
+    parser.add_argument(
+        "--min-seconds",
+        type=float,
+        default=0.001,
+        help="Smallest increase of the time of a stage counted as a regression, to ignore noise.",
+    )
+    parser.add_argument(
+        "--json", type=Path, default=None, help="Write the report to a JSON file."
+    )
+    parser.add_argument(
+        "--generate",
+        action="store_true",
+        help="Regenerate the corpus, e.g. after changing the fixtures, and exit.",
+    )
+    args = parser.parse_args()
+
+    if args.generate:
+        generate_corpus()
+        return
+
+    corpus = StandInServer(CorpusHandler, Latency()).start()
+    try:
+        with StandIns() as stand_ins:
+            # The backend reads its configuration on import
+            for name in ("AZURE_OPENAI_API_KEY", "AZURE_OPENAI_ENDPOINT"):
+                os.environ.pop(name, None)
+            os.environ.update(stand_ins.environ())
+            os.environ.setdefault("REDIS_URL", "redis://localhost:6379")
+            report = benchmark(args, corpus.url)
+    finally:
+        corpus.stop()
+
+    print_report(report)
+    if args.json:
+        args.json.write_text(json.dumps(report, indent=2))
+    if args.baseline:
+        baseline = json.loads(args.baseline.read_text())
+        if regressions := find_regressions(
+            report, baseline, args.threshold, args.min_seconds
+        ):
+            print("\nRegressions:\n  " + "\n  ".join(regressions), file=sys.stderr)
+            sys.exit(1)
+        print("\nNo regressions")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,430 @@
+"""Local stand-ins of the external services: an OpenAI-compatible chat model, Serper, Exa and paper websites.
+
+Each stand-in is an HTTP server on localhost answering after a latency drawn from a log-normal distribution,
+so that the backend runs its real clients, pools, limits and caches against them.
+"""
+
+import hashlib
+import json
+import math
+import random
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any
+
+from benchmarks.fixtures import make_html, make_paper, make_pdf, paper_lines
+
+# Steps of the agent, by number of tool-calling rounds already in the conversation. `{nonce}` is replaced
+# by a random string, so that searches miss the cache, and `{url}` by the last URL returned by a tool.
+DEFAULT_SCRIPT = [
+    {
+        "tool_calls": [
+            {
+                "name": "search-papers",
+                "arguments": {"query": "benchmark {nonce}", "max_results": 3},
+            }
+        ]
+    },
+    {"tool_calls": [{"name": "download-paper", "arguments": {"url": "{url}"}}]},
+    {
+        "content": "The paper [{url}]({url}) reports that the method improves the baseline. "
+        "It evaluates the method on several datasets and discusses its limitations."
+    },
+]
+TEXT_RESPONSE = (
+    "1. Search for papers on the topic.\n2. Download the most relevant paper.\n"
+    "3. Summarize its findings, citing it.\n"
+) * 4
+EMBEDDING_SIZE = 64
+URL_PATTERN = re.compile(r"https?://[^\s)\]\"']+")
+
+
+class Latency:
+    """Log-normal latency, given by its median and the standard deviation of its logarithm, in seconds."""
+
+    def __init__(self, median: float = 0.0, sigma: float = 0.0):
+        self.median = median
+        self.sigma = sigma
+
+    @classmethod
+    def parse(cls, value: str) -> "Latency":
+        """Parse `median` or `median,sigma`, e.g. `0.8,0.5`."""
+        median, _, sigma = value.partition(",")
+        return cls(float(median), float(sigma or 0))
+
+    def sample(self) -> float:
+        if self.median <= 0:
+            return 0.0
+        return self.median * math.exp(random.gauss(0, self.sigma))
+
+    def sleep(self) -> None:
+        if seconds := self.sample():
+            time.sleep(seconds)
+
+    def __repr__(self) -> str:
+        return f"{self.median},{self.sigma}"
+
+
+class StandInServer(ThreadingHTTPServer):
+    """An HTTP server on a free local port, serving in a background thread."""
+
+    daemon_threads = True
+    request_queue_size = 1024
+
+    def __init__(self, handler_class: type[BaseHTTPRequestHandler], latency: Latency):
+        super().__init__(("127.0.0.1", 0), handler_class)
+        self.latency = latency
+        self.thread = threading.Thread(target=self.serve_forever, daemon=True)
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self.server_address[1]}"
+
+    def start(self) -> "StandInServer":
+        self.thread.start()
+        return self
+
+    def stop(self) -> None:
+        self.shutdown()
+        self.server_close()
+
+
+class StandInHandler(BaseHTTPRequestHandler):
+    server: StandInServer
+    protocol_version = "HTTP/1.1"
+    # Headers and body are written separately, which would wait for delayed acknowledgements
+    disable_nagle_algorithm = True
+
+    def log_message(self, format: str, *args: Any) -> None:
+        pass
+
+    def read_json(self) -> dict:
+        length = int(self.headers.get("Content-Length") or 0)
+        return json.loads(self.rfile.read(length) or b"{}")
+
+    def send(self, body: bytes, content_type: str, status: int = 200) -> None:
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def send_json(self, data: Any, status: int = 200) -> None:
+        self.send(json.dumps(data).encode(), "application/json", status)
+
+
+def _seed(text: str) -> str:
+    return hashlib.sha256(text.encode()).hexdigest()[:16]
+
+
+def _example(schema: dict, definitions: dict) -> Any:
+    """Build a value matching a JSON schema, with the required fields only."""
+    if "$ref" in schema:
+        return _example(definitions[schema["$ref"].split("/")[-1]], definitions)
+    if "anyOf" in schema:
+        options = [option for option in schema["anyOf"] if option.get("type") != "null"]
+        return _example(options[0], definitions) if options else None
+    match schema.get("type"):
+        case "object":
+            return {
+                name: _example(schema["properties"][name], definitions)
+                for name in schema.get("required", [])
+            }
+        case "boolean":
+            return True
+        case "integer":
+            return 1
+        case "number":
+            return 1.0
+        case "array":
+            return []
+        case _:
+            return schema.get("enum", ["Generated by the stand-in model. " * 8])[0]
+
+
+class LLMHandler(StandInHandler):
+    """OpenAI-compatible chat completions and embeddings, following a script for the agent's tool calls.
+
+    Requests forcing a tool (structured outputs) get arguments matching its schema, requests offering tools
+    get the step of the script after the tool-calling rounds of the conversation, and others get text.
+    """
+
+    script: list[dict] = DEFAULT_SCRIPT
+
+    def do_POST(self) -> None:
+        request = self.read_json()
+        self.server.latency.sleep()
+        if self.path.endswith("/chat/completions"):
+            self.send_json(self.chat_completion(request))
+        elif self.path.endswith("/embeddings"):
+            self.send_json(self.embeddings(request))
+        else:
+            self.send_json({"error": {"message": "Not found"}}, 404)
+
+    def chat_completion(self, request: dict) -> dict:
+        messages = request.get("messages", [])
+        tools = {tool["function"]["name"]: tool for tool in request.get("tools", [])}
+        tool_choice = request.get("tool_choice")
+        content, tool_calls = None, []
+
+        if isinstance(tool_choice, dict):
+            name = tool_choice["function"]["name"]
+            schema = tools[name]["function"]["parameters"]
+            definitions = schema.get("$defs") or schema.get("definitions") or {}
+            tool_calls = [(name, _example(schema, definitions))]
+        elif tools and tool_choice != "none":
+            rounds = sum(
+                1
+                for message in messages
+                if message.get("role") == "assistant" and message.get("tool_calls")
+            )
+            step = self.script[min(rounds, len(self.script) - 1)]
+            content = self.__fill(step.get("content"), messages)
+            tool_calls = [
+                (
+                    call["name"],
+                    json.loads(self.__fill(json.dumps(call["arguments"]), messages)),
+                )
+                for call in step.get("tool_calls", [])
+            ]
+        elif tools:
+            # Final answer without tools, after the last step of the script
+            content = self.__fill(
+                self.script[-1].get("content", TEXT_RESPONSE), messages
+            )
+        else:
+            content = TEXT_RESPONSE
+
+        prompt_tokens = (
+            sum(len(str(message.get("content") or "")) for message in messages) // 4
+        )
+        completion_tokens = len(content or "") // 4 + 20 * len(tool_calls)
+        message = {"role": "assistant", "content": content}
+        if tool_calls:
+            message["tool_calls"] = [
+                {
+                    "id": f"call_{random.getrandbits(64):016x}",
+                    "type": "function",
+                    "function": {"name": name, "arguments": json.dumps(arguments)},
+                }
+                for name, arguments in tool_calls
+            ]
+        return {
+            "id": f"chatcmpl-{random.getrandbits(64):016x}",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": request.get("model", "stand-in"),
+            "choices": [
+                {
+                    "index": 0,
+                    "message": message,
+                    "finish_reason": "tool_calls" if tool_calls else "stop",
+                }
+            ],
+            "usage": {
+                "prompt_tokens": prompt_tokens,
+                "completion_tokens": completion_tokens,
+                "total_tokens": prompt_tokens + completion_tokens,
+            },
+        }
+
+    @staticmethod
+    def __fill(template: str | None, messages: list[dict]) -> str | None:
+        if template is None:
+            return None
+        url = next(
+            (
+                match.group(0)
+                for message in reversed(messages)
+                if message.get("role") == "tool"
+                and (match := URL_PATTERN.search(str(message.get("content"))))
+            ),
+            "https://arxiv.org/pdf/1706.03762",
+        )
+        return template.replace("{nonce}", f"{random.getrandbits(32):08x}").replace(
+            "{url}", url
+        )
+
+    @staticmethod
+    def embeddings(request: dict) -> dict:
+        inputs = request.get("input", [])
+        if not isinstance(inputs, list) or (inputs and isinstance(inputs[0], int)):
+            inputs = [inputs]
+        data = []
+        for i, value in enumerate(inputs):
+            rng = random.Random(_seed(json.dumps(value)))
+            vector = [rng.gauss(0, 1) for _ in range(EMBEDDING_SIZE)]
+            norm = math.sqrt(sum(x * x for x in vector))
+            data.append(
+                {
+                    "object": "embedding",
+                    "index": i,
+                    "embedding": [x / norm for x in vector],
+                }
+            )
+        return {
+            "object": "list",
+            "data": data,
+            "model": request.get("model"),
+            "usage": {"prompt_tokens": 0, "total_tokens": 0},
+        }
+
+
+class PapersHandler(StandInHandler):
+    """Paper websites: `/papers/<seed>/<pages>.pdf` or `.html` serves a generated paper."""
+
+    path_pattern = re.compile(r"^/papers/(\w+)/(\d+)\.(pdf|html)$")
+
+    def do_GET(self) -> None:
+        self.server.latency.sleep()
+        if not (match := self.path_pattern.match(self.path)):
+            self.send(b"Not found", "text/plain", 404)
+            return
+        seed, pages, extension = match.groups()
+        paper = make_paper(seed, int(pages))
+        if extension == "pdf":
+            self.send(make_pdf(paper), "application/pdf")
+        else:
+            self.send(make_html(paper), "text/html; charset=utf-8")
+
+
+class SearchHandler(StandInHandler):
+    """Serper (`/scholar`) and Exa (`/search`, `/contents`) results, linking to papers of the papers stand-in."""
+
+    papers_url: str = ""
+    paper_pages: list[int] = [8]
+
+    def do_POST(self) -> None:
+        request = self.read_json()
+        self.server.latency.sleep()
+        if self.path == "/scholar":
+            self.send_json({"organic": self.__serper_results(request)})
+        elif self.path == "/search":
+            self.send_json({"results": self.__exa_results(request)})
+        elif self.path == "/contents":
+            urls = request.get("urls") or request.get("ids") or []
+            self.send_json({"results": [self.__exa_result(url) for url in urls]})
+        else:
+            self.send_json({"message": "Not found"}, 404)
+
+    def __paper_urls(self, query: str, num: int) -> list[str]:
+        seed = _seed(query)
+        return [
+            f"{self.papers_url}/papers/{seed}{i}/{self.paper_pages[i % len(self.paper_pages)]}.pdf"
+            for i in range(num)
+        ]
+
+    def __serper_results(self, request: dict) -> list[dict]:
+        results = []
+        for i, url in enumerate(
+            self.__paper_urls(request.get("q", ""), request.get("num", 1))
+        ):
+            paper = make_paper(url, 1)
+            results.append(
+                {
+                    "title": paper["title"],
+                    "link": url,
+                    "publicationInfo": paper["authors"],
+                    "snippet": paper["sections"][0][1][0][:300],
+                    "year": 2024,
+                    "citedBy": 10 * i,
+                }
+            )
+        return results
+
+    def __exa_result(self, url: str) -> dict:
+        pages = (
+            int(url.rsplit("/", 1)[-1].split(".")[0])
+            if url.startswith(self.papers_url)
+            else 4
+        )
+        paper = make_paper(
+            url.rsplit("/", 2)[-2] if url.startswith(self.papers_url) else url, pages
+        )
+        return {
+            "id": url,
+            "url": url,
+            "title": paper["title"],
+            "author": paper["authors"],
+            "publishedDate": "2024-01-01",
+            "text": "\n".join(paper_lines(paper)),
+        }
+
+    def __exa_results(self, request: dict) -> list[dict]:
+        urls = self.__paper_urls(request.get("query", ""), request.get("numResults", 1))
+        return [self.__exa_result(url) for url in urls]
+
+
+class StandIns:
+    """Starts the stand-ins and gives the environment variables pointing the backend to them.
+
+    The environment must be applied before the backend is imported, since its configuration is read on import.
+    """
+
+    def __init__(
+        self,
+        llm_latency: Latency = Latency(),
+        search_latency: Latency = Latency(),
+        download_latency: Latency = Latency(),
+        script: list[dict] = DEFAULT_SCRIPT,
+        paper_pages: list[int] = [8],
+    ):
+        self.llm = StandInServer(
+            type("ScriptedLLMHandler", (LLMHandler,), {"script": script}), llm_latency
+        )
+        self.papers = StandInServer(PapersHandler, download_latency)
+        self.search = StandInServer(SearchHandler, search_latency)
+        self.paper_pages = paper_pages
+
+    def __enter__(self) -> "StandIns":
+        self.papers.start()
+        self.search.RequestHandlerClass = type(
+            "LinkedSearchHandler",
+            (SearchHandler,),
+            {"papers_url": self.papers.url, "paper_pages": self.paper_pages},
+        )
+        self.search.start()
+        self.llm.start()
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        for server in (self.llm, self.search, self.papers):
+            server.stop()
+
+    def environ(self) -> dict[str, str]:
+        deployment = {
+            "endpoint": f"{self.llm.url}/v1",
+            "api_key": "stand-in",
+            "tpm": 10**9,
+            "rpm": 10**7,
+        }
+        return {
+            "OPENAI_API_KEY": "stand-in",
+            "LLM_DEPLOYMENTS": json.dumps(
+                {
+                    "small": [
+                        {"name": "stand-in-small", "model": "gpt-4o-mini", **deployment}
+                    ],
+                    "large": [
+                        {"name": "stand-in-large", "model": "gpt-4o", **deployment}
+                    ],
+                    "embedding": [
+                        {
+                            "name": "stand-in-embedding",
+                            "model": "text-embedding-3-small",
+                            **deployment,
+                        }
+                    ],
+                }
+            ),
+            "SERPER_API_KEY": "stand-in",
+            "SERPER_URL": self.search.url,
+            "EXA_API_KEY": "stand-in",
+            "EXA_URL": self.search.url,
+        }
+
+    def paper_url(self, seed: str, pages: int | None = None) -> str:
+        pages = pages or self.paper_pages[int(_seed(seed), 16) % len(self.paper_pages)]
+        return f"{self.papers.url}/papers/{_seed(seed)}/{pages}.pdf"
@@ -0,0 +1,441 @@
+"""Load test of the /ws endpoint: many concurrent research conversations against a backend using the stand-ins.
+
+Starts the server (`main.py`) in a subprocess pointed at the stand-ins (see `benchmarks.stand_ins`) and a local
+Redis at `REDIS_URL`, then opens `--sessions` websocket connections with tokens signed with a test secret. Each
+connection sends `--turns` queries one after the other, as the frontend does, and waits for their final answer.
+
+Measures the time to the first message and to the final answer, the event-loop lag reported by `/health/live` and
+the response time of the probe itself, and the memory and threads of the server processes per session. The JSON
+report has the same keys between runs, so the reports of two versions can be diffed, or compared with `--compare`.
+
+Usage:
+    python -m benchmarks.websocket --sessions 200 --turns 2 --llm-latency 1,0.5 --json load.json
+    python -m benchmarks.websocket --sessions 200 --compare load.json
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import signal
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+from pathlib import Path
+from uuid import uuid4
+
+from jose import jwt
+from websockets.asyncio.client import connect
+
+from benchmarks.stand_ins import DEFAULT_SCRIPT, Latency, StandIns
+from benchmarks.workflow import QUERY, percentiles
+
+BACKEND_DIR = Path(__file__).resolve().parents[1]
+MONITOR_INTERVAL = 0.5  # seconds between samples of the lag and memory of the server
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def process_tree(pid: int) -> list[int]:
+    """The process and its descendants, e.g. the workers of the server, from /proc."""
+    pids, tree = [pid], []
+    while pids:
+        pid = pids.pop()
+        tree.append(pid)
+        try:
+            for task in os.listdir(f"/proc/{pid}/task"):
+                with open(f"/proc/{pid}/task/{task}/children") as f:
+                    pids.extend(int(child) for child in f.read().split())
+        except OSError:
+            continue
+    return tree
+
+
+def memory_and_threads(pid: int) -> tuple[int, int]:
+    """Resident memory in bytes and threads of the process and its descendants."""
+    rss = threads = 0
+    for child in process_tree(pid):
+        try:
+            with open(f"/proc/{child}/status") as f:
+                for line in f:
+                    if line.startswith("VmRSS:"):
+                        rss += int(line.split()[1]) * 1024
+                    elif line.startswith("Threads:"):
+                        threads += int(line.split()[1])
+        except OSError:
+            continue
+    return rss, threads
+
+
+def get_json(url: str, timeout: float = 10) -> tuple[int, dict]:
+    try:
+        with urllib.request.urlopen(url, timeout=timeout) as response:
+            return response.status, json.load(response)
+    except urllib.error.HTTPError as e:
+        return e.code, json.load(e)
+
+
+class Server:
+    """The backend running in a subprocess, with its output written to a log file."""
+
+    def __init__(self, env: dict[str, str], log_path: Path):
+        self.port = free_port()
+        self.url = f"127.0.0.1:{self.port}"
+        self.log_path = log_path
+        self.log = open(log_path, "wb")
+        self.process = subprocess.Popen(
+            [sys.executable, "main.py"],
+            cwd=BACKEND_DIR,
+            env={
+                **env,
+                "SERVER_HOST": "127.0.0.1",
+                "SERVER_PORT": str(self.port),
+            },
+            stdout=self.log,
+            stderr=subprocess.STDOUT,
+        )
+
+    def wait_ready(self, timeout: float) -> None:
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            if self.process.poll() is not None:
+                break
+            try:
+                if get_json(f"http://{self.url}/health/ready", timeout=1)[0] == 200:
+                    return
+            except OSError:
+                pass
+            time.sleep(0.5)
+        self.stop()
+        tail = self.log_path.read_text(errors="replace")[-4000:]
+        raise RuntimeError(f"The server did not become ready:\n{tail}")
+
+    def stop(self) -> None:
+        if self.process.poll() is None:
+            self.process.send_signal(signal.SIGTERM)
+            try:
+                self.process.wait(30)
+            except subprocess.TimeoutExpired:
+                self.process.kill()
+                self.process.wait()
+        self.log.close()
+
+
+class Monitor:
+    """Samples the event-loop lag and the memory of the server while the sessions run."""
+
+    def __init__(self, server: Server):
+        self.server = server
+        self.loop_lags: list[float] = []
+        self.probe_seconds: list[float] = []
+        self.probe_errors = 0
+        self.memory: list[int] = []
+        self.threads: list[int] = []
+
+    def sample(self) -> None:
+        rss, threads = memory_and_threads(self.server.process.pid)
+        self.memory.append(rss)
+        self.threads.append(threads)
+        start = time.perf_counter()
+        try:
+            _, status = get_json(f"http://{self.server.url}/health/live")
+            self.loop_lags.append(status["loop_lag"])
+        except (OSError, KeyError, ValueError):
+            self.probe_errors += 1
+        self.probe_seconds.append(time.perf_counter() - start)
+
+    async def run(self) -> None:
+        while True:
+            await asyncio.to_thread(self.sample)
+            await asyncio.sleep(MONITOR_INTERVAL)
+
+
+class Results:
+    def __init__(self):
+        self.connect_seconds: list[float] = []
+        self.connect_errors = 0
+        self.first_message_seconds: list[float] = []
+        self.final_seconds: list[float] = []
+        self.turns = 0
+        self.turn_errors: dict[str, int] = {}
+
+    def error(self, reason: str) -> None:
+        self.turn_errors[reason] = self.turn_errors.get(reason, 0) + 1
+
+
+def mint_token(secret: str, user_id: str) -> str:
+    """A token as issued by the frontend, signed with the secret shared with the backend."""
+    return jwt.encode(
+        {"sub": user_id, "exp": int(time.time()) + 24 * 3600}, secret, algorithm="HS256"
+    )
+
+
+async def run_session(
+    i: int, args: argparse.Namespace, server: Server, results: Results
+) -> None:
+    await asyncio.sleep(args.ramp_up * i / args.sessions)
+    token = mint_token(args.secret, f"load-{i % args.users}")
+    start = time.perf_counter()
+    try:
+        websocket = await connect(
+            f"ws://{server.url}/ws?token={token}&session_id=load-{uuid4()}",
+            open_timeout=args.timeout,
+            max_size=None,
+        )
+    except Exception as e:
+        print(f"Session {i} failed to connect: {e}", file=sys.stderr)
+        results.connect_errors += 1
+        return
+    results.connect_seconds.append(time.perf_counter() - start)
+
+    async with websocket:
+        for turn in range(args.turns):
+            if turn:
+                await asyncio.sleep(args.think_time.sample())
+            results.turns += 1
+            start = time.perf_counter()
+            first_message = True
+            try:
+                await websocket.send(json.dumps({"query": QUERY}))
+                async with asyncio.timeout(args.timeout):
+                    while True:
+                        message = json.loads(await websocket.recv())
+                        if first_message:
+                            results.first_message_seconds.append(
+                                time.perf_counter() - start
+                            )
+                            first_message = False
+                        if message["type"] in ("final", "error"):
+                            break
+            except TimeoutError:
+                results.error("timeout")
+                return
+            except Exception as e:
+                print(f"Session {i} failed: {e}", file=sys.stderr)
+                results.error("disconnected")
+                return
+            if message["type"] == "error":
+                results.error("error message")
+            else:
+                results.final_seconds.append(time.perf_counter() - start)
+
+
+async def load_test(args: argparse.Namespace, server: Server) -> dict:
+    monitor = Monitor(server)
+    await asyncio.to_thread(monitor.sample)
+    baseline_memory, baseline_threads = monitor.memory[0], monitor.threads[0]
+
+    results = Results()
+    monitor_task = asyncio.create_task(monitor.run())
+    start = time.perf_counter()
+    await asyncio.gather(
+        *[run_session(i, args, server, results) for i in range(args.sessions)]
+    )
+    elapsed = time.perf_counter() - start
+    monitor_task.cancel()
+
+    connected = len(results.connect_seconds)
+    peak_memory = max(monitor.memory)
+    return {
+        "config": {
+            "sessions": args.sessions,
+            "turns": args.turns,
+            "users": args.users,
+            "workers": args.workers,
+            "ramp_up": args.ramp_up,
+            "think_time": repr(args.think_time),
+            "llm_latency": repr(args.llm_latency),
+            "search_latency": repr(args.search_latency),
+            "download_latency": repr(args.download_latency),
+            "paper_pages": args.paper_pages,
+        },
+        "elapsed": elapsed,
+        "connections": {
+            "opened": connected,
+            "errors": results.connect_errors,
+            "seconds": percentiles(results.connect_seconds),
+        },
+        "turns": {
+            "count": results.turns,
+            "completed": len(results.final_seconds),
+            "errors": results.turn_errors,
+            "throughput_per_minute": len(results.final_seconds) / elapsed * 60,
+            "first_message_seconds": percentiles(results.first_message_seconds),
+            "final_seconds": percentiles(results.final_seconds),
+        },
+        "event_loop": {
+            "lag_seconds": percentiles(monitor.loop_lags),
+            "probe_seconds": percentiles(monitor.probe_seconds),
+            "probe_errors": monitor.probe_errors,
+        },
+        "memory": {
+            "baseline_mb": baseline_memory / 2**20,
+            "peak_mb": peak_memory / 2**20,
+            "per_session_kb": (
+                (peak_memory - baseline_memory) / connected / 1024 if connected else 0
+            ),
+            "baseline_threads": baseline_threads,
+            "peak_threads": max(monitor.threads),
+        },
+    }
+
+
+def flatten(report: dict, prefix: str = "") -> dict[str, float]:
+    values = {}
+    for key, value in report.items():
+        if isinstance(value, dict):
+            values.update(flatten(value, f"{prefix}{key}."))
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            values[f"{prefix}{key}"] = value
+    return values
+
+
+def print_comparison(report: dict, baseline: dict) -> None:
+    before, after = flatten(baseline), flatten(report)
+    print(f"\n{'metric':<40} {'baseline':>12} {'current':>12} {'change':>8}")
+    for key in sorted(before.keys() | after.keys()):
+        old, new = before.get(key), after.get(key)
+        if old is None or new is None:
+            change = "n/a"
+        elif old:
+            change = f"{(new - old) / abs(old):+.0%}"
+        else:
+            change = "" if new == old else "new"
+        print(
+            f"{key:<40} {'-' if old is None else f'{old:.3f}':>12} "
+            f"{'-' if new is None else f'{new:.3f}':>12} {change:>8}"
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Load test the /ws endpoint of a backend using local stand-ins."
+    )
+    parser.add_argument(
+        "--sessions", type=int, default=100, help="Concurrent websocket sessions."
+    )
+    parser.add_argument(
+        "--turns", type=int, default=2, help="Queries sent by each session."
+    )
+    parser.add_argument(
+        "--users",
+        type=int,
+        default=None,
+        help="Distinct users the sessions belong to, one per session by default.",
+    )
+    parser.add_argument(
+        "--workers", type=int, default=1, help="Worker processes of the server."
+    )
+    parser.add_argument(
+        "--ramp-up",
+        type=float,
+        default=5.0,
+        help="Seconds over which the sessions are opened.",
+    )
+    parser.add_argument(
+        "--think-time",
+        type=Latency.parse,
+        default=Latency(2, 0.5),
+        help="Pause between the final answer and the next query of a session.",
+    )
+    parser.add_argument(
+        "--timeout",
+        type=float,
+        default=300,
+        help="Seconds to wait for a connection or a final answer.",
+    )
+    parser.add_argument(
+        "--llm-latency",
+        type=Latency.parse,
+        default=Latency(0.8, 0.5),
+        help="Median and log standard deviation of the latency of LLM calls, e.g. 0.8,0.5.",
+    )
+    parser.add_argument(
+        "--search-latency",
+        type=Latency.parse,
+        default=Latency(0.5, 0.3),
+        help="Latency of the Serper and Exa calls.",
+    )
+    parser.add_argument(
+        "--download-latency",
+        type=Latency.parse,
+        default=Latency(0.5, 0.5),
+        help="Latency of the paper websites.",
+    )
+    parser.add_argument(
+        "--paper-pages",
+        type=lambda value: [int(pages) for pages in value.split(",")],
+        default=[4, 8, 16],
+        help="Page counts of the papers served, e.g. 4,8,16.",
+    )
+    parser.add_argument(
+        "--script",
+        type=Path,
+        default=None,
+        help="JSON file with the steps of the agent (see benchmarks.stand_ins.DEFAULT_SCRIPT).",
+    )
+    parser.add_argument(
+        "--secret",
+        default="load-test-secret",
+        help="NEXTAUTH_SECRET of the server, used to sign the tokens.",
+    )
+    parser.add_argument(
+        "--json", type=Path, default=None, help="Write the report to a JSON file."
+    )
+    parser.add_argument(
+        "--compare",
+        type=Path,
+        default=None,
+        help="Compare the results with a previous report.",
+    )
+    args = parser.parse_args()
+    args.users = args.users or args.sessions
+
+    script = json.loads(args.script.read_text()) if args.script else DEFAULT_SCRIPT
+    with StandIns(
+        args.llm_latency,
+        args.search_latency,
+        args.download_latency,
+        script,
+        args.paper_pages,
+    ) as stand_ins, tempfile.TemporaryDirectory(prefix="nexusai-load-") as tmp:
+        env = {
+            name: value
+            for name, value in os.environ.items()
+            if not name.startswith("AZURE_OPENAI_")
+        }
+        env.update(stand_ins.environ())
+        env.setdefault("REDIS_URL", "redis://localhost:6379")
+        env.setdefault("FRONTEND_URL", "http://localhost:3000")
+        env.update(
+            {
+                "NEXTAUTH_SECRET": args.secret,
+                "SERVER_WORKERS": str(args.workers),
+                "TRACES_DIR": os.path.join(tmp, "traces"),
+                "PYTHONPATH": str(BACKEND_DIR),
+            }
+        )
+
+        server = Server(env, Path(tmp) / "server.log")
+        try:
+            server.wait_ready(timeout=120)
+            report = asyncio.run(load_test(args, server))
+        finally:
+            server.stop()
+
+    print(json.dumps(report, indent=2))
+    if args.compare:
+        print_comparison(report, json.loads(args.compare.read_text()))
+    if args.json:
+        args.json.write_text(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
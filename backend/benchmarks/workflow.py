@@ -0,0 +1,321 @@
+"""Benchmark the research workflow and the paper pipeline offline, against local stand-ins.
+
+Runs `agent.process_query` and `chat.process_paper` from N concurrent sessions against a scripted chat model,
+Serper, Exa and paper websites served locally (see `benchmarks.stand_ins`), and a local Redis at `REDIS_URL`.
+Reports the latency percentiles, the throughput and the time spent per workflow node, tool and paper stage.
+
+By default, searches and papers are unique per run so that they miss the caches. Use a dedicated Redis
+database, since the benchmark writes sessions, checkpoints and cache entries to it.
+
+Usage:
+    python -m benchmarks.workflow --sessions 8 --queries 40 --papers 20 --llm-latency 0.8,0.5
+    python -m benchmarks.workflow --script script.json --json results.json
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+from collections import defaultdict
+from pathlib import Path
+from typing import Awaitable, Callable
+
+from benchmarks.stand_ins import DEFAULT_SCRIPT, Latency, StandIns
+
+QUERY = "What are the latest results on retrieval-augmented language models?"
+
+
+def percentiles(values: list[float]) -> dict[str, float]:
+    if not values:
+        return {}
+    quantiles = (
+        statistics.quantiles(values, n=100, method="inclusive")
+        if len(values) > 1
+        else values * 99
+    )
+    return {
+        "mean": statistics.fmean(values),
+        "p50": quantiles[49],
+        "p95": quantiles[94],
+        "p99": quantiles[98],
+        "max": max(values),
+    }
+
+
+def histogram_totals(metric: str, *labels: str) -> dict[str, tuple[float, int]]:
+    """Return the total seconds and count of a histogram of this process, per value of its labels."""
+    from prometheus_client import REGISTRY
+
+    totals = defaultdict(lambda: [0.0, 0])
+    for family in REGISTRY.collect():
+        if family.name != metric:
+            continue
+        for sample in family.samples:
+            key = " ".join(sample.labels[label] for label in labels)
+            if sample.name == f"{metric}_sum":
+                totals[key][0] = sample.value
+            elif sample.name == f"{metric}_count":
+                totals[key][1] = int(sample.value)
+    return {key: (value[0], value[1]) for key, value in totals.items()}
+
+
+def breakdown(
+    before: dict[str, tuple[float, int]],
+    after: dict[str, tuple[float, int]],
+    total_seconds: float,
+) -> dict[str, dict]:
+    """Time spent per label between two snapshots of a histogram, and its share of the total."""
+    result = {}
+    for key, (seconds, count) in sorted(after.items()):
+        seconds -= before.get(key, (0.0, 0))[0]
+        count -= before.get(key, (0.0, 0))[1]
+        if count:
+            result[key] = {
+                "count": count,
+                "total": seconds,
+                "mean": seconds / count,
+                "share": seconds / total_seconds if total_seconds else 0.0,
+            }
+    return result
+
+
+async def run_sessions(
+    num_sessions: int, num_items: int, run: Callable[[int], Awaitable[bool]]
+) -> tuple[list[float], int, float]:
+    """Run items from concurrent sessions, returning the latencies, the errors and the elapsed time."""
+    items = iter(range(num_items))
+    latencies, errors = [], 0
+
+    async def session() -> None:
+        nonlocal errors
+        for i in items:
+            start = time.perf_counter()
+            try:
+                ok = await run(i)
+            except Exception as e:
+                print(f"Item {i} failed: {e}", file=sys.stderr)
+                ok = False
+            latencies.append(time.perf_counter() - start)
+            errors += not ok
+
+    start = time.perf_counter()
+    await asyncio.gather(*[session() for _ in range(num_sessions)])
+    return latencies, errors, time.perf_counter() - start
+
+
+async def benchmark(args: argparse.Namespace, stand_ins: StandIns) -> dict:
+    from nexusai.agent import process_query
+    from nexusai.chat import process_paper
+    from nexusai.models.outputs import AgentMessageType
+    from nexusai.utils.timing import Timings, collect_timings
+
+    run_nonce = "cached" if args.warm_cache else f"{random.getrandbits(32):08x}"
+
+    async def run_query(i: int) -> bool:
+        result = await process_query(
+            QUERY,
+            session_id=f"benchmark-{run_nonce}-{i}",
+            run_id="run",
+            user_id=f"benchmark-{i % args.sessions}",
+        )
+        return result.type != AgentMessageType.error
+
+    paper_timings = Timings()
+
+    async def run_paper(i: int) -> bool:
+        with collect_timings() as timings:
+            paper = await process_paper(stand_ins.paper_url(f"{run_nonce}-{i}"))
+        paper_timings.merge(timings)
+        return paper is not None
+
+    for i in range(args.warmup):
+        await run_query(-1 - i)
+
+    report = {
+        "config": {
+            "sessions": args.sessions,
+            "llm_latency": repr(args.llm_latency),
+            "search_latency": repr(args.search_latency),
+            "download_latency": repr(args.download_latency),
+            "paper_pages": args.paper_pages,
+            "warm_cache": args.warm_cache,
+        }
+    }
+
+    if args.queries:
+        nodes_before = histogram_totals("nexusai_node_latency_seconds", "node")
+        tools_before = histogram_totals("nexusai_tool_latency_seconds", "tool")
+        providers_before = histogram_totals(
+            "nexusai_provider_latency_seconds", "provider", "operation"
+        )
+        latencies, errors, elapsed = await run_sessions(
+            args.sessions, args.queries, run_query
+        )
+        report["queries"] = {
+            "count": len(latencies),
+            "errors": errors,
+            "elapsed": elapsed,
+            "throughput_per_minute": len(latencies) / elapsed * 60,
+            "latency": percentiles(latencies),
+            "nodes": breakdown(
+                nodes_before,
+                histogram_totals("nexusai_node_latency_seconds", "node"),
+                sum(latencies),
+            ),
+            "tools": breakdown(
+                tools_before,
+                histogram_totals("nexusai_tool_latency_seconds", "tool"),
+                sum(latencies),
+            ),
+            "providers": breakdown(
+                providers_before,
+                histogram_totals(
+                    "nexusai_provider_latency_seconds", "provider", "operation"
+                ),
+                sum(latencies),
+            ),
+        }
+
+    if args.papers:
+        latencies, errors, elapsed = await run_sessions(
+            args.sessions, args.papers, run_paper
+        )
+        report["papers"] = {
+            "count": len(latencies),
+            "errors": errors,
+            "elapsed": elapsed,
+            "throughput_per_minute": len(latencies) / elapsed * 60,
+            "latency": percentiles(latencies),
+            "stages": {
+                stage: {"total": seconds, "mean": seconds / len(latencies)}
+                for stage, seconds in sorted(paper_timings.stages.items())
+            },
+            "counters": dict(paper_timings.counters),
+        }
+    return report
+
+
+def print_report(report: dict) -> None:
+    for name in ("queries", "papers"):
+        if not (results := report.get(name)):
+            continue
+        latency = results["latency"]
+        print(
+            f"\n{name.title()}: {results['count']} in {results['elapsed']:.1f}s "
+            f"({results['throughput_per_minute']:.1f}/min, {results['errors']} errors) "
+            f"from {report['config']['sessions']} sessions"
+        )
+        print(
+            "  latency: "
+            + ", ".join(f"{key} {value:.2f}s" for key, value in latency.items())
+        )
+        for section in ("nodes", "tools", "providers", "stages"):
+            if rows := results.get(section):
+                print(f"  {section}:")
+                for key, row in rows.items():
+                    share = f" ({row['share']:.0%})" if "share" in row else ""
+                    print(
+                        f"    {key:<20} mean {row['mean']:.3f}s, total {row['total']:.1f}s{share}"
+                    )
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Benchmark the research workflow and the paper pipeline against local stand-ins."
+    )
+    parser.add_argument("--sessions", type=int, default=4, help="Concurrent sessions.")
+    parser.add_argument(
+        "--queries", type=int, default=20, help="Research queries to run."
+    )
+    parser.add_argument("--papers", type=int, default=10, help="Papers to process.")
+    parser.add_argument(
+        "--warmup", type=int, default=1, help="Queries run before measuring."
+    )
+    parser.add_argument(
+        "--llm-latency",
+        type=Latency.parse,
+        default=Latency(0.5, 0.5),
+        help="Median and log standard deviation of the latency of LLM calls, e.g. 0.5,0.5.",
+    )
+    parser.add_argument(
+        "--search-latency",
+        type=Latency.parse,
+        default=Latency(0.3, 0.3),
+        help="Latency of the Serper and Exa calls.",
+    )
+    parser.add_argument(
+        "--download-latency",
+        type=Latency.parse,
+        default=Latency(0.5, 0.5),
+        help="Latency of the paper websites.",
+    )
+    parser.add_argument(
+        "--paper-pages",
+        type=lambda value: [int(pages) for pages in value.split(",")],
+        default=[4, 8, 16],
+        help="Page counts of the papers served, e.g. 4,8,16.",
+    )
+    parser.add_argument(
+        "--script",
+        type=Path,
+        default=None,
+        help="JSON file with the steps of the agent (see benchmarks.stand_ins.DEFAULT_SCRIPT).",
+    )
+    parser.add_argument(
+        "--warm-cache",
+        action="store_true",
+        help="Reuse the same searches and papers across runs, to measure cache hits.",
+    )
+    parser.add_argument(
+        "--verbose", action="store_true", help="Show the logs of the backend."
+    )
+    parser.add_argument(
+        "--json", type=Path, default=None, help="Write the report to a JSON file."
+    )
+    args = parser.parse_args()
+
+    script = json.loads(args.script.read_text()) if args.script else DEFAULT_SCRIPT
+    if args.warm_cache:
+        script = json.loads(json.dumps(script).replace("{nonce}", "cached"))
+
+    with StandIns(
+        args.llm_latency,
+        args.search_latency,
+        args.download_latency,
+        script,
+        args.paper_pages,
+    ) as stand_ins, tempfile.TemporaryDirectory(prefix="nexusai-benchmark-") as tmp:
+        # The backend reads its configuration on import
+        for name in (
+            "AZURE_OPENAI_API_KEY",
+            "AZURE_OPENAI_ENDPOINT",
+            "PROMETHEUS_MULTIPROC_DIR",
+        ):
+            os.environ.pop(name, None)
+        os.environ.update(stand_ins.environ())
+        os.environ.setdefault("REDIS_URL", "redis://localhost:6379")
+        os.environ.setdefault("NEXTAUTH_SECRET", "benchmark")
+        os.environ.setdefault("FRONTEND_URL", "http://localhost:3000")
+        os.environ.setdefault("TRACES_DIR", os.path.join(tmp, "traces"))
+
+        from nexusai.cache.connection import get_redis_client
+
+        if not args.verbose:
+            logging.getLogger("nexusai").setLevel(logging.WARNING)
+
+        get_redis_client().ping()
+        report = asyncio.run(benchmark(args, stand_ins))
+
+    print_report(report)
+    if args.json:
+        args.json.write_text(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
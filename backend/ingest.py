@@ -0,0 +1,175 @@
+"""Ingest a list of papers offline.
+
+Reads one URL per line, processes the papers with `process_paper` and appends the results to a JSONL file.
+Completed URLs are checkpointed, so reruns skip them and only retry the papers that failed.
+
+Usage:
+    python ingest.py urls.txt --output papers.jsonl --concurrency 8
+"""
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+import argparse
+import asyncio
+import logging
+import sys
+import time
+from pathlib import Path
+
+from nexusai.chat import process_paper
+from nexusai.config import validate_config
+from nexusai.utils.logger import logger
+from nexusai.utils.strings import canonicalize_url
+from nexusai.utils.timing import Timings, collect_timings
+
+
+class IngestionStats:
+    """Throughput, cache and stage statistics of an ingestion run."""
+
+    def __init__(self, total: int):
+        self.total = total
+        self.num_completed = 0
+        self.num_failed = 0
+        self.start_time = time.perf_counter()
+        self.timings = Timings()
+
+    def add(self, timings: Timings, success: bool) -> None:
+        self.timings.merge(timings)
+        if success:
+            self.num_completed += 1
+        else:
+            self.num_failed += 1
+
+    def report(self) -> str:
+        processed = self.num_completed + self.num_failed
+        elapsed_minutes = (time.perf_counter() - self.start_time) / 60
+        papers_per_minute = processed / elapsed_minutes if elapsed_minutes else 0.0
+
+        counters = self.timings.counters
+        lookups = counters["paper_cache_hit"] + counters["paper_cache_miss"]
+        hit_rate = counters["paper_cache_hit"] / lookups if lookups else 0.0
+
+        stages = ", ".join(
+            f"{stage} {seconds / processed:.2f}s"
+            for stage, seconds in sorted(self.timings.stages.items())
+        )
+        return (
+            f"{processed}/{self.total} papers ({self.num_failed} failed) | "
+            f"{papers_per_minute:.1f} papers/min | cache hit rate {hit_rate:.0%}"
+            + (f" | avg per paper: {stages}" if processed else "")
+        )
+
+
+def read_urls(path: Path) -> list[str]:
+    """Read the unique canonical URLs of a file, one per line."""
+    lines = path.read_text().splitlines()
+    urls = [canonicalize_url(line) for line in lines if line.strip()]
+    return list(dict.fromkeys(urls))
+
+
+def read_checkpoint(path: Path) -> set[str]:
+    """Read the URLs completed by previous runs."""
+    if not path.exists():
+        return set()
+    return {line.strip() for line in path.read_text().splitlines() if line.strip()}
+
+
+async def ingest(
+    urls: list[str],
+    output_path: Path,
+    checkpoint_path: Path,
+    concurrency: int,
+    report_interval: float,
+) -> IngestionStats:
+    """Process papers concurrently, writing results and checkpoints as they complete."""
+    stats = IngestionStats(len(urls))
+    semaphore = asyncio.Semaphore(concurrency)
+
+    with output_path.open("a") as output, checkpoint_path.open("a") as checkpoint:
+
+        async def process(url: str):
+            async with semaphore:
+                with collect_timings() as timings:
+                    try:
+                        paper = await process_paper(url)
+                    except Exception as e:
+                        logger.error(f"Error processing paper {url}: {e}")
+                        paper = None
+
+            stats.add(timings, success=paper is not None)
+            if paper:
+                output.write(paper.model_dump_json() + "\n")
+                output.flush()
+                checkpoint.write(url + "\n")
+                checkpoint.flush()
+
+        async def report():
+            while True:
+                await asyncio.sleep(report_interval)
+                print(stats.report(), file=sys.stderr)
+
+        reporter = asyncio.create_task(report())
+        try:
+            await asyncio.gather(*[process(url) for url in urls])
+        finally:
+            reporter.cancel()
+
+    return stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Ingest papers from a list of URLs.")
+    parser.add_argument("input", type=Path, help="File with one paper URL per line.")
+    parser.add_argument(
+        "--output", type=Path, default=Path("papers.jsonl"), help="JSONL output file."
+    )
+    parser.add_argument(
+        "--checkpoint",
+        type=Path,
+        default=None,
+        help="File tracking completed URLs. Defaults to the output file with a .checkpoint suffix.",
+    )
+    parser.add_argument(
+        "--concurrency", type=int, default=4, help="Papers processed concurrently."
+    )
+    parser.add_argument(
+        "--report-interval",
+        type=float,
+        default=10.0,
+        help="Seconds between progress reports.",
+    )
+    parser.add_argument(
+        "--verbose", action="store_true", help="Show the backend info logs."
+    )
+    args = parser.parse_args()
+
+    if not args.verbose:
+        logger.setLevel(logging.WARNING)
+    validate_config()
+
+    checkpoint_path = args.checkpoint or args.output.with_suffix(".checkpoint")
+    urls = read_urls(args.input)
+    completed = read_checkpoint(checkpoint_path)
+    pending = [url for url in urls if url not in completed]
+    print(
+        f"{len(urls)} unique URLs, {len(urls) - len(pending)} already completed, {len(pending)} to process",
+        file=sys.stderr,
+    )
+
+    stats = asyncio.run(
+        ingest(
+            pending,
+            args.output,
+            checkpoint_path,
+            args.concurrency,
+            args.report_interval,
+        )
+    )
+    print(stats.report(), file=sys.stderr)
+    sys.exit(1 if stats.num_failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -5,6 +5,6 @@ load_dotenv()
 from server.server import app
 
 if __name__ == "__main__":
-    import uvicorn
+    from server.launcher import run
 
-    uvicorn.run(app, host="0.0.0.0", port=8000)
+    run()
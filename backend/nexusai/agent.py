@@ -1,8 +1,11 @@
+from langchain_core.messages import BaseMessage
 from langsmith import traceable
+from nexusai.cache.checkpointer import get_checkpointer
 from nexusai.models.llm import ModelProviderType, ProviderDetails
 from nexusai.models.outputs import AgentMessage
 from nexusai.tools.functions import setup_tools
-from nexusai.utils.messages import build_messages
+from nexusai.utils.profiler import profile_run
+from nexusai.utils.tracing import trace_run
 from nexusai.workflow.graph import ResearchWorkflow
 from nexusai.workflow.nodes import WorkflowNodes
 
@@ -10,19 +13,52 @@ from nexusai.workflow.nodes import WorkflowNodes
 @traceable()
 async def process_query(
     query: str,
-    history: list[AgentMessage] = [],
+    messages: list[BaseMessage] = [],
     message_callback=None,
     custom_instructions: list[str] = [],
     model_provider: ModelProviderType = ModelProviderType.default,
     provider_details: ProviderDetails | None = None,
+    session_id: str | None = None,
+    run_id: str | None = None,
+    resume: bool = False,
+    user_id: str | None = None,
 ) -> AgentMessage:
-    """Process a query and return the result. It allows passing previous messages to ask follow-up questions."""
+    """Process a query and return the result. It allows passing previous messages to ask follow-up questions.
+
+    The previous messages are expected to be already converted to langchain messages, so that callers holding a
+    long-lived session only convert each message once.
+
+    When a session and run id are given, the run is checkpointed so that an interrupted run can be resumed
+    from its last completed node by passing `resume=True`. The `user_id` shares the tool calls fairly between users.
+    The run is profiled when an admin enabled profiling for its session or for a sample of the runs.
+    Its nodes, LLM calls, tool calls, cache lookups and downloads are traced unless tracing is disabled.
+    """
     # Setup workflow
     tools = setup_tools(query)
     nodes = WorkflowNodes(tools, custom_instructions, model_provider, provider_details)
-    workflow = ResearchWorkflow(nodes)
+    workflow = ResearchWorkflow(nodes, get_checkpointer())
 
     # Process the query using the agent's workflow
-    messages = build_messages(history)
-    result = await workflow.process_query(query, messages, message_callback)
+    # Runs are namespaced by user like their sessions, so that another user cannot resume them
+    thread_id = (
+        f"{user_id or 'anonymous'}:{session_id}:{run_id}"
+        if session_id and run_id
+        else None
+    )
+    async with trace_run(
+        "research",
+        session_id=session_id,
+        run_id=run_id,
+        user_id=user_id,
+        resume=resume,
+        query=query[:200],
+    ), profile_run(session_id, run_id):
+        result = await workflow.process_query(
+            query,
+            messages,
+            message_callback,
+            thread_id=thread_id,
+            resume=resume,
+            user_id=user_id,
+        )
     return result
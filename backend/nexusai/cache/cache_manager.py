@@ -1,10 +1,12 @@
 import hashlib
 import json
 
-import redis
-from nexusai.config import REDIS_URL
+from nexusai.cache.connection import get_redis_client
 from nexusai.models.inputs import SearchPapersInput
+from nexusai.models.outputs import PaperOutput
 from nexusai.utils.logger import logger
+from nexusai.utils.metrics import CACHE_REQUESTS
+from nexusai.utils.tracing import span
 
 
 class CacheManager:
@@ -12,44 +14,53 @@ class CacheManager:
 
     def __init__(self, provider: str = ""):
         self.provider = provider
-        if not REDIS_URL:
-            raise ValueError("Redis is not enabled.")
-
-        try:
-            if REDIS_URL.startswith("rediss://"):
-                # SSL enabled
-                kwargs = {
-                    "decode_responses": False,
-                    "ssl_cert_reqs": None,
-                }
-            else:
-                kwargs = {"decode_responses": False}
-            self.redis = redis.Redis.from_url(REDIS_URL, **kwargs)
-        except redis.exceptions.ConnectionError as e:
-            raise Exception(f"Failed to connect to Redis. Reason: {e}")
+        self.redis = get_redis_client()
 
     def __generate_key(self, url: str) -> str:
         """Generate a unique key based on URL."""
         return f"url:{self.provider}:{hashlib.sha256(url.encode()).hexdigest()}"
 
-    def get_content(self, url: str) -> list[str] | None:
-        """Retrieve cached content for a URL."""
+    def __get(self, key: str) -> bytes | None:
+        """Get a key, counting and tracing the hits and misses per key type (its prefix)."""
+        key_type = key.split(":", 1)[0]
+        with span("cache get", "client", key_type=key_type) as current:
+            data = self.redis.get(key)
+            if current:
+                current.set(hit=data is not None)
+        CACHE_REQUESTS.labels(key_type, "hit" if data else "miss").inc()
+        return data
+
+    def get_content(self, url: str) -> list[list[tuple[str, str]]] | None:
+        """Retrieve the cached pages of a URL, as parts labelled with their section."""
         key = self.__generate_key(url)
-        data = self.redis.get(key)
-        return json.loads(data) if data else None
+        data = self.__get(key)
+        if not data:
+            return None
+        # Pages cached before they were labelled are plain text
+        return [
+            (
+                [("body", page)]
+                if isinstance(page, str)
+                else [tuple(part) for part in page]
+            )
+            for page in json.loads(data)
+        ]
 
     def store_content(
-        self, url: str, content: list[str], expire_seconds: int = 86400 * 7
+        self,
+        url: str,
+        content: list[list[tuple[str, str]]],
+        expire_seconds: int = 86400 * 7,
     ) -> None:
-        """Store content in cache."""
-        logger.info(f"Storing content in cache for {url}")
+        """Store the pages of a URL in cache, as parts labelled with their section."""
+        logger.info("Storing content in cache for %s", url, extra={"category": "cache"})
         key = self.__generate_key(url)
         self.redis.set(key, json.dumps(content), ex=expire_seconds)
 
     def get_search_results(self, input: SearchPapersInput) -> str | None:
         """Retrieve cached search results."""
         key = f"search:{self.provider}:{hashlib.sha256(input.model_dump_json().encode()).hexdigest()}"
-        data = self.redis.get(key)
+        data = self.__get(key)
         return json.loads(data) if data else None
 
     def store_search_results(
@@ -57,7 +68,37 @@ class CacheManager:
     ) -> None:
         """Cache search results."""
         logger.info(
-            f"Storing search results for provider '{self.provider}' and input '{input.model_dump_json()}'"
+            "Storing search results for provider '%s' and input '%s'",
+            self.provider,
+            input,
+            extra={"category": "cache"},
         )
         key = f"search:{self.provider}:{hashlib.sha256(input.model_dump_json().encode()).hexdigest()}"
         self.redis.set(key, json.dumps(results), ex=expire_seconds)
+
+    def get_paper(self, url: str) -> PaperOutput | None:
+        """Retrieve the cached paper created from a URL."""
+        key = f"paper:{self.provider}:{hashlib.sha256(url.encode()).hexdigest()}"
+        data = self.__get(key)
+        return PaperOutput.model_validate_json(data) if data else None
+
+    def store_paper(
+        self, url: str, paper: PaperOutput, expire_seconds: int = 86400 * 7
+    ) -> None:
+        """Cache the paper created from a URL."""
+        logger.info("Storing paper in cache for %s", url, extra={"category": "cache"})
+        key = f"paper:{self.provider}:{hashlib.sha256(url.encode()).hexdigest()}"
+        self.redis.set(key, paper.model_dump_json(), ex=expire_seconds)
+
+    def get_chunk_summary(self, content: str) -> str | None:
+        """Retrieve the cached summary of a chunk of content."""
+        key = f"chunk_summary:{self.provider}:{hashlib.sha256(content.encode()).hexdigest()}"
+        data = self.__get(key)
+        return json.loads(data) if data else None
+
+    def store_chunk_summary(
+        self, content: str, summary: str, expire_seconds: int = 86400 * 7
+    ) -> None:
+        """Cache the summary of a chunk of content, keyed by its hash."""
+        key = f"chunk_summary:{self.provider}:{hashlib.sha256(content.encode()).hexdigest()}"
+        self.redis.set(key, json.dumps(summary), ex=expire_seconds)
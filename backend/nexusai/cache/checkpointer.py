@@ -0,0 +1,330 @@
+import asyncio
+import random
+import time
+from functools import lru_cache, partial
+from typing import Any, AsyncIterator, Iterator, Optional, Sequence
+
+from langchain_core.runnables import RunnableConfig
+from langgraph.checkpoint.base import (
+    WRITES_IDX_MAP,
+    BaseCheckpointSaver,
+    ChannelVersions,
+    Checkpoint,
+    CheckpointMetadata,
+    CheckpointTuple,
+    get_checkpoint_id,
+)
+from langgraph.checkpoint.serde.types import TASKS
+from nexusai.cache.connection import get_redis_client
+from nexusai.config import CHECKPOINT_MAX_BYTES, CHECKPOINT_MAX_PER_RUN, CHECKPOINT_TTL
+from nexusai.utils.logger import logger
+
+
+class RedisCheckpointSaver(BaseCheckpointSaver[str]):
+    """Stores langgraph checkpoints in Redis so interrupted runs can be resumed.
+
+    Memory is kept bounded in three ways: every key expires after `CHECKPOINT_TTL` seconds,
+    only the latest `CHECKPOINT_MAX_PER_RUN` checkpoints of a run are kept, and checkpoints
+    larger than `CHECKPOINT_MAX_BYTES` are not stored (the run then resumes from the previous one).
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.redis = get_redis_client()
+
+    @staticmethod
+    def __prefix(thread_id: str, checkpoint_ns: str) -> str:
+        return f"checkpoint:{thread_id}:{checkpoint_ns}"
+
+    def __index_key(self, thread_id: str, checkpoint_ns: str) -> str:
+        return f"{self.__prefix(thread_id, checkpoint_ns)}:index"
+
+    def __checkpoint_key(
+        self, thread_id: str, checkpoint_ns: str, checkpoint_id: str
+    ) -> str:
+        return f"{self.__prefix(thread_id, checkpoint_ns)}:{checkpoint_id}"
+
+    def __writes_key(
+        self, thread_id: str, checkpoint_ns: str, checkpoint_id: str
+    ) -> str:
+        return f"{self.__prefix(thread_id, checkpoint_ns)}:{checkpoint_id}:writes"
+
+    def __load_writes(
+        self, thread_id: str, checkpoint_ns: str, checkpoint_id: str
+    ) -> list[tuple[str, str, Any]]:
+        """Load the pending writes of a checkpoint as (task_id, channel, value) tuples."""
+        data = self.redis.hgetall(
+            self.__writes_key(thread_id, checkpoint_ns, checkpoint_id)
+        )
+        writes = []
+        for field in sorted(data):
+            task_id, channel, type_, _ = field.decode().split("|")
+            writes.append(
+                (task_id, channel, self.serde.loads_typed((type_, data[field])))
+            )
+        return writes
+
+    def __load_tuple(
+        self, thread_id: str, checkpoint_ns: str, checkpoint_id: str
+    ) -> CheckpointTuple | None:
+        """Load a checkpoint tuple from Redis."""
+        data = self.redis.hgetall(
+            self.__checkpoint_key(thread_id, checkpoint_ns, checkpoint_id)
+        )
+        if not data:
+            return None
+
+        parent_checkpoint_id = data.get(b"parent", b"").decode() or None
+        sends = (
+            [
+                value
+                for _, channel, value in self.__load_writes(
+                    thread_id, checkpoint_ns, parent_checkpoint_id
+                )
+                if channel == TASKS
+            ]
+            if parent_checkpoint_id
+            else []
+        )
+        checkpoint = self.serde.loads_typed(
+            (data[b"checkpoint_type"].decode(), data[b"checkpoint"])
+        )
+        metadata = self.serde.loads_typed(
+            (data[b"metadata_type"].decode(), data[b"metadata"])
+        )
+        return CheckpointTuple(
+            config={
+                "configurable": {
+                    "thread_id": thread_id,
+                    "checkpoint_ns": checkpoint_ns,
+                    "checkpoint_id": checkpoint_id,
+                }
+            },
+            checkpoint={**checkpoint, "pending_sends": sends},
+            metadata=metadata,
+            pending_writes=self.__load_writes(thread_id, checkpoint_ns, checkpoint_id),
+            parent_config=(
+                {
+                    "configurable": {
+                        "thread_id": thread_id,
+                        "checkpoint_ns": checkpoint_ns,
+                        "checkpoint_id": parent_checkpoint_id,
+                    }
+                }
+                if parent_checkpoint_id
+                else None
+            ),
+        )
+
+    def get_tuple(self, config: RunnableConfig) -> Optional[CheckpointTuple]:
+        """Get the requested checkpoint, or the latest one of the thread."""
+        thread_id = config["configurable"]["thread_id"]
+        checkpoint_ns = config["configurable"].get("checkpoint_ns", "")
+        checkpoint_id = get_checkpoint_id(config)
+        if not checkpoint_id:
+            latest = self.redis.zrevrange(
+                self.__index_key(thread_id, checkpoint_ns), 0, 0
+            )
+            if not latest:
+                return None
+            checkpoint_id = latest[0].decode()
+        return self.__load_tuple(thread_id, checkpoint_ns, checkpoint_id)
+
+    def list(
+        self,
+        config: Optional[RunnableConfig],
+        *,
+        filter: Optional[dict[str, Any]] = None,
+        before: Optional[RunnableConfig] = None,
+        limit: Optional[int] = None,
+    ) -> Iterator[CheckpointTuple]:
+        """List the checkpoints of a thread from the newest to the oldest."""
+        if not config:
+            raise ValueError("Listing checkpoints requires a thread id.")
+
+        thread_id = config["configurable"]["thread_id"]
+        checkpoint_ns = config["configurable"].get("checkpoint_ns", "")
+        config_checkpoint_id = get_checkpoint_id(config)
+        before_checkpoint_id = get_checkpoint_id(before) if before else None
+        for item in self.redis.zrevrange(
+            self.__index_key(thread_id, checkpoint_ns), 0, -1
+        ):
+            checkpoint_id = item.decode()
+            if config_checkpoint_id and checkpoint_id != config_checkpoint_id:
+                continue
+            if before_checkpoint_id and checkpoint_id >= before_checkpoint_id:
+                continue
+            if limit is not None and limit <= 0:
+                break
+
+            checkpoint_tuple = self.__load_tuple(
+                thread_id, checkpoint_ns, checkpoint_id
+            )
+            if not checkpoint_tuple or (
+                filter
+                and not all(
+                    checkpoint_tuple.metadata.get(key) == value
+                    for key, value in filter.items()
+                )
+            ):
+                continue
+
+            if limit is not None:
+                limit -= 1
+            yield checkpoint_tuple
+
+    def put(
+        self,
+        config: RunnableConfig,
+        checkpoint: Checkpoint,
+        metadata: CheckpointMetadata,
+        new_versions: ChannelVersions,
+    ) -> RunnableConfig:
+        """Store a checkpoint, evicting the oldest ones of the thread."""
+        thread_id = config["configurable"]["thread_id"]
+        checkpoint_ns = config["configurable"]["checkpoint_ns"]
+        next_config = {
+            "configurable": {
+                "thread_id": thread_id,
+                "checkpoint_ns": checkpoint_ns,
+                "checkpoint_id": checkpoint["id"],
+            }
+        }
+
+        c = checkpoint.copy()
+        c.pop("pending_sends")  # type: ignore[misc]
+        checkpoint_type, checkpoint_bytes = self.serde.dumps_typed(c)
+        if len(checkpoint_bytes) > CHECKPOINT_MAX_BYTES:
+            logger.warning(
+                f"Checkpoint {checkpoint['id']} of thread {thread_id} is {len(checkpoint_bytes)} bytes, "
+                f"above the {CHECKPOINT_MAX_BYTES} bytes limit. Skipping it."
+            )
+            # The next checkpoint then links to the last stored one, so that its parent exists
+            return config
+        metadata_type, metadata_bytes = self.serde.dumps_typed(metadata)
+
+        index_key = self.__index_key(thread_id, checkpoint_ns)
+        checkpoint_key = self.__checkpoint_key(
+            thread_id, checkpoint_ns, checkpoint["id"]
+        )
+        with self.redis.pipeline(transaction=True) as pipe:
+            pipe.hset(
+                checkpoint_key,
+                mapping={
+                    "checkpoint_type": checkpoint_type,
+                    "checkpoint": checkpoint_bytes,
+                    "metadata_type": metadata_type,
+                    "metadata": metadata_bytes,
+                    "parent": config["configurable"].get("checkpoint_id") or "",
+                },
+            )
+            pipe.expire(checkpoint_key, CHECKPOINT_TTL)
+            pipe.zadd(index_key, {checkpoint["id"]: time.time()})
+            pipe.expire(index_key, CHECKPOINT_TTL)
+            pipe.zrange(index_key, 0, -CHECKPOINT_MAX_PER_RUN - 1)
+            pipe.zremrangebyrank(index_key, 0, -CHECKPOINT_MAX_PER_RUN - 1)
+            evicted = pipe.execute()[4]
+
+        if evicted:
+            keys = []
+            for item in evicted:
+                keys.append(
+                    self.__checkpoint_key(thread_id, checkpoint_ns, item.decode())
+                )
+                keys.append(self.__writes_key(thread_id, checkpoint_ns, item.decode()))
+            self.redis.delete(*keys)
+        return next_config
+
+    def put_writes(
+        self,
+        config: RunnableConfig,
+        writes: Sequence[tuple[str, Any]],
+        task_id: str,
+    ) -> None:
+        """Store the intermediate writes of a task linked to a checkpoint."""
+        writes_key = self.__writes_key(
+            config["configurable"]["thread_id"],
+            config["configurable"]["checkpoint_ns"],
+            config["configurable"]["checkpoint_id"],
+        )
+        mapping = {}
+        for idx, (channel, value) in enumerate(writes):
+            type_, value_bytes = self.serde.dumps_typed(value)
+            idx = WRITES_IDX_MAP.get(channel, idx)
+            mapping[f"{task_id}|{channel}|{type_}|{idx}"] = value_bytes
+
+        with self.redis.pipeline(transaction=True) as pipe:
+            pipe.hset(writes_key, mapping=mapping)
+            pipe.expire(writes_key, CHECKPOINT_TTL)
+            pipe.execute()
+
+    def delete_thread(self, thread_id: str, checkpoint_ns: str = "") -> None:
+        """Delete all checkpoints of a thread, e.g. once its run has completed."""
+        index_key = self.__index_key(thread_id, checkpoint_ns)
+        keys = [index_key]
+        for item in self.redis.zrange(index_key, 0, -1):
+            keys.append(self.__checkpoint_key(thread_id, checkpoint_ns, item.decode()))
+            keys.append(self.__writes_key(thread_id, checkpoint_ns, item.decode()))
+        self.redis.delete(*keys)
+
+    async def aget_tuple(self, config: RunnableConfig) -> Optional[CheckpointTuple]:
+        return await asyncio.get_running_loop().run_in_executor(
+            None, self.get_tuple, config
+        )
+
+    async def alist(
+        self,
+        config: Optional[RunnableConfig],
+        *,
+        filter: Optional[dict[str, Any]] = None,
+        before: Optional[RunnableConfig] = None,
+        limit: Optional[int] = None,
+    ) -> AsyncIterator[CheckpointTuple]:
+        checkpoint_tuples = await asyncio.get_running_loop().run_in_executor(
+            None,
+            lambda: list(self.list(config, filter=filter, before=before, limit=limit)),
+        )
+        for checkpoint_tuple in checkpoint_tuples:
+            yield checkpoint_tuple
+
+    async def aput(
+        self,
+        config: RunnableConfig,
+        checkpoint: Checkpoint,
+        metadata: CheckpointMetadata,
+        new_versions: ChannelVersions,
+    ) -> RunnableConfig:
+        return await asyncio.get_running_loop().run_in_executor(
+            None, self.put, config, checkpoint, metadata, new_versions
+        )
+
+    async def aput_writes(
+        self,
+        config: RunnableConfig,
+        writes: Sequence[tuple[str, Any]],
+        task_id: str,
+    ) -> None:
+        return await asyncio.get_running_loop().run_in_executor(
+            None, self.put_writes, config, writes, task_id
+        )
+
+    async def adelete_thread(self, thread_id: str, checkpoint_ns: str = "") -> None:
+        return await asyncio.get_running_loop().run_in_executor(
+            None, partial(self.delete_thread, thread_id, checkpoint_ns)
+        )
+
+    def get_next_version(self, current: Optional[str], channel: Any) -> str:
+        """Generate monotonically increasing channel versions, like the in-memory saver."""
+        if current is None:
+            current_v = 0
+        elif isinstance(current, int):
+            current_v = current
+        else:
+            current_v = int(current.split(".")[0])
+        return f"{current_v + 1:032}.{random.random():016}"
+
+
+@lru_cache(maxsize=1)
+def get_checkpointer() -> RedisCheckpointSaver:
+    """Return the process-wide checkpointer."""
+    return RedisCheckpointSaver()
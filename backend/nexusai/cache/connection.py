@@ -0,0 +1,35 @@
+from functools import lru_cache
+
+import redis
+import redis.asyncio
+from nexusai.config import REDIS_URL
+
+
+def _connection_kwargs() -> dict:
+    """Build the Redis connection arguments for the configured URL."""
+    if not REDIS_URL:
+        raise ValueError("Redis is not enabled.")
+
+    kwargs = {"decode_responses": False}
+    if REDIS_URL.startswith("rediss://"):
+        # SSL enabled
+        kwargs["ssl_cert_reqs"] = None
+    return kwargs
+
+
+@lru_cache(maxsize=1)
+def get_redis_client() -> redis.Redis:
+    """Return the process-wide Redis client, sharing one connection pool."""
+    try:
+        return redis.Redis.from_url(REDIS_URL, **_connection_kwargs())
+    except redis.exceptions.ConnectionError as e:
+        raise Exception(f"Failed to connect to Redis. Reason: {e}")
+
+
+@lru_cache(maxsize=1)
+def get_async_redis_client() -> redis.asyncio.Redis:
+    """Return the process-wide asyncio Redis client used by the server."""
+    try:
+        return redis.asyncio.Redis.from_url(REDIS_URL, **_connection_kwargs())
+    except redis.exceptions.ConnectionError as e:
+        raise Exception(f"Failed to connect to Redis. Reason: {e}")
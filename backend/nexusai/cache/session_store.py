@@ -0,0 +1,113 @@
+import asyncio
+import json
+import time
+from uuid import uuid4
+
+from nexusai.cache.connection import get_async_redis_client
+from nexusai.config import (
+    CHECKPOINT_TTL,
+    SESSION_HISTORY_LIMIT,
+    SESSION_MAX_MESSAGES,
+    SESSION_MAX_RUNS,
+    SESSION_TTL,
+)
+from nexusai.models.outputs import AgentMessage
+from nexusai.utils.logger import logger
+
+
+class SessionStore:
+    """Stores the conversation history of a research session in Redis.
+
+    Messages are appended one at a time, so clients only need to send the new query
+    and any worker can resume the session after a reconnect. Sessions are namespaced by
+    user, so that a session id sent by another user does not reach the same history.
+    """
+
+    def __init__(self, session_id: str, user_id: str):
+        self.session_id = session_id
+        self.user_id = user_id
+        self.key = f"session:{user_id}:{session_id}:messages"
+        # Runs not completed yet, by run id, so that each of the runs started in parallel can be resumed
+        self.runs_key = f"session:{user_id}:{session_id}:runs"
+        self.redis = get_async_redis_client()
+        # Runs in progress through this store, which are not resumed a second time
+        self.active_runs: set[str] = set()
+        self.runs_lock = asyncio.Lock()
+
+    async def length(self) -> int:
+        """Return the number of messages stored for the session."""
+        return await self.redis.llen(self.key)
+
+    async def load(self, limit: int = SESSION_HISTORY_LIMIT) -> list[AgentMessage]:
+        """Load the most recent messages of the session."""
+        data = await self.redis.lrange(self.key, -limit, -1)
+        return [AgentMessage.model_validate_json(item) for item in data]
+
+    async def append(self, *messages: AgentMessage) -> int:
+        """Append messages to the session, returning the new session length."""
+        async with self.redis.pipeline(transaction=True) as pipe:
+            pipe.rpush(
+                self.key,
+                *[message.model_dump_json(exclude={"urls"}) for message in messages],
+            )
+            pipe.ltrim(self.key, -SESSION_MAX_MESSAGES, -1)
+            pipe.expire(self.key, SESSION_TTL)
+            length, *_ = await pipe.execute()
+        return length
+
+    async def seed(self, messages: list[AgentMessage]) -> bool:
+        """Initialize an empty session with a client-provided history.
+
+        Existing sessions are left untouched, since the server copy is authoritative.
+        """
+        if not messages or await self.length():
+            return False
+
+        logger.info(f"Seeding session {self.session_id} with {len(messages)} messages")
+        await self.append(*messages[-SESSION_MAX_MESSAGES:])
+        return True
+
+    async def start_run(self, query: str) -> tuple[str, bool]:
+        """Start a run for the query, returning its id and whether it resumes an interrupted run.
+
+        A run is interrupted when it did not complete, e.g. because the client disconnected or the worker
+        restarted. Asking the same query again resumes it from its checkpoints. Every run must be ended with
+        `finish_run`.
+        """
+        async with self.runs_lock:
+            runs = {
+                run_id.decode(): json.loads(data)
+                for run_id, data in (await self.redis.hgetall(self.runs_key)).items()
+            }
+            for run_id, run in runs.items():
+                if run_id not in self.active_runs and run["query"] == query:
+                    logger.info(f"Resuming run {run_id} of session {self.session_id}")
+                    self.active_runs.add(run_id)
+                    return run_id, True
+
+            run_id = uuid4().hex
+            self.active_runs.add(run_id)
+
+        # Forget the oldest interrupted runs beyond the limit
+        interrupted = sorted(
+            (run_id for run_id in runs if run_id not in self.active_runs),
+            key=lambda run_id: runs[run_id]["started_at"],
+        )
+        evicted = interrupted[: max(len(runs) + 1 - SESSION_MAX_RUNS, 0)]
+        async with self.redis.pipeline(transaction=True) as pipe:
+            pipe.hset(
+                self.runs_key,
+                run_id,
+                json.dumps({"query": query, "started_at": time.time()}),
+            )
+            if evicted:
+                pipe.hdel(self.runs_key, *evicted)
+            pipe.expire(self.runs_key, CHECKPOINT_TTL)
+            await pipe.execute()
+        return run_id, False
+
+    async def finish_run(self, run_id: str, completed: bool = True) -> None:
+        """End a run. Completed runs are forgotten, the others can be resumed by asking the same query again."""
+        self.active_runs.discard(run_id)
+        if completed:
+            await self.redis.hdel(self.runs_key, run_id)
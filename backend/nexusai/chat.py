@@ -1,47 +1,122 @@
 import asyncio
 
 from langchain_core.messages import SystemMessage
-from langchain_openai import AzureChatOpenAI, ChatOpenAI
+from langchain_text_splitters import RecursiveCharacterTextSplitter
 from langsmith import traceable
-from nexusai.config import LLM_PROVIDER
-from nexusai.models.llm import ModelProviderType
+from nexusai.cache.cache_manager import CacheManager
+from nexusai.config import PAPER_CHUNK_PAGES, PAPER_CHUNKED_MIN_PAGES
+from nexusai.llm.pool import PooledLLM, get_llm
 from nexusai.models.outputs import PaperOutput
-from nexusai.prompts.chat_prompts import create_paper_prompt
+from nexusai.prompts.chat_prompts import (
+    create_paper_prompt,
+    reduce_paper_prompt,
+    summarize_chunk_prompt,
+)
 from nexusai.tools.paper_downloader import PaperDownloader
 from nexusai.utils.logger import logger
+from nexusai.utils.strings import canonicalize_url
+from nexusai.utils.timing import count, timed
+
+
+async def summarize_chunk(
+    llm: PooledLLM,
+    cache_manager: CacheManager,
+    url: str,
+    chunk: str,
+    part: int,
+    total_parts: int,
+) -> str:
+    """Summarize a group of pages of a paper, reusing the cached summary of identical content."""
+    if summary := await asyncio.to_thread(cache_manager.get_chunk_summary, chunk):
+        count("chunk_cache_hit")
+        return summary
+    count("chunk_cache_miss")
+
+    system_prompt = SystemMessage(
+        content=summarize_chunk_prompt.format(
+            url=url, part=part, total_parts=total_parts, content=chunk
+        )
+    )
+    response = await llm.ainvoke([system_prompt], node="paper")
+    await asyncio.to_thread(cache_manager.store_chunk_summary, chunk, response.content)
+    return response.content
+
+
+async def summarize_in_chunks(
+    llm: PooledLLM, cache_manager: CacheManager, url: str, content: str
+) -> PaperOutput:
+    """Summarize groups of pages concurrently, then combine the summaries into the paper.
+
+    The latency depends on the size of a chunk rather than on the length of the paper.
+    """
+    text_splitter = RecursiveCharacterTextSplitter(
+        chunk_size=PaperDownloader.chars_per_page * PAPER_CHUNK_PAGES, chunk_overlap=0
+    )
+    chunks = text_splitter.split_text(content)
+    logger.info(
+        "Summarizing %s in %s chunks", url, len(chunks), extra={"category": "download"}
+    )
+    with timed("summarize_chunks"):
+        summaries = await asyncio.gather(
+            *[
+                summarize_chunk(llm, cache_manager, url, chunk, i + 1, len(chunks))
+                for i, chunk in enumerate(chunks)
+            ]
+        )
+
+    system_prompt = SystemMessage(
+        content=reduce_paper_prompt.format(
+            url=url,
+            summaries="\n\n".join(
+                f"## Part {i + 1}\n\n{summary}" for i, summary in enumerate(summaries)
+            ),
+        )
+    )
+    with timed("summarize_reduce"):
+        return await llm.with_structured_output(PaperOutput).ainvoke(
+            [system_prompt], node="paper"
+        )
 
 
 @traceable()
 async def process_paper(url: str) -> PaperOutput | None:
-    """Process a paper URL and generate a structured response using GPT-4."""
-    logger.info(f"Creating paper for URL: {url}")
-
-    # Initialize the LLM
-    if LLM_PROVIDER == ModelProviderType.openai:
-        llm = ChatOpenAI(model="gpt-4o-mini", temperature=0.0, max_tokens=16384)
-    elif LLM_PROVIDER == ModelProviderType.azureopenai:
-        llm = AzureChatOpenAI(
-            azure_deployment="gpt-4o-mini", temperature=0.0, max_tokens=16384
-        )
-    else:
-        raise ValueError(f"Invalid LLM provider: {LLM_PROVIDER}")
+    """Process a paper URL and generate a structured response using GPT-4.
+
+    Papers are cached by canonical URL, so the same paper is only summarized once.
+    """
+    logger.info("Creating paper for URL: %s", url, extra={"category": "download"})
+    cache_manager = CacheManager()
+    canonical_url = canonicalize_url(url)
+    with timed("paper_cache"):
+        paper = await asyncio.to_thread(cache_manager.get_paper, canonical_url)
+    if paper:
+        logger.info("Found cached paper for %s", url, extra={"category": "cache"})
+        count("paper_cache_hit")
+        return paper.model_copy(update={"url": url})
+    count("paper_cache_miss")
+
+    llm = get_llm("small")
 
     # Download paper handling failed requests
     try:
         downloader = PaperDownloader(query=None)
-        content = await asyncio.get_event_loop().run_in_executor(
-            None, downloader.download, url
-        )
+        with timed("download"):
+            content = await downloader.adownload(url)
         if not content:
             return
     except Exception as e:
         logger.error(f"Error downloading paper: {e}")
         return
 
-    system_prompt = SystemMessage(
-        content=create_paper_prompt.format(url=url, content=content)
-    )
-
-    # Invoke the LLM
-    structured_llm = llm.with_structured_output(PaperOutput)
-    return await structured_llm.ainvoke([system_prompt])
+    # Invoke the LLM, splitting long papers in chunks summarized concurrently
+    if len(content) > PaperDownloader.chars_per_page * PAPER_CHUNKED_MIN_PAGES:
+        paper = await summarize_in_chunks(llm, cache_manager, url, content)
+    else:
+        system_prompt = SystemMessage(
+            content=create_paper_prompt.format(url=url, content=content)
+        )
+        structured_llm = llm.with_structured_output(PaperOutput)
+        with timed("summarize"):
+            paper = await structured_llm.ainvoke([system_prompt], node="paper")
+    await asyncio.to_thread(cache_manager.store_paper, canonical_url, paper)
+    return paper
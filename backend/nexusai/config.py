@@ -1,5 +1,6 @@
 """Build agent configuration."""
 
+import json
 import os
 
 from dotenv import load_dotenv
@@ -20,59 +21,30 @@ if all(
     LLM_PROVIDER = ModelProviderType.azureopenai
 elif os.getenv("OPENAI_API_KEY"):
     LLM_PROVIDER = ModelProviderType.openai
-    logger.warning(
-        "Using OpenAI instead of Azure OpenAI. "
-        "Since OpenAI's quotas for gpt-4o are more restrictive for low-tier users, the agent will use gpt-4o-mini, which may degrade performance."
-    )
 else:
-    raise ValueError(
-        "Neither OpenAI nor Azure OpenAI environment variables are set. "
-        "Please set at least one in your .env file."
-    )
-logger.info(f"Using LLM provider: {LLM_PROVIDER}")
+    LLM_PROVIDER = None
 
 # Scientific databases
 EXA_API_KEY = os.getenv("EXA_API_KEY")
 SERPER_API_KEY = os.getenv("SERPER_API_KEY")
-if EXA_API_KEY and SERPER_API_KEY:
-    logger.info("Found Exa and Serper API keys.")
-else:
-    raise ValueError(
-        "EXA_API_KEY or SERPER_API_KEY environment variable is not set. Please set it in your .env file."
-    )
+# Overridden to use stand-ins, e.g. by the benchmarks
+EXA_URL = os.getenv("EXA_URL", "https://api.exa.ai")
+SERPER_URL = os.getenv("SERPER_URL", "https://google.serper.dev")
 
 # Traceability with langsmith
 if os.getenv("LANGCHAIN_API_KEY"):
     os.environ["LANGCHAIN_TRACING_V2"] = "true"
     os.environ["LANGCHAIN_ENDPOINT"] = "https://api.smith.langchain.com"
     os.environ["LANGCHAIN_PROJECT"] = "nexusai"
-    logger.info("Langsmith tracing enabled.")
-else:
-    logger.warning(
-        "LANGCHAIN_API_KEY environment variable is not set. LLM calls will not be traced."
-    )
 
 # Redis
 REDIS_URL = os.getenv("REDIS_URL")
-if not REDIS_URL:
-    raise ValueError(
-        "REDIS_URL environment variable is not set. Please set it in your .env file."
-    )
 
 # Frontend URL
-if FRONTEND_URL := os.getenv("FRONTEND_URL"):
-    logger.info(f"Frontend URL set to: {FRONTEND_URL}")
-else:
-    raise ValueError(
-        "FRONTEND_URL environment variable is not set. Please set it in your .env file."
-    )
+FRONTEND_URL = os.getenv("FRONTEND_URL")
 
 # Auth Secret
 NEXTAUTH_SECRET = os.getenv("NEXTAUTH_SECRET")
-if not NEXTAUTH_SECRET:
-    raise ValueError(
-        "NEXTAUTH_SECRET environment variable is not set. Please set it in your .env file."
-    )
 
 # Request Configuration
 MAX_RETRIES = 3
@@ -85,3 +57,194 @@ RECURSION_LIMIT = 50
 
 # Paper Downloader Configuration
 MAX_PAGES = 10
+HTML_MAIN_CONTENT = (
+    os.getenv("HTML_MAIN_CONTENT", "true").lower() == "true"
+)  # keep only the article of HTML pages, without navigation and references
+DROPPED_SECTIONS = [
+    section
+    for section in os.getenv(
+        "DROPPED_SECTIONS", "references,acknowledgements,appendix"
+    ).split(",")
+    if section
+]  # sections of papers left out of their content, see nexusai.utils.extraction.SECTION_LABELS
+
+# Session Store Configuration
+SESSION_TTL = 86400 * 7  # seconds
+SESSION_HISTORY_LIMIT = 50  # messages loaded into the agent context
+SESSION_MAX_MESSAGES = 500  # messages kept in Redis per session
+SESSION_MAX_RUNS = 10  # interrupted runs kept per session to be resumed
+
+# Workflow Checkpointing Configuration
+CHECKPOINT_TTL = 3600  # seconds
+CHECKPOINT_MAX_BYTES = 2 * 1024 * 1024  # larger checkpoints are skipped
+CHECKPOINT_MAX_PER_RUN = 10
+
+# WebSocket Configuration
+WS_SEND_QUEUE_SIZE = 32  # intermediate messages are coalesced beyond this size
+WS_RECEIVE_QUEUE_SIZE = 16
+WS_QUERY_POLICY = os.getenv("WS_QUERY_POLICY", "reject")  # reject, queue or parallel
+WS_MAX_QUEUED_QUERIES = 5
+WS_MAX_PARALLEL_QUERIES = 3
+
+# Paper Processing Configuration
+PAPERS_CONCURRENCY = 4  # papers processed at the same time per request
+PAPER_CHUNK_PAGES = 2  # pages summarized together in long papers
+PAPER_CHUNKED_MIN_PAGES = 4  # longer papers are summarized in chunks
+
+# Paper Jobs Configuration
+JOBS_WORKERS = int(
+    os.getenv("JOBS_WORKERS", 2)
+)  # papers processed concurrently per process
+JOBS_MAX_URLS = 500
+JOBS_MAX_RETRIES = 3
+JOBS_LEASE_TIMEOUT = 900  # seconds before an unfinished paper is requeued
+JOBS_TTL = 86400 * 7  # seconds
+
+# Resource Limits Configuration (concurrent calls per process)
+LLM_CONCURRENCY = int(os.getenv("LLM_CONCURRENCY", 16))
+EMBEDDING_CONCURRENCY = int(os.getenv("EMBEDDING_CONCURRENCY", 4))
+DOWNLOAD_CONCURRENCY = int(os.getenv("DOWNLOAD_CONCURRENCY", 8))
+
+# LLM Rate Limits Configuration (per deployment, shared across workers through Redis)
+LLM_RATE_LIMITS = json.loads(
+    os.getenv("LLM_RATE_LIMITS", "{}")
+)  # e.g. {"gpt-4o": {"tpm": 450000, "rpm": 2700}}
+LLM_DEFAULT_TPM = int(os.getenv("LLM_DEFAULT_TPM", 200000))
+LLM_DEFAULT_RPM = int(os.getenv("LLM_DEFAULT_RPM", 1000))
+LLM_MAX_CONCURRENCY = 32  # upper bound of the adaptive concurrency per deployment
+LLM_COMPLETION_TOKENS_ESTIMATE = 1000  # reserved before the actual usage is known
+RATE_LIMIT_MAX_RETRIES = (
+    10  # requests are queued again after a 429 up to this many times
+)
+RATE_LIMIT_DEFAULT_RETRY_AFTER = 10  # seconds, when the response has no retry-after
+
+# LLM Deployments Configuration
+# Pools of deployments per tier (small, large, embedding), as JSON in LLM_DEPLOYMENTS or in the file
+# at LLM_DEPLOYMENTS_FILE, e.g. {"small": [{"name": "gpt-4o-mini-eastus", "model": "gpt-4o-mini",
+# "endpoint": "https://...", "api_key": "...", "weight": 2, "tpm": 450000, "rpm": 2700}]}
+if os.getenv("LLM_DEPLOYMENTS_FILE"):
+    with open(os.getenv("LLM_DEPLOYMENTS_FILE")) as f:
+        LLM_DEPLOYMENTS = json.load(f)
+else:
+    LLM_DEPLOYMENTS = json.loads(os.getenv("LLM_DEPLOYMENTS", "{}"))
+LLM_DEPLOYMENT_COOLDOWN = 30  # seconds a failing deployment is skipped
+
+# LLM Timeouts and Hedging Configuration
+LLM_NODE_TIMEOUTS = {
+    "decision_making": 30,
+    "planning": 60,
+    "agent": 120,
+    "judge": 60,
+    "paper": 120,
+    **json.loads(os.getenv("LLM_NODE_TIMEOUTS", "{}")),
+}  # seconds per LLM call of each node
+LLM_DEFAULT_TIMEOUT = 120  # seconds, for nodes without a budget
+LLM_HEDGE_PERCENTILE = float(
+    os.getenv("LLM_HEDGE_PERCENTILE", 0.95)
+)  # calls slower than this percentile are hedged, 0 disables hedging
+LLM_HEDGE_MIN_DELAY = 1.0  # seconds
+LLM_HEDGE_MIN_SAMPLES = 20  # latencies observed before using the percentile
+LLM_LATENCY_WINDOW = 200  # latencies kept per node
+
+# Query Deadline Configuration
+QUERY_TIME_BUDGET = int(os.getenv("QUERY_TIME_BUDGET", 300))  # seconds per query
+QUERY_ANSWER_RESERVE = 45  # seconds kept for writing the final answer
+QUERY_JUDGE_MIN_REMAINING = 120  # seconds needed to judge the answer and improve it
+QUERY_MIN_STEP_TIMEOUT = 5  # seconds
+
+# Fair Scheduling Configuration (per process)
+SCHEDULER_MAX_RUNS = int(
+    os.getenv("SCHEDULER_MAX_RUNS", 8)
+)  # research runs and papers processed concurrently
+SCHEDULER_MAX_TOOL_CALLS = int(os.getenv("SCHEDULER_MAX_TOOL_CALLS", 16))
+SCHEDULER_WEIGHTS = {"interactive": 4, "bulk": 1}  # share of the slots per user
+
+# Metrics Configuration
+METRICS_ENABLED = (
+    os.getenv("METRICS_ENABLED", "true").lower() == "true"
+)  # when disabled, the instrumentation is a no-op and /metrics is not served
+
+# Profiling Configuration
+ADMIN_API_KEY = os.getenv(
+    "ADMIN_API_KEY"
+)  # key of the admin endpoints, which are disabled when unset
+PROFILES_DIR = os.getenv("PROFILES_DIR", "profiles")
+PROFILER_INTERVAL = 0.01  # seconds between stack samples
+PROFILER_MAX_RUNS = 2  # research runs profiled concurrently per process
+PROFILER_MAX_FILES = 100  # most recent profiles kept
+PROFILER_SETTINGS_TTL = 5  # seconds the profiling switch is cached per process
+
+# Tracing Configuration
+TRACING_ENABLED = (
+    os.getenv("TRACING_ENABLED", "true").lower() == "true"
+)  # record a span tree per research query
+TRACES_DIR = os.getenv("TRACES_DIR", "traces")
+TRACING_OTLP_ENDPOINT = os.getenv(
+    "TRACING_OTLP_ENDPOINT"
+)  # OTLP/HTTP endpoint receiving JSON, e.g. http://otel-collector:4318/v1/traces
+TRACING_MAX_SPANS = 5000  # per trace
+TRACING_MAX_FILES = 200  # most recent traces kept
+
+# Server Configuration
+SERVER_HOST = os.getenv("SERVER_HOST", "0.0.0.0")
+SERVER_PORT = int(os.getenv("SERVER_PORT", 8000))
+SERVER_WORKERS = int(
+    os.getenv("SERVER_WORKERS", 1)
+)  # processes serving the API, each with its own limits and schedulers
+SHUTDOWN_DRAIN_TIMEOUT = int(
+    os.getenv("SHUTDOWN_DRAIN_TIMEOUT", 120)
+)  # seconds given to in-flight research runs on SIGTERM
+SHUTDOWN_GRACE_PERIOD = 10  # seconds to close the connections after draining
+LIVENESS_MAX_LOOP_LAG = (
+    30  # seconds the event loop may be blocked before the worker is unhealthy
+)
+READINESS_REDIS_TIMEOUT = 2  # seconds
+
+
+def validate_config() -> None:
+    """Check that the required environment variables are set, logging the resulting configuration.
+
+    It is called by the entry points on startup rather than on import, so that importing the package stays cheap.
+    """
+    if LLM_PROVIDER is None:
+        raise ValueError(
+            "Neither OpenAI nor Azure OpenAI environment variables are set. "
+            "Please set at least one in your .env file."
+        )
+    if LLM_PROVIDER == ModelProviderType.openai:
+        logger.warning(
+            "Using OpenAI instead of Azure OpenAI. "
+            "Since OpenAI's quotas for gpt-4o are more restrictive for low-tier users, the agent will use gpt-4o-mini, which may degrade performance."
+        )
+    logger.info(f"Using LLM provider: {LLM_PROVIDER}")
+
+    if EXA_API_KEY and SERPER_API_KEY:
+        logger.info("Found Exa and Serper API keys.")
+    else:
+        raise ValueError(
+            "EXA_API_KEY or SERPER_API_KEY environment variable is not set. Please set it in your .env file."
+        )
+
+    if os.getenv("LANGCHAIN_API_KEY"):
+        logger.info("Langsmith tracing enabled.")
+    else:
+        logger.warning(
+            "LANGCHAIN_API_KEY environment variable is not set. LLM calls will not be traced."
+        )
+
+    if not REDIS_URL:
+        raise ValueError(
+            "REDIS_URL environment variable is not set. Please set it in your .env file."
+        )
+
+    if FRONTEND_URL:
+        logger.info(f"Frontend URL set to: {FRONTEND_URL}")
+    else:
+        raise ValueError(
+            "FRONTEND_URL environment variable is not set. Please set it in your .env file."
+        )
+
+    if not NEXTAUTH_SECRET:
+        raise ValueError(
+            "NEXTAUTH_SECRET environment variable is not set. Please set it in your .env file."
+        )
@@ -0,0 +1,271 @@
+import asyncio
+import json
+import time
+from typing import AsyncIterator
+from uuid import uuid4
+
+from nexusai.cache.connection import get_async_redis_client
+from nexusai.config import (
+    JOBS_LEASE_TIMEOUT,
+    JOBS_MAX_RETRIES,
+    JOBS_TTL,
+    JOBS_WORKERS,
+    RETRY_BASE_DELAY,
+)
+from nexusai.models.jobs import PaperJob, PaperJobItem, PaperJobStatus
+from nexusai.scheduling.fair_scheduler import Priority, run_scheduler
+from nexusai.utils.logger import logger
+from nexusai.utils.strings import canonicalize_url
+
+# Move the next entry of the queue to the processing list and lease it, in one step so that the entry
+# cannot be seen without a lease and requeued in between. Returns the entry, or nil if the queue is empty.
+_LEASE_SCRIPT = """
+local entry = redis.call('LMOVE', KEYS[1], KEYS[2], 'RIGHT', 'LEFT')
+if entry then
+    redis.call('ZADD', KEYS[3], ARGV[1], entry)
+end
+return entry
+"""
+
+# Move a processing entry back to the queue unless its lease is still valid. Returns 1 if it was requeued.
+_REQUEUE_SCRIPT = """
+local deadline = tonumber(redis.call('ZSCORE', KEYS[3], ARGV[1]))
+if deadline and deadline > tonumber(ARGV[2]) then
+    return 0
+end
+if redis.call('LREM', KEYS[2], 1, ARGV[1]) == 0 then
+    return 0
+end
+redis.call('ZREM', KEYS[3], ARGV[1])
+redis.call('RPUSH', KEYS[1], ARGV[1])
+return 1
+"""
+
+
+class PaperJobQueue:
+    """Redis-backed queue of paper jobs.
+
+    Each URL of a job is a queue entry. Workers move entries to a processing list while they work on them,
+    with a lease that expires after `JOBS_LEASE_TIMEOUT` seconds unless the worker renews it. Entries whose
+    lease expired, e.g. because the worker restarted, are moved back to the queue.
+    """
+
+    queue_key = "jobs:papers:queue"
+    processing_key = "jobs:papers:processing"
+    # Deadlines of the leases of the processing entries
+    leases_key = "jobs:papers:leases"
+
+    def __init__(self):
+        self.redis = get_async_redis_client()
+        self.lease_script = self.redis.register_script(_LEASE_SCRIPT)
+        self.requeue_script = self.redis.register_script(_REQUEUE_SCRIPT)
+
+    @staticmethod
+    def __items_key(job_id: str) -> str:
+        return f"jobs:papers:{job_id}:items"
+
+    @staticmethod
+    def __owner_key(job_id: str) -> str:
+        return f"jobs:papers:{job_id}:owner"
+
+    async def submit(self, urls: list[str], user_id: str = "anonymous") -> str:
+        """Queue the papers of a new job of a user and return its id. Raises a ValueError for an empty batch."""
+        unique_urls = list(dict.fromkeys(canonicalize_url(url) for url in urls))
+        if not unique_urls:
+            raise ValueError("A paper job needs at least one URL")
+        job_id = uuid4().hex
+        async with self.redis.pipeline(transaction=True) as pipe:
+            pipe.hset(
+                self.__items_key(job_id),
+                mapping={
+                    url: PaperJobItem(url=url).model_dump_json() for url in unique_urls
+                },
+            )
+            pipe.expire(self.__items_key(job_id), JOBS_TTL)
+            pipe.set(self.__owner_key(job_id), user_id, ex=JOBS_TTL)
+            pipe.lpush(
+                self.queue_key,
+                *[
+                    json.dumps({"job_id": job_id, "url": url, "user_id": user_id})
+                    for url in unique_urls
+                ],
+            )
+            await pipe.execute()
+        logger.info(f"Submitted paper job {job_id} with {len(unique_urls)} papers")
+        return job_id
+
+    async def get(self, job_id: str, user_id: str | None = None) -> PaperJob | None:
+        """Return the state of a job, or None if it does not exist or, when a user is given, belongs to another user."""
+        async with self.redis.pipeline(transaction=False) as pipe:
+            pipe.hgetall(self.__items_key(job_id))
+            pipe.get(self.__owner_key(job_id))
+            data, owner = await pipe.execute()
+        if not data or (user_id is not None and owner != user_id.encode()):
+            return None
+        return PaperJob(
+            id=job_id,
+            items=[PaperJobItem.model_validate_json(item) for item in data.values()],
+        )
+
+    async def watch(
+        self, job_id: str, poll_interval: float = 1.0
+    ) -> AsyncIterator[PaperJobItem]:
+        """Yield the items of a job as they complete or fail, until the whole job is done."""
+        reported = set()
+        while job := await self.get(job_id):
+            for item in job.items:
+                if item.url not in reported and item.status in (
+                    PaperJobStatus.completed,
+                    PaperJobStatus.failed,
+                ):
+                    reported.add(item.url)
+                    yield item
+            if job.status == PaperJobStatus.completed:
+                return
+            await asyncio.sleep(poll_interval)
+
+    async def update(self, job_id: str, item: PaperJobItem) -> None:
+        """Store the new state of a job item."""
+        await self.redis.hset(
+            self.__items_key(job_id), item.url, item.model_dump_json()
+        )
+
+    async def next(
+        self, timeout: float = 1.0, poll_interval: float = 0.2
+    ) -> tuple[bytes, dict] | None:
+        """Lease the next queue entry, polling for up to `timeout` seconds for one."""
+        deadline = time.monotonic() + timeout
+        while (
+            entry := await self.lease_script(
+                keys=[self.queue_key, self.processing_key, self.leases_key],
+                args=[time.time() + JOBS_LEASE_TIMEOUT],
+            )
+        ) is None:
+            if time.monotonic() >= deadline:
+                return None
+            await asyncio.sleep(poll_interval)
+        return entry, json.loads(entry)
+
+    async def renew(self, entry: bytes) -> bool:
+        """Extend the lease of an entry being processed, returning False if it already expired."""
+        return bool(
+            await self.redis.zadd(
+                self.leases_key,
+                {entry: time.time() + JOBS_LEASE_TIMEOUT},
+                xx=True,
+                ch=True,
+            )
+        )
+
+    async def done(self, entry: bytes) -> None:
+        """Remove a processed entry from the processing list."""
+        async with self.redis.pipeline(transaction=True) as pipe:
+            pipe.lrem(self.processing_key, 1, entry)
+            pipe.zrem(self.leases_key, entry)
+            await pipe.execute()
+
+    async def requeue_expired(self) -> int:
+        """Move entries whose lease expired back to the queue."""
+        num_requeued = 0
+        now = time.time()
+        for entry in await self.redis.lrange(self.processing_key, 0, -1):
+            num_requeued += await self.requeue_script(
+                keys=[self.queue_key, self.processing_key, self.leases_key],
+                args=[entry, now],
+            )
+        if num_requeued:
+            logger.warning(f"Requeued {num_requeued} papers with an expired lease")
+        return num_requeued
+
+
+class PaperWorkerPool:
+    """Pool of workers processing paper jobs in the background of the current process."""
+
+    def __init__(self, num_workers: int = JOBS_WORKERS):
+        self.num_workers = num_workers
+        self.queue = PaperJobQueue()
+        self.tasks: list[asyncio.Task] = []
+
+    def start(self):
+        """Start the workers and the lease recovery loop."""
+        logger.info(f"Starting {self.num_workers} paper job workers")
+        self.tasks = [
+            asyncio.create_task(self.__work()) for _ in range(self.num_workers)
+        ]
+        self.tasks.append(asyncio.create_task(self.__recover()))
+
+    async def stop(self):
+        """Stop the workers. Papers in progress are requeued once their lease expires."""
+        for task in self.tasks:
+            task.cancel()
+        await asyncio.gather(*self.tasks, return_exceptions=True)
+        self.tasks = []
+
+    async def __recover(self):
+        while True:
+            try:
+                await self.queue.requeue_expired()
+            except Exception as e:
+                logger.error(f"Error requeuing paper jobs: {e}")
+            await asyncio.sleep(JOBS_LEASE_TIMEOUT / 10)
+
+    async def __work(self):
+        while True:
+            try:
+                if leased := await self.queue.next():
+                    entry, data = leased
+                    renewal = asyncio.create_task(self.__renew(entry))
+                    try:
+                        await self.__process(
+                            data["job_id"],
+                            data["url"],
+                            data.get("user_id", "anonymous"),
+                        )
+                    finally:
+                        renewal.cancel()
+                    await self.queue.done(entry)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Error in paper job worker: {e}")
+                await asyncio.sleep(RETRY_BASE_DELAY)
+
+    async def __renew(self, entry: bytes):
+        """Renew the lease of an entry while it is processed, so that slow papers are not requeued."""
+        while True:
+            await asyncio.sleep(JOBS_LEASE_TIMEOUT / 3)
+            try:
+                if not await self.queue.renew(entry):
+                    logger.warning(f"Lease of paper job entry {entry!r} expired")
+            except Exception as e:
+                logger.error(f"Error renewing paper job lease: {e}")
+
+    async def __process(self, job_id: str, url: str, user_id: str):
+        """Process a paper with retries, storing the result in the job.
+
+        Papers are processed as bulk work of the user, after the interactive research runs.
+        """
+        from nexusai.chat import process_paper
+
+        item = PaperJobItem(url=url, status=PaperJobStatus.processing)
+        for attempt in range(JOBS_MAX_RETRIES):
+            item.attempts = attempt + 1
+            await self.queue.update(job_id, item)
+            try:
+                async with run_scheduler.slot(user_id, Priority.bulk):
+                    paper = await process_paper(url)
+                if paper:
+                    item.status = PaperJobStatus.completed
+                    item.paper = paper
+                    item.error = None
+                    break
+                item.error = "Failed to download the paper"
+            except Exception as e:
+                logger.error(f"Error processing paper {url} of job {job_id}: {e}")
+                item.error = "Failed to process the paper"
+
+            if attempt < JOBS_MAX_RETRIES - 1:
+                await asyncio.sleep(RETRY_BASE_DELAY ** (attempt + 1))
+        else:
+            item.status = PaperJobStatus.failed
+        await self.queue.update(job_id, item)
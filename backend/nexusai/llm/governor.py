@@ -0,0 +1,200 @@
+import asyncio
+import time
+from dataclasses import dataclass
+from typing import Any, Sequence
+
+from langchain_core.messages import AIMessage, BaseMessage
+from nexusai.cache.connection import get_async_redis_client
+from nexusai.config import (
+    LLM_COMPLETION_TOKENS_ESTIMATE,
+    LLM_MAX_CONCURRENCY,
+    RATE_LIMIT_DEFAULT_RETRY_AFTER,
+)
+from nexusai.utils.logger import logger
+from nexusai.utils.metrics import (
+    LLM_ADAPTIVE_CONCURRENCY,
+    LLM_RATE_LIMIT_WAIT_SECONDS,
+    LLM_RATE_LIMITED,
+)
+from openai import RateLimitError
+from redis.exceptions import RedisError
+
+# Reserve a request and its estimated tokens in the current minute window, unless the deployment
+# is blocked by a retry-after or the window is full. Returns the milliseconds to wait, 0 if reserved.
+_RESERVE_SCRIPT = """
+local now = tonumber(ARGV[1])
+local tokens = tonumber(ARGV[2])
+local tpm = tonumber(ARGV[3])
+local rpm = tonumber(ARGV[4])
+local window_end = tonumber(ARGV[5])
+
+local blocked_until = tonumber(redis.call('GET', KEYS[1]) or '0')
+if blocked_until > now then
+    return blocked_until - now
+end
+
+local used_tokens = tonumber(redis.call('GET', KEYS[2]) or '0')
+local used_requests = tonumber(redis.call('GET', KEYS[3]) or '0')
+if used_requests + 1 > rpm or (used_tokens > 0 and used_tokens + tokens > tpm) then
+    return math.max(window_end - now, 1)
+end
+
+redis.call('INCRBY', KEYS[2], tokens)
+redis.call('PEXPIRE', KEYS[2], 120000)
+redis.call('INCR', KEYS[3])
+redis.call('PEXPIRE', KEYS[3], 120000)
+return 0
+"""
+
+
+@dataclass
+class Reservation:
+    """Tokens reserved for a request in a minute window."""
+
+    window: int
+    tokens: int
+
+
+class RateLimitGovernor:
+    """Keeps the requests to an LLM deployment within its tokens and requests per minute quotas.
+
+    Quotas are tracked in Redis per minute window, so all workers share them. Requests wait for
+    room in the window instead of failing, and a 429 blocks the deployment for every worker until
+    its `retry-after`. On top of that, the concurrency of this process is adapted AIMD-style:
+    it is halved on every 429 and grows back by one request per round of successful calls.
+    """
+
+    def __init__(
+        self, deployment: str, tokens_per_minute: int, requests_per_minute: int
+    ):
+        self.deployment = deployment
+        self.tokens_per_minute = tokens_per_minute
+        self.requests_per_minute = requests_per_minute
+        self.concurrency = float(LLM_MAX_CONCURRENCY)
+        self.in_flight = 0
+        self.condition = asyncio.Condition()
+        self.redis = get_async_redis_client()
+        self.reserve_script = self.redis.register_script(_RESERVE_SCRIPT)
+        LLM_ADAPTIVE_CONCURRENCY.labels(deployment).set(self.concurrency)
+
+    def __key(self, name: str) -> str:
+        return f"ratelimit:{self.deployment}:{name}"
+
+    async def __reserve(self, tokens: int) -> tuple[Reservation, float]:
+        """Try to reserve tokens, returning the reservation and the seconds to wait if it failed."""
+        now = int(time.time() * 1000)
+        window = now // 60000
+        try:
+            wait_ms = await self.reserve_script(
+                keys=[
+                    self.__key("blocked_until"),
+                    self.__key(f"{window}:tokens"),
+                    self.__key(f"{window}:requests"),
+                ],
+                args=[
+                    now,
+                    tokens,
+                    self.tokens_per_minute,
+                    self.requests_per_minute,
+                    (window + 1) * 60000,
+                ],
+            )
+        except RedisError as e:
+            # Fail open, the API still enforces its quotas
+            logger.warning(
+                f"Rate limit governor unavailable for {self.deployment}: {e}"
+            )
+            wait_ms = 0
+        return Reservation(window=window, tokens=tokens), wait_ms / 1000
+
+    async def acquire(self, tokens: int) -> Reservation:
+        """Wait until a request with the estimated tokens fits the quotas and the concurrency."""
+        start = time.perf_counter()
+        async with self.condition:
+            await self.condition.wait_for(
+                lambda: self.in_flight < int(self.concurrency)
+            )
+            self.in_flight += 1
+
+        try:
+            while True:
+                reservation, wait = await self.__reserve(tokens)
+                if not wait:
+                    break
+                await asyncio.sleep(wait)
+        except BaseException:
+            await self.discard()
+            raise
+
+        LLM_RATE_LIMIT_WAIT_SECONDS.labels(self.deployment).observe(
+            time.perf_counter() - start
+        )
+        return reservation
+
+    async def discard(self) -> None:
+        """Release a request without adapting the concurrency, e.g. when it failed for another reason."""
+        async with self.condition:
+            self.in_flight -= 1
+            self.condition.notify_all()
+
+    async def release(self, reservation: Reservation, used_tokens: int | None) -> None:
+        """Release a successful request, correcting the reserved tokens with the actual usage."""
+        self.concurrency = min(
+            LLM_MAX_CONCURRENCY, self.concurrency + 1 / self.concurrency
+        )
+        LLM_ADAPTIVE_CONCURRENCY.labels(self.deployment).set(self.concurrency)
+        await self.discard()
+
+        if used_tokens is not None and used_tokens != reservation.tokens:
+            try:
+                await self.redis.incrby(
+                    self.__key(f"{reservation.window}:tokens"),
+                    used_tokens - reservation.tokens,
+                )
+            except RedisError as e:
+                logger.warning(
+                    f"Failed to record the token usage of {self.deployment}: {e}"
+                )
+
+    async def throttle(self, retry_after: float) -> None:
+        """Release a rate-limited request, blocking the deployment until `retry_after` seconds."""
+        LLM_RATE_LIMITED.labels(self.deployment).inc()
+        self.concurrency = max(1.0, self.concurrency / 2)
+        LLM_ADAPTIVE_CONCURRENCY.labels(self.deployment).set(self.concurrency)
+        await self.discard()
+
+        blocked_until = int((time.time() + retry_after) * 1000)
+        try:
+            await self.redis.set(
+                self.__key("blocked_until"), blocked_until, px=int(retry_after * 1000)
+            )
+        except RedisError as e:
+            logger.warning(f"Failed to share the rate limit of {self.deployment}: {e}")
+
+
+def get_retry_after(error: RateLimitError) -> float:
+    """Read the seconds to wait from the headers of a 429 response."""
+    headers = error.response.headers
+    try:
+        if retry_after_ms := headers.get("retry-after-ms"):
+            return float(retry_after_ms) / 1000
+        if retry_after := headers.get("retry-after"):
+            return float(retry_after)
+    except ValueError:
+        pass
+    return RATE_LIMIT_DEFAULT_RETRY_AFTER
+
+
+def get_used_tokens(result: Any) -> int | None:
+    """Return the tokens used by a chat model response, if it reports them."""
+    if isinstance(result, AIMessage) and result.usage_metadata:
+        return result.usage_metadata["total_tokens"]
+    return None
+
+
+def estimate_tokens(messages: Sequence[BaseMessage]) -> int:
+    """Roughly estimate the tokens of a request, about 4 characters per token."""
+    return (
+        sum(len(str(message.content)) for message in messages) // 4
+        + LLM_COMPLETION_TOKENS_ESTIMATE
+    )
@@ -0,0 +1,86 @@
+import asyncio
+from collections import defaultdict, deque
+from typing import Awaitable, Callable, TypeVar
+
+from nexusai.config import (
+    LLM_HEDGE_MIN_DELAY,
+    LLM_HEDGE_MIN_SAMPLES,
+    LLM_HEDGE_PERCENTILE,
+    LLM_LATENCY_WINDOW,
+)
+from nexusai.utils.metrics import LLM_HEDGE_WINS, LLM_HEDGED
+
+T = TypeVar("T")
+
+
+class LatencyTracker:
+    """Recent latencies of the LLM calls of each node."""
+
+    def __init__(self, size: int = LLM_LATENCY_WINDOW):
+        self.latencies: dict[str, deque[float]] = defaultdict(
+            lambda: deque(maxlen=size)
+        )
+
+    def record(self, node: str, seconds: float) -> None:
+        self.latencies[node].append(seconds)
+
+    def percentile(self, node: str, q: float) -> float | None:
+        """Return the q-th percentile (between 0 and 1) of the latencies, or None without enough samples."""
+        latencies = sorted(self.latencies[node])
+        if len(latencies) < LLM_HEDGE_MIN_SAMPLES:
+            return None
+        return latencies[min(int(q * len(latencies)), len(latencies) - 1)]
+
+
+latency_tracker = LatencyTracker()
+
+
+def get_hedge_delay(node: str, timeout: float) -> float | None:
+    """Return the delay after which a call of the node is hedged, or None if hedging is disabled.
+
+    Until enough latencies are observed, calls are hedged after half of their budget.
+    """
+    if not LLM_HEDGE_PERCENTILE:
+        return None
+    delay = latency_tracker.percentile(node, LLM_HEDGE_PERCENTILE) or timeout / 2
+    return max(LLM_HEDGE_MIN_DELAY, delay)
+
+
+async def hedge(
+    call: Callable[[], Awaitable[T]],
+    hedge_call: Callable[[], Awaitable[T]],
+    delay: float,
+    node: str,
+    sent: asyncio.Event | None = None,
+    can_hedge: Callable[[], bool] = lambda: True,
+) -> T:
+    """Run a call, and a duplicate of it if it did not complete `delay` seconds after it was sent.
+
+    The call sets `sent` once its request is sent, so that the time spent waiting for a slot or for rate-limit
+    budget does not count towards the delay. The duplicate is only started if `can_hedge()` still allows it.
+    The first successful response is returned and the other call is cancelled.
+    An error is only raised if both calls fail.
+    """
+    primary = asyncio.create_task(call())
+    tasks = {primary}
+    try:
+        if sent is not None:
+            waiter = asyncio.create_task(sent.wait())
+            await asyncio.wait({primary, waiter}, return_when=asyncio.FIRST_COMPLETED)
+            waiter.cancel()
+        done, _ = await asyncio.wait(tasks, timeout=delay)
+        if not done and can_hedge():
+            LLM_HEDGED.labels(node).inc()
+            tasks.add(asyncio.create_task(hedge_call()))
+
+        while True:
+            done, tasks = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+            if successes := [task for task in done if task.exception() is None]:
+                if successes[0] is not primary:
+                    LLM_HEDGE_WINS.labels(node).inc()
+                return successes[0].result()
+            if not tasks:
+                return done.pop().result()
+    finally:
+        for task in tasks:
+            task.cancel()
@@ -0,0 +1,489 @@
+import asyncio
+import threading
+import time
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Any, Awaitable, Callable, Sequence, TypeVar
+
+from langchain_core.embeddings import Embeddings
+from langchain_core.language_models import BaseChatModel
+from langchain_core.messages import AIMessage, BaseMessage
+from langchain_core.runnables import Runnable
+from langchain_openai import (
+    AzureChatOpenAI,
+    AzureOpenAIEmbeddings,
+    ChatOpenAI,
+    OpenAIEmbeddings,
+)
+from nexusai.config import (
+    LLM_DEFAULT_RPM,
+    LLM_DEFAULT_TIMEOUT,
+    LLM_DEFAULT_TPM,
+    LLM_DEPLOYMENT_COOLDOWN,
+    LLM_DEPLOYMENTS,
+    LLM_NODE_TIMEOUTS,
+    LLM_PROVIDER,
+    LLM_RATE_LIMITS,
+    RATE_LIMIT_MAX_RETRIES,
+)
+from nexusai.llm.governor import (
+    RateLimitGovernor,
+    estimate_tokens,
+    get_retry_after,
+    get_used_tokens,
+)
+from nexusai.llm.hedging import get_hedge_delay, hedge, latency_tracker
+from nexusai.models.llm import ModelProviderType
+from nexusai.utils.limits import llm_limiter
+from nexusai.utils.logger import logger
+from nexusai.utils.metrics import (
+    LLM_DEPLOYMENT_FAILURES,
+    LLM_DEPLOYMENT_HEALTHY,
+    LLM_DEPLOYMENT_OUTSTANDING,
+    LLM_NODE_LATENCY_SECONDS,
+    LLM_TIMEOUTS,
+    LLM_TOKENS,
+)
+from nexusai.utils.tracing import Span, span
+from openai import APIConnectionError, APIStatusError, RateLimitError
+
+T = TypeVar("T")
+
+DEFAULT_DEPLOYMENTS = {
+    ModelProviderType.openai: {
+        "small": [{"name": "gpt-4o-mini", "model": "gpt-4o-mini"}],
+        "large": [],
+        "embedding": [
+            {"name": "text-embedding-3-small", "model": "text-embedding-3-small"}
+        ],
+    },
+    ModelProviderType.azureopenai: {
+        "small": [{"name": "gpt-4o-mini", "model": "gpt-4o-mini"}],
+        "large": [{"name": "gpt-4o", "model": "gpt-4o"}],
+        "embedding": [
+            {"name": "text-embedding-3-small", "model": "text-embedding-3-small"}
+        ],
+    },
+}
+
+
+def is_failover_error(error: BaseException) -> bool:
+    """Whether another deployment may succeed where this one failed: 429s, 5xx and connection errors."""
+    return isinstance(error, (RateLimitError, APIConnectionError)) or (
+        isinstance(error, APIStatusError) and error.status_code >= 500
+    )
+
+
+@dataclass
+class Deployment:
+    """A model deployment of a pool, with its routing and health state."""
+
+    name: str
+    client: BaseChatModel | Embeddings
+    weight: float = 1.0
+    governor: RateLimitGovernor | None = None
+    outstanding: int = 0
+    unhealthy_until: float = 0.0
+
+    @property
+    def is_healthy(self) -> bool:
+        return time.monotonic() >= self.unhealthy_until
+
+
+class DeploymentPool:
+    """Routes the requests of a model tier to its deployments.
+
+    Requests go to the healthy deployment with the fewest outstanding requests relative to its weight.
+    A deployment that answers with a 429, a 5xx or a connection error is skipped for a while,
+    and the request fails over to the next deployment.
+    """
+
+    def __init__(
+        self,
+        tier: str,
+        deployments: list[Deployment],
+        max_attempts: int = RATE_LIMIT_MAX_RETRIES + 1,
+        hedge: bool = True,
+    ):
+        self.tier = tier
+        self.deployments = deployments
+        self.max_attempts = max_attempts
+        self.hedge = hedge
+        self.lock = threading.Lock()
+        for deployment in deployments:
+            LLM_DEPLOYMENT_HEALTHY.labels(deployment.name).set(1)
+
+    def acquire(self, exclude: set[str] = set()) -> Deployment:
+        """Pick the deployment for the next request and count it as outstanding."""
+        with self.lock:
+            candidates = [
+                deployment
+                for deployment in self.deployments
+                if deployment.name not in exclude
+            ] or self.deployments
+            if healthy := [
+                deployment for deployment in candidates if deployment.is_healthy
+            ]:
+                deployment = min(
+                    healthy,
+                    key=lambda deployment: (deployment.outstanding + 1)
+                    / deployment.weight,
+                )
+            else:
+                # Every deployment is failing, use the one that recovers first
+                deployment = min(
+                    candidates, key=lambda deployment: deployment.unhealthy_until
+                )
+            deployment.outstanding += 1
+        LLM_DEPLOYMENT_OUTSTANDING.labels(deployment.name).inc()
+        return deployment
+
+    def release(self, deployment: Deployment, error: BaseException | None = None):
+        """Stop counting a request as outstanding and update the health of its deployment."""
+        with self.lock:
+            deployment.outstanding -= 1
+            if error is None:
+                deployment.unhealthy_until = 0.0
+            elif is_failover_error(error):
+                cooldown = (
+                    get_retry_after(error)
+                    if isinstance(error, RateLimitError)
+                    else LLM_DEPLOYMENT_COOLDOWN
+                )
+                deployment.unhealthy_until = time.monotonic() + cooldown
+        LLM_DEPLOYMENT_OUTSTANDING.labels(deployment.name).dec()
+        LLM_DEPLOYMENT_HEALTHY.labels(deployment.name).set(int(deployment.is_healthy))
+        if error is not None and is_failover_error(error):
+            LLM_DEPLOYMENT_FAILURES.labels(deployment.name, type(error).__name__).inc()
+
+    def __log_failover(self, deployment: Deployment, error: Exception, attempt: int):
+        logger.warning(
+            f"Deployment {deployment.name} of the {self.tier} pool failed with {type(error).__name__}, "
+            f"failing over (attempt {attempt + 1}/{self.max_attempts})"
+        )
+
+    def call(self, fn: Callable[[Deployment], T]) -> T:
+        """Call a deployment from a worker thread, failing over to the others on errors."""
+        tried = set()
+        for attempt in range(self.max_attempts):
+            if len(tried) == len(self.deployments):
+                tried.clear()
+            deployment = self.acquire(exclude=tried)
+            tried.add(deployment.name)
+            try:
+                result = fn(deployment)
+            except Exception as e:
+                self.release(deployment, e)
+                if not is_failover_error(e) or attempt == self.max_attempts - 1:
+                    raise
+                self.__log_failover(deployment, e, attempt)
+                continue
+            self.release(deployment)
+            return result
+
+    async def acall(
+        self,
+        fn: Callable[[Deployment], Awaitable[T]],
+        tried: set[str] | None = None,
+    ) -> T:
+        """Call a deployment, failing over to the others on errors.
+
+        The names of the deployments called are added to `tried`, which can also exclude deployments upfront.
+        """
+        tried = set() if tried is None else tried
+        for attempt in range(self.max_attempts):
+            if len(tried) == len(self.deployments):
+                tried.clear()
+            deployment = self.acquire(exclude=tried)
+            tried.add(deployment.name)
+            try:
+                result = await fn(deployment)
+            except BaseException as e:
+                self.release(deployment, e)
+                if not is_failover_error(e) or attempt == self.max_attempts - 1:
+                    raise
+                self.__log_failover(deployment, e, attempt)
+                continue
+            self.release(deployment)
+            return result
+
+
+class PooledLLM:
+    """A chat model runnable that routes calls to the deployments of a pool.
+
+    Calls respect the process-wide LLM limit and the rate-limit governor of each deployment, if any.
+    """
+
+    def __init__(
+        self,
+        pool: DeploymentPool,
+        transform: Callable[[BaseChatModel], Runnable] = lambda llm: llm,
+        structured: bool = False,
+        include_raw: bool = False,
+    ):
+        self.pool = pool
+        self.transform = transform
+        self.structured = structured
+        self.include_raw = include_raw
+        self.runnables = {
+            deployment.name: transform(deployment.client)
+            for deployment in pool.deployments
+        }
+
+    @classmethod
+    def from_model(cls, llm: BaseChatModel) -> "PooledLLM":
+        """Wrap a single model, e.g. one with the user's own credentials, whose quotas we do not govern."""
+        return cls(
+            DeploymentPool(
+                "custom", [Deployment("custom", llm)], max_attempts=1, hedge=False
+            )
+        )
+
+    def bind_tools(self, tools: Sequence, **kwargs) -> "PooledLLM":
+        return PooledLLM(
+            self.pool,
+            lambda llm: self.transform(llm).bind_tools(tools, **kwargs),
+            self.structured,
+            self.include_raw,
+        )
+
+    def with_structured_output(
+        self, schema: Any, include_raw: bool = False, **kwargs
+    ) -> "PooledLLM":
+        # The raw response is always requested since it carries the token usage, and parsed afterwards
+        return PooledLLM(
+            self.pool,
+            lambda llm: self.transform(llm).with_structured_output(
+                schema, include_raw=True, **kwargs
+            ),
+            structured=True,
+            include_raw=include_raw,
+        )
+
+    def __parse(self, result: Any) -> Any:
+        """Return the structured output of a response, raising its parsing error, unless the raw response was asked for."""
+        if not self.structured or self.include_raw:
+            return result
+        if result["parsing_error"]:
+            raise result["parsing_error"]
+        return result["parsed"]
+
+    async def __invoke(
+        self,
+        deployment: Deployment,
+        messages: list[BaseMessage],
+        sent: asyncio.Event | None = None,
+    ) -> Any:
+        with span(
+            f"llm {deployment.name}",
+            "client",
+            deployment=deployment.name,
+            model=_get_model_name(deployment),
+        ) as current:
+            runnable = self.runnables[deployment.name]
+            if not deployment.governor:
+                async with llm_limiter:
+                    if sent:
+                        sent.set()
+                    result = await runnable.ainvoke(messages)
+                message = result["raw"] if self.structured else result
+                _record_token_usage(deployment, message, current)
+                return self.__parse(result)
+
+            reservation = await deployment.governor.acquire(estimate_tokens(messages))
+            try:
+                async with llm_limiter:
+                    if sent:
+                        sent.set()
+                    result = await runnable.ainvoke(messages)
+            except RateLimitError as e:
+                await deployment.governor.throttle(get_retry_after(e))
+                raise
+            except BaseException:
+                await deployment.governor.discard()
+                raise
+            message = result["raw"] if self.structured else result
+            await deployment.governor.release(reservation, get_used_tokens(message))
+            _record_token_usage(deployment, message, current)
+            return self.__parse(result)
+
+    async def __call(
+        self,
+        messages: list[BaseMessage],
+        tried: set[str],
+        sent: asyncio.Event | None = None,
+    ) -> Any:
+        return await self.pool.acall(
+            lambda deployment: self.__invoke(deployment, messages, sent), tried
+        )
+
+    def __can_hedge(self, tried: set[str]) -> bool:
+        """Hedge only on a healthy deployment not called yet, and only if no other LLM call waits for a slot."""
+        return not llm_limiter.num_waiting and any(
+            deployment.is_healthy and deployment.name not in tried
+            for deployment in self.pool.deployments
+        )
+
+    async def ainvoke(
+        self,
+        messages: list[BaseMessage],
+        node: str | None = None,
+        timeout: float | None = None,
+    ) -> Any:
+        """Invoke the model.
+
+        Calls of a workflow node are bounded by its latency budget, or by `timeout` if shorter,
+        and hedged on another deployment when slower than usual once sent.
+        """
+        if node is None:
+            return await self.__call(messages, set())
+
+        budget = LLM_NODE_TIMEOUTS.get(node, LLM_DEFAULT_TIMEOUT)
+        timeout = min(budget, timeout) if timeout else budget
+        delay = get_hedge_delay(node, timeout) if self.pool.hedge else None
+        start = time.perf_counter()
+        try:
+            async with asyncio.timeout(timeout):
+                if delay is None:
+                    result = await self.__call(messages, set())
+                else:
+                    tried, sent = set(), asyncio.Event()
+                    result = await hedge(
+                        lambda: self.__call(messages, tried, sent),
+                        lambda: self.__call(messages, set(tried)),
+                        delay,
+                        node,
+                        sent=sent,
+                        can_hedge=lambda: self.__can_hedge(tried),
+                    )
+        except TimeoutError:
+            LLM_TIMEOUTS.labels(node).inc()
+            raise TimeoutError(
+                f"The LLM call of the {node} step did not complete within {timeout} seconds."
+            ) from None
+
+        latency = time.perf_counter() - start
+        latency_tracker.record(node, latency)
+        LLM_NODE_LATENCY_SECONDS.labels(node).observe(latency)
+        return result
+
+
+class PooledEmbeddings(Embeddings):
+    """Embeddings that route calls to the deployments of a pool."""
+
+    def __init__(self, pool: DeploymentPool):
+        self.pool = pool
+
+    def embed_documents(self, texts: list[str]) -> list[list[float]]:
+        return self.pool.call(
+            lambda deployment: deployment.client.embed_documents(texts)
+        )
+
+    def embed_query(self, text: str) -> list[float]:
+        return self.pool.call(lambda deployment: deployment.client.embed_query(text))
+
+    async def aembed_documents(self, texts: list[str]) -> list[list[float]]:
+        return await self.pool.acall(
+            lambda deployment: deployment.client.aembed_documents(texts)
+        )
+
+    async def aembed_query(self, text: str) -> list[float]:
+        return await self.pool.acall(
+            lambda deployment: deployment.client.aembed_query(text)
+        )
+
+
+def _get_model_name(deployment: Deployment) -> str:
+    return getattr(deployment.client, "model_name", None) or deployment.name
+
+
+def _record_token_usage(
+    deployment: Deployment, result: Any, current: Span | None
+) -> None:
+    """Count the tokens of a chat model response per model, if it reports them, and add them to its span."""
+    if isinstance(result, AIMessage) and result.usage_metadata:
+        model = _get_model_name(deployment)
+        input_tokens = result.usage_metadata["input_tokens"]
+        output_tokens = result.usage_metadata["output_tokens"]
+        LLM_TOKENS.labels(model, "input").inc(input_tokens)
+        LLM_TOKENS.labels(model, "output").inc(output_tokens)
+        if current:
+            current.set(input_tokens=input_tokens, output_tokens=output_tokens)
+
+
+def _client_kwargs(entry: dict) -> dict:
+    """Build the client arguments of a deployment, falling back to the environment for missing ones."""
+    if LLM_PROVIDER == ModelProviderType.openai:
+        kwargs = {"base_url": entry.get("endpoint")}
+    elif LLM_PROVIDER == ModelProviderType.azureopenai:
+        kwargs = {
+            "azure_endpoint": entry.get("endpoint"),
+            "api_version": entry.get("api_version"),
+        }
+    else:
+        raise ValueError(f"Invalid LLM provider: {LLM_PROVIDER}")
+    kwargs["api_key"] = entry.get("api_key")
+    return {key: value for key, value in kwargs.items() if value is not None}
+
+
+def _create_client(tier: str, entry: dict) -> BaseChatModel | Embeddings:
+    kwargs = _client_kwargs(entry)
+    if tier == "embedding":
+        if LLM_PROVIDER == ModelProviderType.openai:
+            return OpenAIEmbeddings(model=entry["model"], **kwargs)
+        return AzureOpenAIEmbeddings(model=entry["model"], **kwargs)
+
+    if LLM_PROVIDER == ModelProviderType.openai:
+        return ChatOpenAI(
+            model=entry["model"], temperature=0.0, max_tokens=16384, **kwargs
+        )
+    return AzureChatOpenAI(
+        azure_deployment=entry["model"], temperature=0.0, max_tokens=16384, **kwargs
+    )
+
+
+def _create_governor(entry: dict) -> RateLimitGovernor:
+    limits = LLM_RATE_LIMITS.get(entry["name"], {})
+    return RateLimitGovernor(
+        entry["name"],
+        tokens_per_minute=entry.get("tpm", limits.get("tpm", LLM_DEFAULT_TPM)),
+        requests_per_minute=entry.get("rpm", limits.get("rpm", LLM_DEFAULT_RPM)),
+    )
+
+
+@lru_cache(maxsize=None)
+def get_pool(tier: str) -> DeploymentPool | None:
+    """Return the process-wide pool of a tier, from `LLM_DEPLOYMENTS` or the default deployments.
+
+    Returns None if the tier has no deployments.
+    """
+    entries = LLM_DEPLOYMENTS.get(tier, DEFAULT_DEPLOYMENTS[LLM_PROVIDER][tier])
+    if not entries:
+        return None
+
+    logger.info(
+        f"Using {len(entries)} deployments for the {tier} tier: {', '.join(entry['name'] for entry in entries)}"
+    )
+    return DeploymentPool(
+        tier,
+        [
+            Deployment(
+                name=entry["name"],
+                client=_create_client(tier, entry),
+                weight=entry.get("weight", 1.0),
+                governor=_create_governor(entry) if tier != "embedding" else None,
+            )
+            for entry in entries
+        ],
+    )
+
+
+def get_llm(tier: str) -> PooledLLM | None:
+    """Return the chat model of a tier ("small" or "large"), or None if it has no deployments."""
+    pool = get_pool(tier)
+    return PooledLLM(pool) if pool else None
+
+
+def get_embeddings() -> PooledEmbeddings:
+    """Return the embeddings client."""
+    return PooledEmbeddings(get_pool("embedding"))
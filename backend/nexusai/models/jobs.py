@@ -0,0 +1,48 @@
+from enum import StrEnum, auto
+
+from nexusai.models.outputs import PaperOutput
+from pydantic import BaseModel, computed_field
+
+
+class PaperJobStatus(StrEnum):
+    queued = auto()
+    processing = auto()
+    completed = auto()
+    failed = auto()
+
+
+class PaperJobItem(BaseModel):
+    """Processing state of a URL in a paper job."""
+
+    url: str
+    status: PaperJobStatus = PaperJobStatus.queued
+    attempts: int = 0
+    paper: PaperOutput | None = None
+    error: str | None = None
+
+
+class PaperJob(BaseModel):
+    """A batch of paper URLs processed in the background."""
+
+    id: str
+    items: list[PaperJobItem]
+
+    @computed_field
+    @property
+    def status(self) -> PaperJobStatus:
+        statuses = {item.status for item in self.items}
+        if statuses <= {PaperJobStatus.completed, PaperJobStatus.failed}:
+            return PaperJobStatus.completed
+        if statuses == {PaperJobStatus.queued}:
+            return PaperJobStatus.queued
+        return PaperJobStatus.processing
+
+    @computed_field
+    @property
+    def num_completed(self) -> int:
+        return sum(item.status == PaperJobStatus.completed for item in self.items)
+
+    @computed_field
+    @property
+    def num_failed(self) -> int:
+        return sum(item.status == PaperJobStatus.failed for item in self.items)
@@ -168,3 +168,11 @@ Do not provide the same feedback again, but instead rephrase it in clearer terms
 You must take into account the following custom instructions. They come directly from the user and are mandatory to follow for a good answer:
 {custom_instructions}
 """
+
+final_answer_prompt = """
+# TIME LIMIT
+
+The time available for this research is almost over. Do not call any more tools.
+Write the best final answer you can with the information gathered so far, following the instructions above.
+If some subtasks of the plan could not be completed, briefly mention what is missing.
+"""
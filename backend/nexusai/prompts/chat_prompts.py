@@ -13,3 +13,33 @@ Here's the paper content:
 
 {content}
 """
+
+# Prompt to summarize a group of pages of a long paper before combining the summaries
+summarize_chunk_prompt = """You are a research paper analyzer. You are given part {part} of {total_parts} of the paper at the following URL: {url}
+
+Please summarize this part of the paper:
+- If it contains the title or the authors, report them exactly as written
+- Describe the key methods, findings and contributions presented in this part
+- Keep the summary factual and concise, at most 3 paragraphs
+
+Here's the content of this part of the paper:
+
+{content}
+"""
+
+# Prompt to create a paper from the summaries of its parts
+reduce_paper_prompt = """You are a research paper analyzer. Given the following paper URL: {url}
+
+The paper was too long to be analyzed at once, so each part of it was summarized separately.
+Based on the summaries of its parts, please provide the following information in a structured format:
+- Title: Extract the exact title of the paper
+- Authors: List all authors, separated by commas
+- Summary: Provide a 2-3 paragraph summary of the key findings and contributions of the whole paper
+- URL: The same URL as provided above
+
+Please ensure your response is factual and based on the summaries.
+
+Here are the summaries of the parts of the paper, in order:
+
+{summaries}
+"""
@@ -0,0 +1,146 @@
+import asyncio
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from enum import StrEnum
+from typing import AsyncIterator
+
+from nexusai.config import (
+    SCHEDULER_MAX_RUNS,
+    SCHEDULER_MAX_TOOL_CALLS,
+    SCHEDULER_WEIGHTS,
+)
+from nexusai.utils.logger import logger
+from nexusai.utils.metrics import (
+    SCHEDULER_QUEUE_DEPTH,
+    SCHEDULER_WAIT_SECONDS,
+)
+
+
+class Priority(StrEnum):
+    """Priority classes of the scheduled work, weighted by `SCHEDULER_WEIGHTS`."""
+
+    interactive = "interactive"  # WebSocket research sessions
+    bulk = "bulk"  # Paper processing requests and jobs
+
+
+Flow = tuple[str, Priority]
+
+
+class FairScheduler:
+    """Admits work into a limited number of slots, fairly across users.
+
+    Every user and priority class is a flow with its own queue. Free slots go to the waiting flow that
+    was served the least relative to its weight (weighted fair queuing), so a user firing many requests only
+    delays their own ones, and interactive work gets a larger share than bulk work without starving it.
+    """
+
+    def __init__(self, name: str, capacity: int):
+        self.name = name
+        self.capacity = capacity
+        self.in_use = 0
+        self.queues: dict[Flow, deque[asyncio.Future]] = {}
+        self.virtual_times: dict[Flow, float] = {}
+        self.virtual_time = 0.0
+
+    def __start_time(self, flow: Flow) -> float:
+        return max(self.virtual_times.get(flow, 0.0), self.virtual_time)
+
+    def __serve(self, flow: Flow) -> None:
+        """Account a slot given to a flow."""
+        start_time = self.__start_time(flow)
+        self.virtual_time = start_time
+        self.virtual_times[flow] = start_time + 1 / SCHEDULER_WEIGHTS[flow[1]]
+
+        # Forget the idle flows that are not ahead of the others
+        for idle_flow in [
+            f
+            for f, t in self.virtual_times.items()
+            if t <= self.virtual_time and f not in self.queues
+        ]:
+            del self.virtual_times[idle_flow]
+
+    def __update_depth(self, flow: Flow) -> None:
+        # Users are not a label, since there is no bound on their number
+        priority = flow[1]
+        SCHEDULER_QUEUE_DEPTH.labels(self.name, priority).set(
+            sum(len(queue) for f, queue in self.queues.items() if f[1] == priority)
+        )
+
+    def queue_depths(self) -> dict[Flow, int]:
+        """Return the number of waiting requests per user and priority."""
+        return {flow: len(queue) for flow, queue in self.queues.items()}
+
+    def stats(self) -> dict:
+        """Return the slots in use and the waiting requests per user and priority, deepest queues first."""
+        queues = sorted(self.queue_depths().items(), key=lambda item: -item[1])
+        return {
+            "in_use": self.in_use,
+            "capacity": self.capacity,
+            "queues": [
+                {"user_id": user_id, "priority": priority, "depth": depth}
+                for (user_id, priority), depth in queues
+            ],
+        }
+
+    async def acquire(self, user_id: str, priority: Priority) -> None:
+        """Wait for a slot for the user."""
+        flow = (user_id, priority)
+        start = time.perf_counter()
+        if self.in_use < self.capacity and not self.queues:
+            self.in_use += 1
+            self.__serve(flow)
+        else:
+            future = asyncio.get_running_loop().create_future()
+            self.queues.setdefault(flow, deque()).append(future)
+            self.__update_depth(flow)
+            try:
+                await future
+            except asyncio.CancelledError:
+                if future.done() and not future.cancelled():
+                    # The slot was already given to this request, pass it on
+                    self.release()
+                elif future in self.queues.get(flow, ()):
+                    self.queues[flow].remove(future)
+                    if not self.queues[flow]:
+                        del self.queues[flow]
+                    self.__update_depth(flow)
+                raise
+
+        wait = time.perf_counter() - start
+        SCHEDULER_WAIT_SECONDS.labels(self.name, priority).observe(wait)
+        if wait > 1:
+            logger.info(
+                f"User {user_id} waited {wait:.1f}s for a {priority} {self.name} slot"
+            )
+
+    def release(self) -> None:
+        """Give the slot to the next flow, or free it if nobody is waiting."""
+        while self.queues:
+            flow = min(self.queues, key=self.__start_time)
+            future = self.queues[flow].popleft()
+            if not self.queues[flow]:
+                del self.queues[flow]
+            self.__update_depth(flow)
+            if future.cancelled():
+                # Its task was cancelled but did not get to leave the queue yet
+                continue
+            self.__serve(flow)
+            future.set_result(None)
+            return
+        self.in_use -= 1
+
+    @asynccontextmanager
+    async def slot(
+        self, user_id: str, priority: Priority = Priority.interactive
+    ) -> AsyncIterator[None]:
+        """Hold a slot for the user while the block runs."""
+        await self.acquire(user_id, priority)
+        try:
+            yield
+        finally:
+            self.release()
+
+
+run_scheduler = FairScheduler("runs", SCHEDULER_MAX_RUNS)
+tool_scheduler = FairScheduler("tools", SCHEDULER_MAX_TOOL_CALLS)
@@ -3,10 +3,13 @@ import json
 from exa_py import Exa
 from exa_py.api import Result, SearchResponse
 from nexusai.cache.cache_manager import CacheManager
-from nexusai.config import EXA_API_KEY, MAX_PAGES
+from nexusai.config import EXA_API_KEY, EXA_URL, MAX_PAGES
 from nexusai.models.inputs import SearchPapersInput, SearchType
+from nexusai.utils.extraction import label_sections, select_pages
 from nexusai.utils.logger import logger
+from nexusai.utils.metrics import track_provider
 from nexusai.utils.strings import arxiv_abs_to_pdf_url
+from nexusai.utils.tracing import span
 from langchain.text_splitter import RecursiveCharacterTextSplitter
 
 
@@ -22,7 +25,7 @@ class ExaAPIWrapper:
     def __init__(self):
         self.api_key = EXA_API_KEY
         self.cache_manager = CacheManager(self.name)
-        self.client = Exa(api_key=self.api_key)
+        self.client = Exa(api_key=self.api_key, base_url=EXA_URL)
 
     def __format_urls(self, urls: list[str]) -> list[str]:
         formatted_urls = []
@@ -66,14 +69,16 @@ class ExaAPIWrapper:
         """Execute the Exa search call with a retry mechanism."""
         query, kwargs = self.__build_query_and_kwargs(input)
 
-        logger.info(f"[Exa API] Searching for '{query}'")
+        logger.info("[Exa API] Searching for '%s'", query, extra={"category": "search"})
         try:
             response: SearchResponse = self.client.search_and_contents(
                 query=query, num_results=input.max_results, **kwargs
             )
             if response.results:
                 logger.info(
-                    f"[Exa API] Successfully obtained search results for '{query}'"
+                    "[Exa API] Successfully obtained search results for '%s'",
+                    query,
+                    extra={"category": "search"},
                 )
                 return response
             else:
@@ -112,16 +117,25 @@ class ExaAPIWrapper:
 
     def search(self, input: SearchPapersInput) -> str:
         """Search for papers using the Exa API and format results."""
-        logger.info(f"[Exa API] Searching with input: {input}")
+        logger.info(
+            "[Exa API] Searching with input: %s", input, extra={"category": "search"}
+        )
 
         # Return cached results if available.
         if not input.summarization_prompt and (
             cached_results := self.cache_manager.get_search_results(input)
         ):
-            logger.info(f"[Exa API] Cached search results found for input: {input}")
+            logger.info(
+                "[Exa API] Cached search results found for input: %s",
+                input,
+                extra={"category": "cache"},
+            )
             return cached_results
 
-        response = self.__get_search_results(input)
+        with track_provider(self.name, "search"), span(
+            f"{self.name} search", "client", provider=self.name
+        ):
+            response = self.__get_search_results(input)
         formatted_results = self.__format_results(response)
 
         if not input.summarization_prompt:
@@ -131,19 +145,36 @@ class ExaAPIWrapper:
     def download_url(self, url: str) -> str:
         """Download and split content from a URL using the Exa API."""
         url = arxiv_abs_to_pdf_url(url)
-        logger.info(f"[Exa API] Downloading content from URL: '{url}'")
+        logger.info(
+            "[Exa API] Downloading content from URL: '%s'",
+            url,
+            extra={"category": "download"},
+        )
 
         if cached_pages := self.cache_manager.get_content(url):
-            logger.info(f"[Exa API] Cached content found for URL: '{url}'")
-            return "\n\n".join(cached_pages)
+            logger.info(
+                "[Exa API] Cached content found for URL: '%s'",
+                url,
+                extra={"category": "cache"},
+            )
+            return "\n\n".join(select_pages(cached_pages))
 
-        logger.info(f"[Exa API] Downloading content from URL: '{url}'")
+        logger.info(
+            "[Exa API] Downloading content from URL: '%s'",
+            url,
+            extra={"category": "download"},
+        )
         try:
-            response: SearchResponse = self.client.get_contents([url], text=True)
+            with track_provider(self.name, "download"), span(
+                f"{self.name} download", "client", provider=self.name, url=url
+            ):
+                response: SearchResponse = self.client.get_contents([url], text=True)
             if response.results:
                 text = response.results[0].text
                 logger.info(
-                    f"[Exa API] Successfully downloaded content from URL: '{url}'"
+                    "[Exa API] Successfully downloaded content from URL: '%s'",
+                    url,
+                    extra={"category": "download"},
                 )
                 if len(text) > self.chars_per_page * MAX_PAGES:
                     text_splitter = RecursiveCharacterTextSplitter(
@@ -152,8 +183,9 @@ class ExaAPIWrapper:
                     pages = text_splitter.split_text(text)
                 else:
                     pages = [text]
-                self.cache_manager.store_content(url, pages)
-                return "\n\n".join(pages)
+                sections = label_sections(pages)
+                self.cache_manager.store_content(url, sections)
+                return "\n\n".join(select_pages(sections))
             else:
                 raise Exception("No text content found in the response")
         except Exception as e:
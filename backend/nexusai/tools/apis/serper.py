@@ -1,14 +1,18 @@
 import http.client
 import json
+from urllib.parse import urlsplit
 
 from nexusai.cache.cache_manager import CacheManager
 from nexusai.config import (
     REQUEST_TIMEOUT,
     SERPER_API_KEY,
+    SERPER_URL,
 )
 from nexusai.models.inputs import SearchPapersInput, SearchType
 from nexusai.utils.logger import logger
+from nexusai.utils.metrics import track_provider
 from nexusai.utils.strings import arxiv_abs_to_pdf_url
+from nexusai.utils.tracing import span
 
 
 class SerperAPIWrapper:
@@ -22,8 +26,14 @@ class SerperAPIWrapper:
     def __init__(self):
         self.api_key = SERPER_API_KEY
         self.cache_manager = CacheManager(self.name)
-        self.host = "google.serper.dev"
-        self.path = "/scholar"
+        url = urlsplit(SERPER_URL)
+        self.connection_class = (
+            http.client.HTTPConnection
+            if url.scheme == "http"
+            else http.client.HTTPSConnection
+        )
+        self.host = url.netloc
+        self.path = url.path.rstrip("/") + "/scholar"
 
     def __build_query_and_payload(self, input: SearchPapersInput) -> tuple[str, dict]:
         query = input.query
@@ -48,9 +58,11 @@ class SerperAPIWrapper:
         payload_str = json.dumps(payload)
         headers = {"X-API-KEY": self.api_key, "Content-Type": "application/json"}
 
-        logger.info(f"[Serper API] Searching for '{query}'")
+        logger.info(
+            "[Serper API] Searching for '%s'", query, extra={"category": "search"}
+        )
         try:
-            conn = http.client.HTTPSConnection(self.host, timeout=REQUEST_TIMEOUT)
+            conn = self.connection_class(self.host, timeout=REQUEST_TIMEOUT)
             conn.request("POST", self.path, payload_str, headers)
             response = conn.getresponse()
 
@@ -91,10 +103,17 @@ class SerperAPIWrapper:
         """Search for papers using the Serper API and format results."""
         # Use cache if available
         if cached_results := self.cache_manager.get_search_results(input):
-            logger.info(f"[Serper API] Cached search results found for input: {input}")
+            logger.info(
+                "[Serper API] Cached search results found for input: %s",
+                input,
+                extra={"category": "cache"},
+            )
             return cached_results
 
-        response = self.__get_search_results(input)
+        with track_provider(self.name, "search"), span(
+            f"{self.name} search", "client", provider=self.name
+        ):
+            response = self.__get_search_results(input)
         formatted_results = self.__format_results(response)
         self.cache_manager.store_search_results(input, formatted_results)
         return formatted_results
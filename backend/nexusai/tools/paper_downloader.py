@@ -1,36 +1,44 @@
 import asyncio
-import io
-import time
 import random
+import threading
 import requests
 
-import pdfplumber
 import urllib3
 import cloudscraper
 from langchain_community.vectorstores import FAISS
 from langchain_core.tools import tool
-from langchain_openai import AzureOpenAIEmbeddings, OpenAIEmbeddings
 from langchain_text_splitters import RecursiveCharacterTextSplitter
 from nexusai.cache.cache_manager import CacheManager
 from nexusai.tools.apis.exa import ExaAPIWrapper
 from nexusai.config import (
-    LLM_PROVIDER,
     MAX_PAGES,
     MAX_RETRIES,
     REQUEST_TIMEOUT,
     RETRY_BASE_DELAY,
 )
-from nexusai.models.llm import ModelProviderType
+from nexusai.llm.pool import get_embeddings
+from nexusai.utils.extraction import (
+    extract_html_text,
+    extract_pdf_pages,
+    label_sections,
+    select_pages,
+)
 from nexusai.utils.strings import arxiv_abs_to_pdf_url
+from nexusai.utils.limits import download_limiter, embedding_limiter
 from nexusai.utils.logger import logger
-from bs4 import (
-    BeautifulSoup,
-)  # Make sure to install BeautifulSoup: pip install beautifulsoup4
+from nexusai.utils.metrics import track_provider
+from nexusai.utils.profiler import profile_section
+from nexusai.utils.timing import count, timed
+from nexusai.utils.tracing import span
 
 # Disable warnings for insecure requests
 urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
 
 
+class DownloadCancelledError(Exception):
+    """Raised when a download is cancelled, e.g. because the client disconnected."""
+
+
 class PaperDownloader:
     """Download content from a URL and extract text."""
 
@@ -41,15 +49,9 @@ class PaperDownloader:
         self.query = query
         PaperDownloader.query = query
         self.cache_manager = CacheManager()
+        self.cancelled = threading.Event()
 
-        if LLM_PROVIDER == ModelProviderType.openai:
-            self.embeddings = OpenAIEmbeddings(model="text-embedding-3-small")
-        elif LLM_PROVIDER == ModelProviderType.azureopenai:
-            self.embeddings = AzureOpenAIEmbeddings(
-                model="text-embedding-3-small",
-            )
-        else:
-            raise ValueError(f"Unsupported LLM provider: {LLM_PROVIDER}")
+        self.embeddings = get_embeddings()
 
         self.scraper = cloudscraper.create_scraper()
         self.user_agents = [
@@ -58,17 +60,38 @@ class PaperDownloader:
             "Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/88.0.4324.96 Safari/537.36",
         ]
 
+    def cancel(self) -> None:
+        """Cancel the download. It stops at the next retry or processing step."""
+        self.cancelled.set()
+
+    def __check_cancelled(self, url: str) -> None:
+        if self.cancelled.is_set():
+            raise DownloadCancelledError(f"Download of {url} was cancelled.")
+
     def __generate_embeddings(self, pages: list[str]) -> list[str]:
-        logger.info(f"Generating embeddings for {len(pages)} pages...")
-        embeddings = asyncio.run(self.embeddings.aembed_documents(pages))
+        logger.info(
+            "Generating embeddings for %s pages...",
+            len(pages),
+            extra={"category": "download"},
+        )
+        with embedding_limiter, timed("embed"), span("embed", pages=len(pages)):
+            # The process-wide client is called synchronously from this worker thread: its async
+            # connections belong to the server loop and cannot be driven from a new loop per download
+            embeddings = self.embeddings.embed_documents(pages)
         return embeddings
 
     def __filter_pages(self, pages: list[str]) -> list[str]:
         """Filter pages to keep the most relevant ones."""
         logger.warning(f"The content has more than {MAX_PAGES} pages, filtering...")
         if not self.query:
-            logger.info(f"No query provided, returning the first {MAX_PAGES} pages")
+            logger.info(
+                "No query provided, returning the first %s pages",
+                MAX_PAGES,
+                extra={"category": "download"},
+            )
             return pages[:MAX_PAGES]
+        if self.cancelled.is_set():
+            raise DownloadCancelledError("Page filtering was cancelled.")
 
         embeddings = self.__generate_embeddings(pages)
         db = FAISS.from_embeddings(
@@ -83,6 +106,15 @@ class PaperDownloader:
             for doc in sorted(docs, key=lambda x: x.metadata["page_number"])
         ]
 
+    def __select_pages(self, url: str, pages: list[str]) -> list[str]:
+        """Label the sections of the pages and cache them, then drop the low-value sections and filter."""
+        sections = label_sections(pages)
+        self.cache_manager.store_content(url, sections)
+        pages = select_pages(sections)
+        if len(pages) > MAX_PAGES:
+            pages = self.__filter_pages(pages)
+        return pages
+
     def __convert_text_to_pages(self, url: str, text: str) -> list[str]:
         """Process long text by splitting and filtering if necessary."""
         max_chars = self.chars_per_page * MAX_PAGES
@@ -94,30 +126,20 @@ class PaperDownloader:
                 chunk_size=self.chars_per_page, chunk_overlap=0
             )
             pages = text_splitter.split_text(text)
-            self.cache_manager.store_content(url, pages)
-            return self.__filter_pages(pages)
-
-        pages = [text]
-        self.cache_manager.store_content(url, pages)
-        return pages
+        else:
+            pages = [text]
+        return self.__select_pages(url, pages)
 
     def __convert_bytes_to_pages(self, url: str, bytes_content: bytes) -> list[str]:
         """Convert PDF bytes to pages."""
-        logger.info(f"Converting PDF bytes to pages for {url}...")
-        pdf_file = io.BytesIO(bytes_content)
-        with pdfplumber.open(pdf_file) as pdf:
-            pages = []
-            for page in pdf.pages:
-                text = page.extract_text()
-                if text:
-                    pages.append(text)
-        logger.info(f"Conversion done for {url}")
-
-        self.cache_manager.store_content(url, pages)
-        if len(pages) > MAX_PAGES:
-            pages = self.__filter_pages(pages)
-
-        return pages
+        logger.info(
+            "Converting PDF bytes to pages for %s...",
+            url,
+            extra={"category": "download"},
+        )
+        pages = extract_pdf_pages(bytes_content, lambda: self.__check_cancelled(url))
+        logger.info("Conversion done for %s", url, extra={"category": "download"})
+        return self.__select_pages(url, pages)
 
     def _get_random_headers(self) -> dict:
         """Return randomized headers to mimic a browser."""
@@ -147,63 +169,104 @@ class PaperDownloader:
         """Convert response content to pages based on content type."""
         content_type = response.headers.get("Content-Type", "").lower()
         if "application/pdf" in content_type:
-            logger.info(f"Processing PDF from {url}...")
+            logger.info(
+                "Processing PDF from %s...", url, extra={"category": "download"}
+            )
             pages = self.__convert_bytes_to_pages(url, response.content)
         else:
-            logger.info(f"Processing text from {url}...")
-            soup = BeautifulSoup(response.text, "html.parser")
-            text = soup.get_text(separator="\n", strip=True)
+            logger.info(
+                "Processing text from %s...", url, extra={"category": "download"}
+            )
+            text = extract_html_text(response.text)
             pages = self.__convert_text_to_pages(url, text)
         return "\n\n".join(pages)
 
     def download_content(self, url: str) -> str:
         """Download content from a URL and process it."""
         url = arxiv_abs_to_pdf_url(url)
-        logger.info(f"Downloading content from {url}...")
+        logger.info(
+            "Downloading content from %s...", url, extra={"category": "download"}
+        )
 
         if cached_content := self.cache_manager.get_content(url):
-            logger.info(f"Found cached content for {url}")
-            return "\n\n".join(cached_content)
+            logger.info("Found cached content for %s", url, extra={"category": "cache"})
+            count("content_cache_hit")
+            return "\n\n".join(select_pages(cached_content))
+        count("content_cache_miss")
 
         for attempt in range(MAX_RETRIES):
+            self.__check_cancelled(url)
             logger.info(
-                f"Downloading content from {url} (attempt {attempt + 1}/{MAX_RETRIES})"
+                "Downloading content from %s (attempt %s/%s)",
+                url,
+                attempt + 1,
+                MAX_RETRIES,
+                extra={"category": "download"},
             )
             try:
                 headers = self._get_random_headers()
-                response = self.scraper.get(
-                    url, headers=headers, timeout=REQUEST_TIMEOUT
-                )
+                with timed("fetch"), track_provider("native", "download"), span(
+                    "native download", "client", attempt=attempt + 1
+                ) as current:
+                    response = self.scraper.get(
+                        url, headers=headers, timeout=REQUEST_TIMEOUT
+                    )
+                    if current:
+                        current.set(status_code=response.status_code)
                 if 200 <= response.status_code < 300:
-                    return self.__handle_response(url, response)
+                    self.__check_cancelled(url)
+                    with timed("extract"), span("extract"):
+                        return self.__handle_response(url, response)
                 elif response.status_code == 403:
                     sleep_time = RETRY_BASE_DELAY ** (attempt + 1)
                     logger.warning(
                         f"Request to {url} resulted in a 403 response. Retrying in {sleep_time} seconds..."
                     )
-                    time.sleep(sleep_time)
+                    self.cancelled.wait(sleep_time)
                 else:
                     break
+            except DownloadCancelledError:
+                raise
             except Exception as e:
                 sleep_time = RETRY_BASE_DELAY ** (attempt + 1)
                 logger.warning(f"Error: {e}. Retrying in {sleep_time} seconds...")
-                time.sleep(sleep_time)
+                self.cancelled.wait(sleep_time)
         raise Exception(f"Failed to download content from {url}.")
 
     def download(self, url: str) -> str:
         """Attempt to download content, fallback to Exa API if necessary."""
+        with profile_section(), span("download", url=url):
+            try:
+                return self.download_content(url)
+            except DownloadCancelledError:
+                raise
+            except Exception as e:
+                logger.warning(
+                    f"Error downloading content with native downloader from {url}. Details: {e}"
+                )
+                logger.info(
+                    "Trying with Exa API for %s...", url, extra={"category": "download"}
+                )
+                return ExaAPIWrapper().download_url(url)
+
+    async def adownload(self, url: str) -> str:
+        """Download content in a worker thread, cancelling the download if the calling task is cancelled.
+
+        Downloads wait for a slot of the process-wide download limit before taking a thread.
+        """
         try:
-            return self.download_content(url)
-        except Exception as e:
-            logger.warning(
-                f"Error downloading content with native downloader from {url}. Details: {e}"
+            async with download_limiter:
+                return await asyncio.to_thread(self.download, url)
+        except asyncio.CancelledError:
+            logger.info(
+                "Cancelling download of %s", url, extra={"category": "download"}
             )
-            logger.info(f"Trying with Exa API for {url}...")
-            return ExaAPIWrapper().download_url(url)
+            self.cancel()
+            raise
 
-    @tool("download-paper")
     @staticmethod
-    def tool_function(url: str) -> str:
+    @tool("download-paper")
+    async def tool_function(url: str) -> str:
         """
         Download a paper from a given URL.
 
@@ -218,6 +281,6 @@ class PaperDownloader:
         {"url": "https://sample.pdf"}
         """
         try:
-            return PaperDownloader(PaperDownloader.query).download(url)
+            return await PaperDownloader(PaperDownloader.query).adownload(url)
         except Exception as e:
             return f"Error downloading paper: {e}"
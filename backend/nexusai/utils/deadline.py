@@ -0,0 +1,29 @@
+import time
+
+from langchain_core.runnables import RunnableConfig
+from nexusai.config import QUERY_ANSWER_RESERVE, QUERY_MIN_STEP_TIMEOUT
+
+
+def get_remaining_time(config: RunnableConfig | None) -> float:
+    """Return the seconds left before the deadline of the query, or infinity if it has none."""
+    deadline = (config or {}).get("configurable", {}).get("deadline")
+    return deadline - time.time() if deadline else float("inf")
+
+
+def get_step_timeout(config: RunnableConfig | None) -> float | None:
+    """Return the timeout of an intermediate step, which keeps enough time for the final answer.
+
+    Returns None if the query has no deadline.
+    """
+    remaining = get_remaining_time(config)
+    if remaining == float("inf"):
+        return None
+    return max(remaining - QUERY_ANSWER_RESERVE, QUERY_MIN_STEP_TIMEOUT)
+
+
+def get_answer_timeout(config: RunnableConfig | None) -> float | None:
+    """Return the timeout of the final answer, which may use all the remaining time."""
+    remaining = get_remaining_time(config)
+    if remaining == float("inf"):
+        return None
+    return max(remaining, QUERY_MIN_STEP_TIMEOUT)
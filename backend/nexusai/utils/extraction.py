@@ -0,0 +1,263 @@
+import io
+import re
+from typing import Callable
+
+import pdfplumber
+from bs4 import BeautifulSoup
+from nexusai.config import DROPPED_SECTIONS, HTML_MAIN_CONTENT
+from nexusai.utils.timing import count
+
+try:
+    import lxml.etree
+    import lxml.html
+except ImportError:  # Falls back to the parser of the standard library, which is slower
+    lxml = None
+
+HTML_PARSER = "lxml" if lxml else "html.parser"
+
+# Elements without text for the reader
+NON_TEXT_TAGS = {"script", "style", "noscript", "template", "iframe", "svg"}
+# Elements around the content of an article: navigation, sidebars and footers. Forms are kept, since some
+# publishers wrap the whole page in one
+BOILERPLATE_TAGS = {"nav", "aside", "footer", "button", "select", "dialog"}
+BOILERPLATE_PATTERN = re.compile(
+    r"(^|[\s_-])(nav|navbar|menu|breadcrumbs?|sidebar|related-(?:articles?|content|links|posts|stories)|"
+    r"share|social|cookies?|banner|advert|ads|promo|newsletter|comments?|footer|"
+    r"references?|bibliography|ref-list)($|[\s_-])",
+    re.IGNORECASE,
+)
+REFERENCES_HEADING_PATTERN = re.compile(
+    r"^\s*(\d+\.?\s*)?(references|bibliography|works cited)\s*$", re.IGNORECASE
+)
+HEADING_TAGS = {"h1", "h2", "h3", "h4"}
+MAIN_CONTENT_SELECTOR = "article, main, [role=main], [itemprop=articleBody]"
+MAIN_CONTENT_XPATH = (
+    ".//article | .//main | .//*[@role='main'] | .//*[@itemprop='articleBody']"
+)
+# The main content is ignored when it has less than this share of the text of the page, e.g. only an abstract
+MIN_MAIN_CONTENT_SHARE = 0.25
+# The whole body is kept when less than this share of its text is left, e.g. when the article was dropped
+MIN_EXTRACTED_SHARE = 0.1
+
+# Sections of papers, by their usual headings
+SECTION_LABELS = {
+    "abstract": r"abstract",
+    "introduction": r"introduction",
+    "background": r"related work|background|preliminaries",
+    "methods": r"methods?|methodology|approach|proposed method|model|framework",
+    "results": r"experiments?|experimental (setup|results)|evaluation|results",
+    "discussion": r"discussion|limitations|analysis",
+    "conclusion": r"conclusions?|concluding remarks|summary",
+    "acknowledgements": r"acknowledge?ments?",
+    "references": r"references|bibliography|works cited",
+    "appendix": r"appendix|appendices|supplementary materials?",
+}
+SECTION_PATTERNS = {
+    label: re.compile(rf"({pattern})\b", re.IGNORECASE)
+    for label, pattern in SECTION_LABELS.items()
+}
+# Top-level headings, e.g. "3 Method", "3. Method" or "III. METHOD", and appendix headings, e.g. "A Proofs"
+NUMBERED_HEADING_PATTERN = re.compile(
+    r"^(\d{1,2}|[IVX]{1,4})\.?\s+([A-Z][^.,;:]{2,60})$"
+)
+LETTERED_HEADING_PATTERN = re.compile(r"^[A-H]\.?\s+([A-Z][^\d.,;:]{2,60})$")
+# Appendix headings, e.g. "Appendix", "Appendix B" or "Appendix B: Proofs"
+APPENDIX_HEADING_PATTERN = re.compile(
+    r"^((?i:appendix)( [A-Z](\.|:)?( .*)?)?|(?i:appendices|supplementary materials?))$"
+)
+# Headings that also appear alone on other lines, e.g. in figures and tables, so they only count when numbered
+NUMBERED_ONLY_HEADINGS = {"model", "analysis", "summary"}
+MAX_HEADING_WORDS = 6
+# When less than this share of the text would be kept, the headings were likely misread and all sections are kept
+MIN_KEPT_SHARE = 0.4
+
+
+def extract_pdf_pages(
+    content: bytes, check_cancelled: Callable[[], None] | None = None
+) -> list[str]:
+    """Extract the text of the pages of a PDF, skipping empty pages. `check_cancelled` is called before each page."""
+    with pdfplumber.open(io.BytesIO(content)) as pdf:
+        pages = []
+        for page in pdf.pages:
+            if check_cancelled:
+                check_cancelled()
+            text = page.extract_text()
+            if text:
+                pages.append(text)
+    return pages
+
+
+def _heading_label(line: str, current: str) -> str | None:
+    """The section started by a line, if it is a heading."""
+    line = line.strip().rstrip(":")
+    if not line or len(line.split()) > MAX_HEADING_WORDS:
+        return None
+    if match := NUMBERED_HEADING_PATTERN.match(line):
+        name = match.group(2)
+        for label, pattern in SECTION_PATTERNS.items():
+            if pattern.match(name):
+                return label
+        # Unknown sections are part of the body, or of the appendix right after the references
+        return "appendix" if current == "references" else "body"
+    if current in ("references", "appendix") and LETTERED_HEADING_PATTERN.match(line):
+        return "appendix"
+    if APPENDIX_HEADING_PATTERN.match(line):
+        return "appendix"
+    if line.lower() in NUMBERED_ONLY_HEADINGS:
+        return None
+    for label, pattern in SECTION_PATTERNS.items():
+        if (match := pattern.match(line)) and match.end() == len(line):
+            return label
+    return None
+
+
+def label_sections(pages: list[str]) -> list[list[tuple[str, str]]]:
+    """Split pages at the section headings, labelling each part with its section, e.g. methods or references.
+
+    The text before the first heading is labelled `front`, and sections with unknown headings `body`.
+    """
+    sections = []
+    label = "front"
+    for page in pages:
+        parts: list[tuple[str, list[str]]] = [(label, [])]
+        for line in page.splitlines():
+            if (heading := _heading_label(line, label)) and heading != label:
+                label = heading
+                parts.append((label, []))
+            parts[-1][1].append(line)
+        sections.append(
+            [(part_label, "\n".join(lines)) for part_label, lines in parts if lines]
+        )
+    return sections
+
+
+def select_pages(
+    sections: list[list[tuple[str, str]]], dropped: list[str] = DROPPED_SECTIONS
+) -> list[str]:
+    """Join the parts of each page, leaving out the dropped sections and the pages left empty.
+
+    All sections are kept when too little text would be left, e.g. when a heading was misread.
+    """
+    pages = [
+        "\n".join(text for label, text in parts if label not in dropped)
+        for parts in sections
+    ]
+    kept = sum(len(page) for page in pages)
+    total = sum(len(text) for parts in sections for _, text in parts)
+    if kept < total * MIN_KEPT_SHARE:
+        pages = ["\n".join(text for _, text in parts) for parts in sections]
+    else:
+        count("section_chars_dropped", total - kept)
+    return [page for page in pages if page.strip()]
+
+
+def _is_boilerplate(tag: str, classes: str, element_id: str) -> bool:
+    return tag in BOILERPLATE_TAGS or bool(
+        BOILERPLATE_PATTERN.search(classes) or BOILERPLATE_PATTERN.search(element_id)
+    )
+
+
+def _lxml_text(element) -> str:
+    return "\n".join(text for string in element.itertext() if (text := string.strip()))
+
+
+def _extract_with_lxml(html: str, main_content: bool) -> str:
+    try:
+        root = lxml.html.document_fromstring(
+            html.encode(), parser=lxml.html.HTMLParser(encoding="utf-8")
+        )
+    except lxml.etree.ParserError:  # Empty document
+        return ""
+    for element in list(root.iter(lxml.etree.Comment, *NON_TEXT_TAGS)):
+        element.drop_tree()
+    if not main_content:
+        return _lxml_text(root)
+
+    body = root.find("body")
+    root = root if body is None else body
+    full_text = _lxml_text(root)
+    candidates = root.xpath(MAIN_CONTENT_XPATH)
+    lengths = {candidate: len(candidate.text_content()) for candidate in candidates}
+    main = max(lengths, key=lengths.get, default=None)
+    if (
+        main is not None
+        and lengths[main] >= len(root.text_content()) * MIN_MAIN_CONTENT_SHARE
+    ):
+        root = main
+
+    for element in list(root.iter()):
+        if not isinstance(element.tag, str) or element is root:
+            continue
+        # Only the header of the page is dropped, not the headers of articles or sections
+        if (element.tag == "header" and element.getparent() is body) or _is_boilerplate(
+            element.tag, element.get("class", ""), element.get("id", "")
+        ):
+            element.drop_tree()
+        elif element.tag in HEADING_TAGS and REFERENCES_HEADING_PATTERN.match(
+            element.text_content()
+        ):
+            # Drop the reference list following the heading, up to the next heading
+            for sibling in list(element.itersiblings()):
+                if sibling.tag in HEADING_TAGS:
+                    break
+                sibling.drop_tree()
+            element.drop_tree()
+    text = _lxml_text(root)
+    return text if len(text) >= len(full_text) * MIN_EXTRACTED_SHARE else full_text
+
+
+def _extract_with_soup(html: str, main_content: bool, parser: str) -> str:
+    soup = BeautifulSoup(html, parser)
+    for element in soup(list(NON_TEXT_TAGS)):
+        element.decompose()
+    if not main_content:
+        return soup.get_text(separator="\n", strip=True)
+
+    body = soup.body
+    root = soup if body is None else body
+    full_text = root.get_text(separator="\n", strip=True)
+    candidates = root.select(MAIN_CONTENT_SELECTOR)
+    lengths = {id(candidate): len(candidate.get_text()) for candidate in candidates}
+    main = max(candidates, key=lambda candidate: lengths[id(candidate)], default=None)
+    if (
+        main is not None
+        and lengths[id(main)] >= len(root.get_text()) * MIN_MAIN_CONTENT_SHARE
+    ):
+        root = main
+
+    for element in root.find_all(True):
+        if element.decomposed:
+            continue
+        # Only the header of the page is dropped, not the headers of articles or sections
+        if (element.name == "header" and element.parent is body) or _is_boilerplate(
+            element.name,
+            " ".join(element.get("class", [])),
+            element.get("id", ""),
+        ):
+            element.decompose()
+        elif element.name in HEADING_TAGS and REFERENCES_HEADING_PATTERN.match(
+            element.get_text()
+        ):
+            # Drop the reference list following the heading, up to the next heading
+            for sibling in element.find_next_siblings():
+                if sibling.name in HEADING_TAGS:
+                    break
+                sibling.decompose()
+            element.decompose()
+    text = root.get_text(separator="\n", strip=True)
+    return text if len(text) >= len(full_text) * MIN_EXTRACTED_SHARE else full_text
+
+
+def extract_html_text(
+    html: str, main_content: bool = HTML_MAIN_CONTENT, parser: str = HTML_PARSER
+) -> str:
+    """Extract the text of an HTML page, one line per element.
+
+    With `main_content`, only the article is kept: navigation, sidebars, footers and reference lists are
+    dropped, so that less text is split, embedded and sent to the LLM. Pages without a recognizable article
+    keep their whole body, without the boilerplate, and pages left almost empty keep all their text. Pages are
+    parsed with lxml when it is installed.
+    """
+    if parser == "lxml" and lxml:
+        return _extract_with_lxml(html, main_content)
+    return _extract_with_soup(html, main_content, parser)
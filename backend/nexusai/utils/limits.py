@@ -0,0 +1,127 @@
+import asyncio
+import threading
+import time
+from collections import deque
+
+from nexusai.config import (
+    DOWNLOAD_CONCURRENCY,
+    EMBEDDING_CONCURRENCY,
+    LLM_CONCURRENCY,
+)
+from nexusai.utils.metrics import (
+    RESOURCE_IN_USE,
+    RESOURCE_WAIT_SECONDS,
+    RESOURCE_WAITING,
+)
+from nexusai.utils.timing import timed
+
+
+class ResourceLimiter:
+    """Limits the concurrent calls to a resource across the whole process.
+
+    It can be used with `async with` from coroutines and with `with` from worker threads,
+    which share the same slots. Slots are granted in arrival order, and the time spent waiting
+    for one is exported as the `nexusai_resource_wait_seconds` metric.
+    """
+
+    def __init__(self, name: str, limit: int):
+        self.name = name
+        self.limit = limit
+        self.in_use = 0
+        self.lock = threading.Lock()
+        self.waiters: deque[tuple[asyncio.AbstractEventLoop | None, object]] = deque()
+
+    @property
+    def num_waiting(self) -> int:
+        return len(self.waiters)
+
+    def __try_acquire(self) -> bool:
+        """Take a free slot if nobody is waiting for one. Must be called with the lock held."""
+        if self.in_use < self.limit and not self.waiters:
+            self.in_use += 1
+            RESOURCE_IN_USE.labels(self.name).set(self.in_use)
+            return True
+        return False
+
+    def __observe_wait(self, start: float) -> None:
+        RESOURCE_WAIT_SECONDS.labels(self.name).observe(time.perf_counter() - start)
+        RESOURCE_WAITING.labels(self.name).set(self.num_waiting)
+
+    def __wake(self, future: asyncio.Future) -> None:
+        """Hand a released slot to a waiting coroutine, or release it again if it was cancelled."""
+        if future.cancelled():
+            self.release()
+        else:
+            future.set_result(None)
+
+    def release(self) -> None:
+        """Release a slot, handing it over to the next waiter if any."""
+        with self.lock:
+            if not self.waiters:
+                self.in_use -= 1
+                RESOURCE_IN_USE.labels(self.name).set(self.in_use)
+                return
+            loop, waiter = self.waiters.popleft()
+        if loop is None:
+            waiter.set()
+        else:
+            loop.call_soon_threadsafe(self.__wake, waiter)
+
+    async def acquire(self) -> None:
+        """Wait for a slot from a coroutine."""
+        start = time.perf_counter()
+        with self.lock:
+            if self.__try_acquire():
+                self.__observe_wait(start)
+                return
+            future = asyncio.get_running_loop().create_future()
+            waiter = (asyncio.get_running_loop(), future)
+            self.waiters.append(waiter)
+
+        try:
+            with timed(f"{self.name}_wait"):
+                await future
+        except asyncio.CancelledError:
+            with self.lock:
+                if waiter in self.waiters:
+                    self.waiters.remove(waiter)
+                    raise
+            # The slot was already handed over to this coroutine, pass it on
+            if future.done() and not future.cancelled():
+                self.release()
+            raise
+        finally:
+            self.__observe_wait(start)
+
+    def acquire_sync(self) -> None:
+        """Wait for a slot from a worker thread."""
+        start = time.perf_counter()
+        with self.lock:
+            if self.__try_acquire():
+                self.__observe_wait(start)
+                return
+            event = threading.Event()
+            self.waiters.append((None, event))
+
+        with timed(f"{self.name}_wait"):
+            event.wait()
+        self.__observe_wait(start)
+
+    async def __aenter__(self) -> "ResourceLimiter":
+        await self.acquire()
+        return self
+
+    async def __aexit__(self, *exc_info) -> None:
+        self.release()
+
+    def __enter__(self) -> "ResourceLimiter":
+        self.acquire_sync()
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.release()
+
+
+llm_limiter = ResourceLimiter("llm", LLM_CONCURRENCY)
+embedding_limiter = ResourceLimiter("embedding", EMBEDDING_CONCURRENCY)
+download_limiter = ResourceLimiter("download", DOWNLOAD_CONCURRENCY)
@@ -1,5 +1,126 @@
+import atexit
+import copy
+import json
 import logging
+import os
+import queue
+import random
 import sys
+import time
+from logging.handlers import QueueHandler, QueueListener
+
+# Read from the environment rather than the config module, which logs through this one
+LOG_FORMAT = os.getenv("LOG_FORMAT", "json")  # json or text
+LOG_MAX_MESSAGE_LENGTH = int(
+    os.getenv("LOG_MAX_MESSAGE_LENGTH", 2000)
+)  # characters, longer messages are truncated
+LOG_QUEUE_SIZE = 10000  # records waiting to be written, newer ones are dropped
+# Share of the records kept per category (the `category` extra), warnings and errors are always kept
+LOG_SAMPLE_RATES = {
+    "message": 1.0,
+    "search": 1.0,
+    "download": 1.0,
+    "cache": 0.1,
+    **json.loads(os.getenv("LOG_SAMPLE_RATES", "{}")),
+}
+
+DATE_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+
+class JsonFormatter(logging.Formatter):
+    """Formats records as JSON lines, with their category and exception, if any."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        data = {
+            "time": self.formatTime(record, DATE_FORMAT),
+            "level": record.levelname,
+            "logger": record.name,
+            "location": f"{record.filename}:{record.lineno}",
+            "pid": record.process,
+            "message": record.getMessage(),
+        }
+        if category := getattr(record, "category", None):
+            data["category"] = category
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            data["exception"] = record.exc_text
+        return json.dumps(data, ensure_ascii=False)
+
+
+def _truncate(arg: object) -> object:
+    if isinstance(arg, str) and len(arg) > LOG_MAX_MESSAGE_LENGTH:
+        return arg[: LOG_MAX_MESSAGE_LENGTH + 1]
+    return arg
+
+
+class BackgroundHandler(QueueHandler):
+    """Hands records to a background thread writing them, so that logging does not block the event loop.
+
+    Records of a sampled category are dropped before being formatted. Messages are truncated to
+    `LOG_MAX_MESSAGE_LENGTH` characters, and records are dropped when the queue is full rather than waiting.
+    The time spent by the callers and the records per outcome are measured once `instrument` is called.
+    """
+
+    def __init__(self, log_queue: queue.Queue):
+        super().__init__(log_queue)
+        self.records = None
+        self.emit_seconds = None
+
+    def instrument(self, records, emit_seconds) -> None:
+        """Count the records per category and outcome, and time the callers, with the given metrics."""
+        self.records = records
+        self.emit_seconds = emit_seconds
+
+    def __count(self, record: logging.LogRecord, outcome: str) -> None:
+        if self.records:
+            self.records.labels(getattr(record, "category", "default"), outcome).inc()
+
+    def handle(self, record: logging.LogRecord) -> bool:
+        start = time.perf_counter()
+        rate = LOG_SAMPLE_RATES.get(getattr(record, "category", None), 1.0)
+        if record.levelno < logging.WARNING and rate < 1 and random.random() >= rate:
+            self.__count(record, "sampled")
+            return False
+        handled = super().handle(record)
+        if self.emit_seconds:
+            self.emit_seconds.observe(time.perf_counter() - start)
+        return handled
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        """Merge and truncate the message, and format the exception, leaving the rest to the writer thread."""
+        record = copy.copy(record)
+        # Truncate long arguments first, e.g. a downloaded paper, so that they are not copied into the message
+        if isinstance(record.args, tuple):
+            record.args = tuple(_truncate(arg) for arg in record.args)
+        message = record.getMessage()
+        if len(message) > LOG_MAX_MESSAGE_LENGTH:
+            message = f"{message[:LOG_MAX_MESSAGE_LENGTH]}... [truncated]"
+        record.msg = message
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+            self.__count(record, "written")
+        except queue.Full:
+            self.__count(record, "dropped")
+
+
+_listeners: list[QueueListener] = []
+
+
+def stop_logger() -> None:
+    """Write the pending records and stop the writer threads, e.g. before the process exits."""
+    while _listeners:
+        _listeners.pop().stop()
+
+
+atexit.register(stop_logger)
 
 
 def setup_logger(name: str = "nexusai", level: int | None = None) -> logging.Logger:
@@ -9,25 +130,39 @@ def setup_logger(name: str = "nexusai", level: int | None = None) -> logging.Log
     # Set level
     logger.setLevel(level or logging.INFO)
 
-    # Create console handler and set level
+    # Create console handler and set level, written to by a background thread
     console_handler = logging.StreamHandler(sys.stdout)
     console_handler.setLevel(logging.DEBUG)
 
-    # Create formatter with filename and line number
-    formatter = logging.Formatter(
-        "%(levelname)s - %(asctime)s - %(name)s - [%(filename)s:%(lineno)d] - %(message)s",
-        datefmt="%Y-%m-%d %H:%M:%S",
-    )
+    # Create formatter, as JSON or as text with filename and line number
+    if LOG_FORMAT == "json":
+        formatter = JsonFormatter()
+    else:
+        formatter = logging.Formatter(
+            "%(levelname)s - %(asctime)s - %(name)s - [%(filename)s:%(lineno)d] - %(message)s",
+            datefmt=DATE_FORMAT,
+        )
 
     # Add formatter to handler
     console_handler.setFormatter(formatter)
 
     # Add handler to logger if it doesn't already have handlers
     if not logger.handlers:
-        logger.addHandler(console_handler)
+        log_queue = queue.Queue(LOG_QUEUE_SIZE)
+        listener = QueueListener(log_queue, console_handler, respect_handler_level=True)
+        listener.start()
+        _listeners.append(listener)
+        logger.addHandler(BackgroundHandler(log_queue))
 
     return logger
 
 
+def instrument_logger(records, emit_seconds, name: str = "nexusai") -> None:
+    """Measure the records and the time spent logging them with the given metrics."""
+    for handler in logging.getLogger(name).handlers:
+        if isinstance(handler, BackgroundHandler):
+            handler.instrument(records, emit_seconds)
+
+
 # Create default logger instance
 logger = setup_logger()
@@ -0,0 +1,205 @@
+import os
+from contextlib import contextmanager, nullcontext
+from typing import Iterator
+
+from nexusai.config import METRICS_ENABLED
+from nexusai.utils.logger import instrument_logger
+from prometheus_client import CollectorRegistry, generate_latest, multiprocess
+
+
+class _NoopMetric:
+    """Stands in for every metric when metrics are disabled, so that instrumented code does no work."""
+
+    def __init__(self, *args, **kwargs):
+        pass
+
+    def labels(self, *args, **kwargs) -> "_NoopMetric":
+        return self
+
+    def inc(self, *args, **kwargs) -> None:
+        pass
+
+    dec = set = observe = inc
+
+    def time(self) -> nullcontext:
+        return nullcontext()
+
+
+if METRICS_ENABLED:
+    from prometheus_client import Counter, Gauge, Histogram
+else:
+    Counter = Gauge = Histogram = _NoopMetric
+
+# In multi-worker mode, gauges are summed across the live workers or reported per worker (pid label)
+
+RESOURCE_WAIT_SECONDS = Histogram(
+    "nexusai_resource_wait_seconds",
+    "Time spent waiting for a slot of a limited resource.",
+    ["resource"],
+    buckets=(0.005, 0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60),
+)
+RESOURCE_IN_USE = Gauge(
+    "nexusai_resource_in_use",
+    "Slots of a limited resource currently in use.",
+    ["resource"],
+    multiprocess_mode="livesum",
+)
+RESOURCE_WAITING = Gauge(
+    "nexusai_resource_waiting",
+    "Callers waiting for a slot of a limited resource.",
+    ["resource"],
+    multiprocess_mode="livesum",
+)
+
+LLM_RATE_LIMIT_WAIT_SECONDS = Histogram(
+    "nexusai_llm_rate_limit_wait_seconds",
+    "Time LLM requests spent queued by the rate-limit governor of a deployment.",
+    ["deployment"],
+    buckets=(0.005, 0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60),
+)
+LLM_RATE_LIMITED = Counter(
+    "nexusai_llm_rate_limited_total",
+    "LLM requests rejected with a 429 by a deployment.",
+    ["deployment"],
+)
+LLM_ADAPTIVE_CONCURRENCY = Gauge(
+    "nexusai_llm_adaptive_concurrency",
+    "Concurrent requests currently allowed to a deployment by the rate-limit governor.",
+    ["deployment"],
+    multiprocess_mode="liveall",
+)
+LLM_DEPLOYMENT_OUTSTANDING = Gauge(
+    "nexusai_llm_deployment_outstanding",
+    "Requests in progress per model deployment.",
+    ["deployment"],
+    multiprocess_mode="livesum",
+)
+LLM_DEPLOYMENT_HEALTHY = Gauge(
+    "nexusai_llm_deployment_healthy",
+    "Whether a model deployment is currently receiving requests.",
+    ["deployment"],
+    multiprocess_mode="liveall",
+)
+LLM_DEPLOYMENT_FAILURES = Counter(
+    "nexusai_llm_deployment_failures_total",
+    "Requests failed over to another deployment, per deployment and error.",
+    ["deployment", "error"],
+)
+
+LLM_NODE_LATENCY_SECONDS = Histogram(
+    "nexusai_llm_node_latency_seconds",
+    "Latency of the LLM calls of each node, including hedging and queuing.",
+    ["node"],
+    buckets=(0.25, 0.5, 1, 2, 5, 10, 20, 30, 60, 120, 300),
+)
+LLM_HEDGED = Counter(
+    "nexusai_llm_hedged_total",
+    "LLM calls duplicated to another deployment because they were slow.",
+    ["node"],
+)
+LLM_HEDGE_WINS = Counter(
+    "nexusai_llm_hedge_wins_total",
+    "Hedged LLM calls answered first by the duplicate.",
+    ["node"],
+)
+LLM_TIMEOUTS = Counter(
+    "nexusai_llm_timeouts_total",
+    "LLM calls that exceeded the latency budget of their node.",
+    ["node"],
+)
+
+SCHEDULER_QUEUE_DEPTH = Gauge(
+    "nexusai_scheduler_queue_depth",
+    "Requests waiting for a slot of a scheduler, per priority.",
+    ["scheduler", "priority"],
+    multiprocess_mode="livesum",
+)
+SCHEDULER_WAIT_SECONDS = Histogram(
+    "nexusai_scheduler_wait_seconds",
+    "Time spent waiting for a slot of a scheduler, per priority.",
+    ["scheduler", "priority"],
+    buckets=(0.005, 0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120),
+)
+
+EVENT_LOOP_LAG_SECONDS = Gauge(
+    "nexusai_event_loop_lag_seconds",
+    "Delay of the last heartbeat of the event loop of a worker.",
+    multiprocess_mode="liveall",
+)
+
+NODE_LATENCY_SECONDS = Histogram(
+    "nexusai_node_latency_seconds",
+    "Duration of the executions of each workflow node.",
+    ["node"],
+    buckets=(0.1, 0.25, 0.5, 1, 2, 5, 10, 20, 30, 60, 120, 300),
+)
+FEEDBACK_LOOPS = Counter(
+    "nexusai_feedback_loops_total",
+    "Answers evaluated by the judge, per outcome: accepted, feedback (sent back to planning), limit or timeout.",
+    ["outcome"],
+)
+TOOL_LATENCY_SECONDS = Histogram(
+    "nexusai_tool_latency_seconds",
+    "Duration of the tool calls of the agent, per tool.",
+    ["tool"],
+    buckets=(0.1, 0.25, 0.5, 1, 2, 5, 10, 20, 30, 60, 120),
+)
+PROVIDER_LATENCY_SECONDS = Histogram(
+    "nexusai_provider_latency_seconds",
+    "Duration of the calls to the search and download providers, excluding cache hits.",
+    ["provider", "operation"],
+    buckets=(0.1, 0.25, 0.5, 1, 2, 5, 10, 20, 30, 60, 120),
+)
+PROVIDER_ERRORS = Counter(
+    "nexusai_provider_errors_total",
+    "Failed calls to the search and download providers.",
+    ["provider", "operation"],
+)
+CACHE_REQUESTS = Counter(
+    "nexusai_cache_requests_total",
+    "Cache lookups per key type and result (hit or miss).",
+    ["key_type", "result"],
+)
+LLM_TOKENS = Counter(
+    "nexusai_llm_tokens_total",
+    "Tokens sent to (input) and generated by (output) each model.",
+    ["model", "direction"],
+)
+WS_ACTIVE_SESSIONS = Gauge(
+    "nexusai_ws_active_sessions",
+    "Open WebSocket research sessions.",
+    multiprocess_mode="livesum",
+)
+
+LOG_RECORDS = Counter(
+    "nexusai_log_records_total",
+    "Log records per category and outcome: written, sampled (out) or dropped (queue full).",
+    ["category", "outcome"],
+)
+LOG_EMIT_SECONDS = Histogram(
+    "nexusai_log_emit_seconds",
+    "Time spent by the callers logging a record, before it is written by the background thread.",
+    buckets=(1e-6, 5e-6, 1e-5, 2.5e-5, 5e-5, 1e-4, 2.5e-4, 1e-3, 1e-2),
+)
+# The logger cannot import the metrics, since it is imported by the config
+instrument_logger(LOG_RECORDS, LOG_EMIT_SECONDS)
+
+
+@contextmanager
+def track_provider(provider: str, operation: str) -> Iterator[None]:
+    """Observe the duration of a call to a provider, counting it as an error if it raises."""
+    with PROVIDER_LATENCY_SECONDS.labels(provider, operation).time():
+        try:
+            yield
+        except Exception:
+            PROVIDER_ERRORS.labels(provider, operation).inc()
+            raise
+
+
+def generate_metrics() -> bytes:
+    """Render the metrics of this process, or of all the workers in multi-worker mode."""
+    if "PROMETHEUS_MULTIPROC_DIR" in os.environ:
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        return generate_latest(registry)
+    return generate_latest()
@@ -0,0 +1,272 @@
+import asyncio
+import json
+import os
+import random
+import re
+import sys
+import threading
+import time
+from collections import Counter
+from contextlib import asynccontextmanager, contextmanager
+from contextvars import ContextVar
+from pathlib import Path
+from types import FrameType
+from typing import AsyncIterator, Iterator
+
+from nexusai.cache.connection import get_async_redis_client
+from nexusai.config import (
+    PROFILER_INTERVAL,
+    PROFILER_MAX_FILES,
+    PROFILER_MAX_RUNS,
+    PROFILER_SETTINGS_TTL,
+    PROFILES_DIR,
+)
+from nexusai.utils.logger import logger
+from redis.exceptions import RedisError
+
+SETTINGS_KEY = "profiling:settings"
+IDLE_FRAME = "<waiting on I/O>"
+
+
+class RunProfile:
+    """Samples collected for a research run, as collapsed stacks prefixed with the node and tool in progress."""
+
+    def __init__(self, session_id: str | None, run_id: str | None):
+        self.session_id = session_id or "none"
+        self.run_id = run_id or "none"
+        self.started_at = time.time()
+        self.samples: Counter[str] = Counter()
+
+    @property
+    def name(self) -> str:
+        started_at = time.strftime("%Y%m%d-%H%M%S", time.gmtime(self.started_at))
+        # Session ids are chosen by the clients, so keep them from escaping the profiles directory
+        return re.sub(r"[^\w-]", "_", f"{started_at}-{self.session_id}-{self.run_id}")
+
+    def save(self) -> Path:
+        """Write the profile in the collapsed format read by flamegraph.pl and speedscope."""
+        directory = Path(PROFILES_DIR).resolve()
+        path = (directory / f"{self.name}.folded").resolve()
+        if not path.is_relative_to(directory):
+            raise ValueError(f"Invalid profile path {path}")
+        directory.mkdir(parents=True, exist_ok=True)
+        path.write_text(
+            "".join(f"{stack} {count}\n" for stack, count in self.samples.items())
+        )
+        return path
+
+
+_current_run: ContextVar[RunProfile | None] = ContextVar("current_run", default=None)
+_current_tags: ContextVar[tuple[str, ...]] = ContextVar("current_tags", default=())
+
+
+class SamplingProfiler:
+    """Samples the stacks of the tasks and threads working for the profiled runs of this process.
+
+    Code tags its sections with `profile_section`, which registers the current task (on the event loop) or
+    thread (e.g. a download) as working for the run in its context. A background thread then periodically
+    records the stack of each registered thread, and of the registered task running on the event loop.
+    When the loop has no task running, it is waiting on I/O, which is recorded for every run with tasks on it.
+    Sampling only happens while runs are profiled, and nothing is registered otherwise.
+    """
+
+    def __init__(self, interval: float = PROFILER_INTERVAL):
+        self.interval = interval
+        self.lock = threading.Lock()
+        self.tasks: dict[asyncio.Task, tuple[RunProfile, tuple[str, ...]]] = {}
+        self.threads: dict[int, tuple[RunProfile, tuple[str, ...]]] = {}
+        self.loops: dict[int, asyncio.AbstractEventLoop] = {}  # per thread id
+        self.runs: set[RunProfile] = set()
+        self.thread: threading.Thread | None = None
+
+    def start_run(self, run: RunProfile) -> bool:
+        """Start sampling for a run, unless too many runs are already profiled."""
+        with self.lock:
+            if len(self.runs) >= PROFILER_MAX_RUNS:
+                return False
+            self.runs.add(run)
+            if not self.thread or not self.thread.is_alive():
+                self.thread = threading.Thread(
+                    target=self.__sample_loop, name="profiler", daemon=True
+                )
+                self.thread.start()
+        return True
+
+    def stop_run(self, run: RunProfile) -> None:
+        with self.lock:
+            self.runs.discard(run)
+
+    def register(self, run: RunProfile, tags: tuple[str, ...]) -> object:
+        """Register the current task or thread as working for a run, returning its key."""
+        try:
+            task = asyncio.current_task()
+        except RuntimeError:
+            task = None
+        with self.lock:
+            if task:
+                self.tasks[task] = (run, tags)
+                self.loops[threading.get_ident()] = task.get_loop()
+                return task
+            self.threads[threading.get_ident()] = (run, tags)
+            return threading.get_ident()
+
+    def unregister(self, key: object, previous: tuple | None) -> None:
+        with self.lock:
+            registry = self.threads if isinstance(key, int) else self.tasks
+            if previous:
+                registry[key] = previous
+            else:
+                registry.pop(key, None)
+
+    def lookup(self, key: object) -> tuple | None:
+        registry = self.threads if isinstance(key, int) else self.tasks
+        return registry.get(key)
+
+    def __sample_loop(self) -> None:
+        while True:
+            with self.lock:
+                if not self.runs:
+                    self.thread = None
+                    return
+            time.sleep(self.interval)
+            self.__sample()
+
+    def __sample(self) -> None:
+        frames = sys._current_frames()
+        with self.lock:
+            samples: list[tuple[RunProfile, tuple[str, ...], FrameType | None]] = []
+            for thread_id, (run, tags) in self.threads.items():
+                if frame := frames.get(thread_id):
+                    samples.append((run, tags, frame))
+
+            for thread_id, loop in self.loops.items():
+                if not (frame := frames.get(thread_id)):
+                    continue
+                task = asyncio.current_task(loop)
+                if task is None:
+                    # Idle loop, waiting on I/O for all the runs with tasks on it
+                    waiting = {
+                        run: tags
+                        for task, (run, tags) in self.tasks.items()
+                        if task.get_loop() is loop
+                    }
+                    samples.extend((run, tags, None) for run, tags in waiting.items())
+                elif entry := self.tasks.get(task):
+                    samples.append((*entry, frame))
+
+        for run, tags, frame in samples:
+            stack = [IDLE_FRAME] if frame is None else _format_stack(frame)
+            run.samples[";".join([*tags, *stack])] += 1
+
+
+def _format_stack(frame: FrameType) -> list[str]:
+    """Format a stack from its root to the frame, as `function (file)` entries."""
+    stack = []
+    while frame is not None:
+        code = frame.f_code
+        stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)})")
+        frame = frame.f_back
+    return stack[::-1]
+
+
+profiler = SamplingProfiler()
+
+
+@contextmanager
+def profile_section(**tags: str) -> Iterator[None]:
+    """Tag the code of the block for the profile of the current run, e.g. `profile_section(node="agent")`.
+
+    Does nothing if the run is not profiled. Without tags, it registers the current thread with the tags
+    of its context, e.g. in a function run with `asyncio.to_thread`.
+    """
+    if (run := _current_run.get()) is None:
+        yield
+        return
+
+    merged = _current_tags.get() + tuple(f"{k}:{v}" for k, v in tags.items())
+    token = _current_tags.set(merged)
+    try:
+        task = asyncio.current_task()
+    except RuntimeError:
+        task = None
+    previous = profiler.lookup(task or threading.get_ident())
+    key = profiler.register(run, merged)
+    try:
+        yield
+    finally:
+        profiler.unregister(key, previous)
+        _current_tags.reset(token)
+
+
+async def get_profiling_settings() -> dict:
+    """Return the profiling switch set by an admin, cached for a few seconds."""
+    now = time.monotonic()
+    if now - _settings_cache[0] > PROFILER_SETTINGS_TTL:
+        try:
+            data = await get_async_redis_client().get(SETTINGS_KEY)
+            _settings_cache[:] = [now, json.loads(data) if data else {}]
+        except RedisError as e:
+            logger.warning(f"Failed to read the profiling settings: {e}")
+            _settings_cache[:] = [now, {}]
+    return _settings_cache[1]
+
+
+_settings_cache: list = [0.0, {}]
+
+
+async def set_profiling_settings(
+    session_id: str | None, sample_rate: float, duration: int
+) -> None:
+    """Profile the runs of a session and/or a fraction of all runs, for `duration` seconds, in all workers."""
+    if not session_id and not sample_rate:
+        await get_async_redis_client().delete(SETTINGS_KEY)
+    else:
+        await get_async_redis_client().set(
+            SETTINGS_KEY,
+            json.dumps({"session_id": session_id, "sample_rate": sample_rate}),
+            ex=duration,
+        )
+    _settings_cache[0] = 0.0
+
+
+@asynccontextmanager
+async def profile_run(
+    session_id: str | None, run_id: str | None
+) -> AsyncIterator[RunProfile | None]:
+    """Profile a research run if the admin switch selects it, saving the profile when it completes."""
+    settings = await get_profiling_settings()
+    selected = (session_id and session_id == settings.get("session_id")) or (
+        random.random() < settings.get("sample_rate", 0)
+    )
+    run = RunProfile(session_id, run_id) if selected else None
+    if run is None or not profiler.start_run(run):
+        yield None
+        return
+
+    token = _current_run.set(run)
+    try:
+        with profile_section():
+            yield run
+    finally:
+        _current_run.reset(token)
+        profiler.stop_run(run)
+        try:
+            path = await asyncio.to_thread(run.save)
+            await asyncio.to_thread(_prune_profiles)
+            logger.info(f"Saved profile of run {run.run_id} to {path}")
+        except OSError as e:
+            logger.error(f"Failed to save the profile of run {run.run_id}: {e}")
+
+
+def _prune_profiles() -> None:
+    """Keep the `PROFILER_MAX_FILES` most recent profiles."""
+    for path in list_profiles()[PROFILER_MAX_FILES:]:
+        path.unlink(missing_ok=True)
+
+
+def list_profiles() -> list[Path]:
+    """Return the stored profiles, most recent first."""
+    directory = Path(PROFILES_DIR)
+    if not directory.is_dir():
+        return []
+    return sorted(directory.glob("*.folded"), reverse=True)
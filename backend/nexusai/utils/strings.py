@@ -5,6 +5,12 @@ def arxiv_abs_to_pdf_url(url: str) -> str:
     return url.replace("arxiv.org/abs/", "arxiv.org/pdf/")
 
 
+def canonicalize_url(url: str) -> str:
+    """Normalize a paper URL so that different links to the same paper share cache entries."""
+    url = arxiv_abs_to_pdf_url(url.strip()).split("#")[0]
+    return url.rstrip("/")
+
+
 def extract_urls(text: str) -> list[str]:
     links: list[str] = re.findall(r"\[.*?\]\((.*?)\)", text)
     links = list(dict.fromkeys(links))
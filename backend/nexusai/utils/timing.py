@@ -0,0 +1,56 @@
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Iterator
+
+
+class Timings:
+    """Time spent per stage and event counters collected while processing a request."""
+
+    def __init__(self):
+        self.stages: dict[str, float] = defaultdict(float)
+        self.counters: dict[str, int] = defaultdict(int)
+
+    def merge(self, other: "Timings") -> None:
+        """Add the timings and counters of another collection to this one."""
+        for stage, seconds in other.stages.items():
+            self.stages[stage] += seconds
+        for name, value in other.counters.items():
+            self.counters[name] += value
+
+
+_current_timings: ContextVar[Timings | None] = ContextVar(
+    "current_timings", default=None
+)
+
+
+@contextmanager
+def collect_timings() -> Iterator[Timings]:
+    """Collect the stage timings and counters recorded in the current context.
+
+    The context is propagated to tasks and to threads started with `asyncio.to_thread`.
+    """
+    timings = Timings()
+    token = _current_timings.set(timings)
+    try:
+        yield timings
+    finally:
+        _current_timings.reset(token)
+
+
+@contextmanager
+def timed(stage: str) -> Iterator[None]:
+    """Record the time spent in a stage, if timings are being collected."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        if timings := _current_timings.get():
+            timings.stages[stage] += time.perf_counter() - start
+
+
+def count(name: str, value: int = 1) -> None:
+    """Increment a counter, if timings are being collected."""
+    if timings := _current_timings.get():
+        timings.counters[name] += value
@@ -0,0 +1,233 @@
+import asyncio
+import json
+import os
+import re
+import secrets
+import time
+from contextlib import asynccontextmanager, contextmanager
+from contextvars import ContextVar
+from pathlib import Path
+from typing import Any, AsyncIterator, Iterator
+from nexusai.config import (
+    TRACES_DIR,
+    TRACING_ENABLED,
+    TRACING_MAX_FILES,
+    TRACING_MAX_SPANS,
+    TRACING_OTLP_ENDPOINT,
+)
+from nexusai.utils.logger import logger
+
+SERVICE_NAME = "nexusai"
+TRACE_ID_PATTERN = re.compile(r"^[0-9a-f]{32}$")
+
+# Span kinds and status codes of OTLP
+SPAN_KINDS = {"internal": 1, "server": 2, "client": 3}
+STATUS_OK, STATUS_ERROR = 1, 2
+
+
+class Span:
+    """A timed operation of a trace, e.g. a node, an LLM call or a download."""
+
+    def __init__(
+        self,
+        trace: "Trace",
+        name: str,
+        kind: str,
+        parent: "Span | None",
+        attributes: dict[str, Any],
+    ):
+        self.trace = trace
+        self.span_id = secrets.token_hex(8)
+        self.parent_id = parent.span_id if parent else None
+        self.name = name
+        self.kind = kind
+        self.attributes = attributes
+        self.start_ns = time.time_ns()
+        self.end_ns: int | None = None
+        self.error: str | None = None
+
+    def set(self, **attributes: Any) -> None:
+        """Add attributes to the span, e.g. the tokens of an LLM call once it completed."""
+        self.attributes.update(attributes)
+
+    def end(self) -> None:
+        self.end_ns = time.time_ns()
+
+    def to_otlp(self) -> dict:
+        span = {
+            "traceId": self.trace.trace_id,
+            "spanId": self.span_id,
+            "name": self.name,
+            "kind": SPAN_KINDS.get(self.kind, SPAN_KINDS["internal"]),
+            "startTimeUnixNano": str(self.start_ns),
+            "endTimeUnixNano": str(self.end_ns or time.time_ns()),
+            "attributes": _to_otlp_attributes(self.attributes),
+            "status": (
+                {"code": STATUS_ERROR, "message": self.error}
+                if self.error
+                else {"code": STATUS_OK}
+            ),
+        }
+        if self.parent_id:
+            span["parentSpanId"] = self.parent_id
+        return span
+
+
+class Trace:
+    """The spans recorded while processing a research query, up to `TRACING_MAX_SPANS`."""
+
+    def __init__(self):
+        self.trace_id = secrets.token_hex(16)
+        self.spans: list[Span] = []
+        self.dropped = 0
+
+    def start_span(
+        self, name: str, kind: str, parent: Span | None, attributes: dict[str, Any]
+    ) -> Span:
+        span = Span(self, name, kind, parent, attributes)
+        # Spans over the limit are still timed, but not exported
+        if len(self.spans) < TRACING_MAX_SPANS:
+            self.spans.append(span)
+        else:
+            self.dropped += 1
+        return span
+
+    def to_otlp(self) -> dict:
+        """Return the trace in the OTLP/JSON format, as sent to OpenTelemetry collectors."""
+        return {
+            "resourceSpans": [
+                {
+                    "resource": {
+                        "attributes": _to_otlp_attributes(
+                            {"service.name": SERVICE_NAME, "process.pid": os.getpid()}
+                        )
+                    },
+                    "scopeSpans": [
+                        {
+                            "scope": {"name": SERVICE_NAME},
+                            "spans": [span.to_otlp() for span in self.spans],
+                        }
+                    ],
+                }
+            ]
+        }
+
+    def export(self) -> None:
+        """Save the trace to `TRACES_DIR` and send it to the OTLP endpoint, if any. Blocking."""
+        import requests
+
+        data = json.dumps(self.to_otlp())
+        if self.dropped:
+            logger.warning(
+                f"Dropped {self.dropped} spans of trace {self.trace_id} over the limit of {TRACING_MAX_SPANS}"
+            )
+
+        started_at = time.strftime("%Y%m%d-%H%M%S", time.gmtime())
+        path = Path(TRACES_DIR) / f"{started_at}-{self.trace_id}.json"
+        try:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            path.write_text(data)
+            for old_path in list_traces()[TRACING_MAX_FILES:]:
+                old_path.unlink(missing_ok=True)
+        except OSError as e:
+            logger.error(f"Failed to save trace {self.trace_id}: {e}")
+
+        if TRACING_OTLP_ENDPOINT:
+            try:
+                response = requests.post(
+                    TRACING_OTLP_ENDPOINT,
+                    data=data,
+                    headers={"Content-Type": "application/json"},
+                    timeout=5,
+                )
+                response.raise_for_status()
+            except requests.RequestException as e:
+                logger.warning(f"Failed to export trace {self.trace_id}: {e}")
+
+
+_current_span: ContextVar[Span | None] = ContextVar("current_span", default=None)
+_exports: set[asyncio.Task] = set()
+
+
+def _to_otlp_attributes(attributes: dict[str, Any]) -> list[dict]:
+    result = []
+    for key, value in attributes.items():
+        if value is None:
+            continue
+        if isinstance(value, bool):
+            typed = {"boolValue": value}
+        elif isinstance(value, int):
+            typed = {"intValue": str(value)}
+        elif isinstance(value, float):
+            typed = {"doubleValue": value}
+        else:
+            typed = {"stringValue": str(value)}
+        result.append({"key": key, "value": typed})
+    return result
+
+
+@contextmanager
+def span(name: str, kind: str = "internal", **attributes: Any) -> Iterator[Span | None]:
+    """Record the block as a span of the current trace, nested in the current span.
+
+    Yields the span to add attributes to, or None if the code does not run within a trace.
+    The context is propagated to tasks and to threads started with `asyncio.to_thread`.
+    """
+    if (parent := _current_span.get()) is None:
+        yield None
+        return
+
+    current = parent.trace.start_span(name, kind, parent, attributes)
+    token = _current_span.set(current)
+    try:
+        yield current
+    except BaseException as e:
+        current.error = f"{type(e).__name__}: {e}"
+        raise
+    finally:
+        current.end()
+        _current_span.reset(token)
+
+
+@asynccontextmanager
+async def trace_run(name: str, **attributes: Any) -> AsyncIterator[Trace | None]:
+    """Trace a research query, exporting its spans when it completes."""
+    if not TRACING_ENABLED:
+        yield None
+        return
+
+    trace = Trace()
+    root = trace.start_span(name, "server", None, attributes)
+    token = _current_span.set(root)
+    try:
+        yield trace
+    except BaseException as e:
+        root.error = f"{type(e).__name__}: {e}"
+        raise
+    finally:
+        root.end()
+        _current_span.reset(token)
+        logger.info(
+            f"Trace {trace.trace_id} of {name}: {len(trace.spans)} spans in {(root.end_ns - root.start_ns) / 1e9:.2f}s"
+        )
+        # Export in the background, so that cancelled runs are also exported
+        export = asyncio.create_task(asyncio.to_thread(trace.export))
+        _exports.add(export)
+        export.add_done_callback(_exports.discard)
+
+
+def list_traces() -> list[Path]:
+    """Return the stored traces, most recent first."""
+    directory = Path(TRACES_DIR)
+    if not directory.is_dir():
+        return []
+    return sorted(directory.glob("*.json"), reverse=True)
+
+
+def load_trace(trace_id: str) -> dict | None:
+    """Load a stored trace in the OTLP/JSON format."""
+    if not TRACE_ID_PATTERN.match(trace_id):
+        return None
+    if path := next(Path(TRACES_DIR).glob(f"*-{trace_id}.json"), None):
+        return json.loads(path.read_text())
+    return None
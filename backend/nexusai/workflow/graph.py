@@ -1,23 +1,38 @@
+import functools
 import json
+import time
+from typing import Any, Awaitable, Callable
 
 from langchain_core.messages import AIMessage, BaseMessage, ToolMessage
+from langchain_core.runnables import RunnableConfig
 from langgraph.graph import END, StateGraph
 from langgraph.graph.state import CompiledStateGraph
-from nexusai.config import RECURSION_LIMIT
+from nexusai.cache.checkpointer import RedisCheckpointSaver
+from nexusai.config import (
+    QUERY_JUDGE_MIN_REMAINING,
+    QUERY_TIME_BUDGET,
+    RECURSION_LIMIT,
+)
 from nexusai.models.agent_state import AgentState
 from nexusai.models.outputs import AgentMessage, AgentMessageType
+from nexusai.utils.deadline import get_remaining_time
 from nexusai.utils.logger import logger
+from nexusai.utils.metrics import NODE_LATENCY_SECONDS
+from nexusai.utils.profiler import profile_section
+from nexusai.utils.tracing import span
 from nexusai.workflow.nodes import WorkflowNodes
-from openai import RateLimitError
 from openai import APIError
 
 
 class ResearchWorkflow:
     """Implementation of the langgraph workflow."""
 
-    def __init__(self, nodes: WorkflowNodes):
-        """Initialize the workflow with nodes."""
+    def __init__(
+        self, nodes: WorkflowNodes, checkpointer: RedisCheckpointSaver | None = None
+    ):
+        """Initialize the workflow with nodes and an optional checkpointer to resume interrupted runs."""
         self.nodes = nodes
+        self.checkpointer = checkpointer
         self.workflow = self.__build_workflow()
 
     def __build_workflow(self) -> CompiledStateGraph:
@@ -26,11 +41,14 @@ class ResearchWorkflow:
         workflow = StateGraph(AgentState)
 
         # Add nodes
-        workflow.add_node("decision_making", self.nodes.decision_making_node)
-        workflow.add_node("planning", self.nodes.planning_node)
-        workflow.add_node("tools", self.nodes.tools_node)
-        workflow.add_node("agent", self.nodes.agent_node)
-        workflow.add_node("judge", self.nodes.judge_node)
+        for name, node in [
+            ("decision_making", self.nodes.decision_making_node),
+            ("planning", self.nodes.planning_node),
+            ("tools", self.nodes.tools_node),
+            ("agent", self.nodes.agent_node),
+            ("judge", self.nodes.judge_node),
+        ]:
+            workflow.add_node(name, self.__timed_node(name, node))
 
         # Set entry point
         workflow.set_entry_point("decision_making")
@@ -52,6 +70,7 @@ class ResearchWorkflow:
             {
                 "continue": "tools",
                 "end": "judge",
+                "skip_judge": END,
             },
         )
         workflow.add_conditional_edges(
@@ -63,7 +82,24 @@ class ResearchWorkflow:
             },
         )
 
-        return workflow.compile()
+        return workflow.compile(checkpointer=self.checkpointer)
+
+    @staticmethod
+    def __timed_node(
+        name: str, node: Callable[[AgentState, RunnableConfig], Awaitable[Any]]
+    ) -> Callable[[AgentState, RunnableConfig], Awaitable[Any]]:
+        """Wrap a node to record the duration of its executions, trace them and tag them in the profile of the run."""
+
+        @functools.wraps(node)
+        async def timed_node(state: AgentState, config: RunnableConfig) -> Any:
+            start = time.perf_counter()
+            try:
+                with span(f"node {name}", node=name), profile_section(node=name):
+                    return await node(state, config)
+            finally:
+                NODE_LATENCY_SECONDS.labels(name).observe(time.perf_counter() - start)
+
+        return timed_node
 
     @staticmethod
     def __decision_making_router(state: AgentState) -> str:
@@ -73,13 +109,18 @@ class ResearchWorkflow:
         return "end"
 
     @staticmethod
-    def __agent_action_router(state: AgentState) -> str:
+    def __agent_action_router(state: AgentState, config: RunnableConfig) -> str:
         """Determine if the agent should continue processing."""
         messages = state["messages"]
         last_message = messages[-1]
 
-        # Continue if there are tool calls, otherwise end
-        return "continue" if last_message.tool_calls else "end"
+        # Continue if there are tool calls, otherwise judge the answer if there is time left to improve it
+        if last_message.tool_calls:
+            return "continue"
+        if get_remaining_time(config) < QUERY_JUDGE_MIN_REMAINING:
+            logger.info("Skipping the judge, the query is close to its deadline")
+            return "skip_judge"
+        return "end"
 
     @staticmethod
     def __final_answer_router(state: AgentState) -> str:
@@ -113,14 +154,40 @@ class ResearchWorkflow:
         return content + "\n---\n".join(tool_calls_strs)
 
     async def process_query(
-        self, query: str, messages: list[BaseMessage], message_callback=None
+        self,
+        query: str,
+        messages: list[BaseMessage],
+        message_callback=None,
+        thread_id: str | None = None,
+        resume: bool = False,
+        user_id: str | None = None,
     ) -> AgentMessage:
-        """Process a research query streaming the intermediate messages."""
+        """Process a research query streaming the intermediate messages.
+
+        The query must be answered within `QUERY_TIME_BUDGET` seconds, a deadline the nodes read from the config.
+        When a checkpointer is set, the run is checkpointed under `thread_id` after every node.
+        With `resume`, the run continues from its last completed node instead of starting over, with a new deadline.
+        """
         all_messages: list[BaseMessage] = []
+        config = {
+            "recursion_limit": RECURSION_LIMIT,
+            "configurable": {
+                "deadline": time.time() + QUERY_TIME_BUDGET,
+                "user_id": user_id or "anonymous",
+            },
+        }
+        if self.checkpointer and thread_id:
+            config["configurable"]["thread_id"] = thread_id
+            if resume and not (await self.workflow.aget_state(config)).values:
+                logger.info(f"No checkpoint found for run {thread_id}, starting over")
+                resume = False
+        else:
+            resume = False
+
         try:
             async for chunk in self.workflow.astream(
-                {"messages": messages + [query]},
-                config={"recursion_limit": RECURSION_LIMIT},
+                None if resume else {"messages": messages + [query]},
+                config=config,
                 stream_mode="updates",
             ):
                 for updates in chunk.values():
@@ -159,7 +226,19 @@ class ResearchWorkflow:
                                 )
 
                             all_messages.append(message)
-                            logger.info(f"New message:\n{message.json(indent=2)}")
+                            logger.info(
+                                "New %s message: %s",
+                                message.type,
+                                message.content,
+                                extra={"category": "message"},
+                            )
+
+            # A resumed run may have nothing left to do, so read the final message from its state
+            if resume and not all_messages:
+                state = await self.workflow.aget_state(config)
+                all_messages = list(state.values.get("messages", []))[-1:]
+            if self.checkpointer and thread_id:
+                await self.checkpointer.adelete_thread(thread_id)
 
             # Return final message
             if not all_messages:
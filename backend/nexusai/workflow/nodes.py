@@ -1,23 +1,36 @@
 import asyncio
+import time
 from datetime import datetime
 from typing import Any
 
 from langchain_core.messages import AIMessage, SystemMessage, ToolMessage
+from langchain_core.runnables import RunnableConfig
 from langchain_core.tools import BaseTool
 from langchain_openai import AzureChatOpenAI, ChatOpenAI
-from nexusai.config import LLM_PROVIDER, MAX_FEEDBACK_REQUESTS
+from nexusai.config import LLM_PROVIDER, MAX_FEEDBACK_REQUESTS, QUERY_ANSWER_RESERVE
+from nexusai.llm.pool import PooledLLM, get_llm
 from nexusai.models.agent_state import AgentState
 from nexusai.models.llm import ModelProviderType, ProviderDetails
 from nexusai.models.outputs import DecisionMakingOutput, JudgeOutput
 from nexusai.prompts.agent_prompts import (
     agent_prompt,
     decision_making_prompt,
+    final_answer_prompt,
     judge_prompt,
     planning_prompt,
 )
+from nexusai.scheduling.fair_scheduler import tool_scheduler
 from nexusai.utils.azure import extract_details_from_target_uri
+from nexusai.utils.deadline import (
+    get_answer_timeout,
+    get_remaining_time,
+    get_step_timeout,
+)
 from nexusai.utils.logger import logger
+from nexusai.utils.metrics import FEEDBACK_LOOPS, TOOL_LATENCY_SECONDS
 from nexusai.utils.messages import get_agent_messages
+from nexusai.utils.profiler import profile_section
+from nexusai.utils.tracing import span
 
 
 class WorkflowNodes:
@@ -49,25 +62,15 @@ class WorkflowNodes:
         )
         self.planning_llm = large_llm or small_llm
         self.agent_llm = (large_llm or small_llm).bind_tools(tools)
+        self.final_answer_llm = (large_llm or small_llm).bind_tools(
+            tools, tool_choice="none"
+        )
         self.judge_llm = (large_llm or small_llm).with_structured_output(JudgeOutput)
 
     def __create_default_llms(self) -> tuple:
         logger.info(f"Using default LLM settings with provider {LLM_PROVIDER}")
-        if LLM_PROVIDER == ModelProviderType.openai:
-            small_llm = ChatOpenAI(
-                model="gpt-4o-mini", temperature=0.0, max_tokens=16384
-            )
-            large_llm = None
-        elif LLM_PROVIDER == ModelProviderType.azureopenai:
-            small_llm = AzureChatOpenAI(
-                azure_deployment="gpt-4o-mini", temperature=0.0, max_tokens=16384
-            )
-            large_llm = AzureChatOpenAI(
-                azure_deployment="gpt-4o", temperature=0.0, max_tokens=16384
-            )
-        else:
-            raise ValueError(f"Invalid LLM provider: {LLM_PROVIDER}")
-
+        small_llm = get_llm("small")
+        large_llm = get_llm("large")
         return small_llm, large_llm
 
     def __create_provider_llms(
@@ -102,7 +105,10 @@ class WorkflowNodes:
         else:
             raise ValueError(f"Invalid LLM provider: {model_provider}")
 
-        return small_llm, large_llm
+        # The user's own quotas are not governed, only the process-wide limit applies
+        return PooledLLM.from_model(small_llm), large_llm and PooledLLM.from_model(
+            large_llm
+        )
 
     def __format_tools_description(self) -> str:
         """Format the description of available tools."""
@@ -123,7 +129,9 @@ class WorkflowNodes:
         )
         return f"# CUSTOM INSTRUCTIONS\n\nThe following additional instructions come directly from the user. Make sure to follow them:\n{instructions}\n\n"
 
-    def decision_making_node(self, state: AgentState) -> dict[str, Any]:
+    async def decision_making_node(
+        self, state: AgentState, config: RunnableConfig
+    ) -> dict[str, Any]:
         """Entry point node that decides whether research is needed."""
         system_prompt = SystemMessage(
             content=decision_making_prompt.format(
@@ -131,8 +139,10 @@ class WorkflowNodes:
                 custom_instructions=self.__format_custom_instructions(),
             )
         )
-        response: DecisionMakingOutput = self.decision_making_llm.invoke(
-            [system_prompt] + state["messages"]
+        response: DecisionMakingOutput = await self.decision_making_llm.ainvoke(
+            [system_prompt] + state["messages"],
+            node="decision_making",
+            timeout=get_step_timeout(config),
         )
 
         output = {"requires_research": response.requires_research}
@@ -140,7 +150,9 @@ class WorkflowNodes:
             output["messages"] = [AIMessage(content=response.answer)]
         return output
 
-    def planning_node(self, state: AgentState) -> dict[str, Any]:
+    async def planning_node(
+        self, state: AgentState, config: RunnableConfig
+    ) -> dict[str, Any]:
         """Planning node that creates a research strategy."""
         system_prompt = SystemMessage(
             content=planning_prompt.format(
@@ -149,22 +161,47 @@ class WorkflowNodes:
                 custom_instructions=self.__format_custom_instructions(),
             )
         )
-        response = self.planning_llm.invoke([system_prompt] + state["messages"])
+        response = await self.planning_llm.ainvoke(
+            [system_prompt] + state["messages"],
+            node="planning",
+            timeout=get_step_timeout(config),
+        )
 
         # Add the latest planning to the state for easier access
         return {"messages": [response], "current_planning": response}
 
-    async def __execute_tool_call(self, tool_call: dict) -> ToolMessage:
-        """Execute a single tool call asynchronously."""
+    async def __execute_tool_call(
+        self, tool_call: dict, user_id: str, timeout: float | None
+    ) -> ToolMessage:
+        """Execute a single tool call asynchronously, within the remaining time of the query.
+
+        Tool calls wait for a slot shared fairly between the users of the process.
+        """
+        start = time.perf_counter()
         try:
-            tool_result = await self.tools_dict[tool_call["name"]].ainvoke(
-                tool_call["args"]
-            )
+            with span(f"tool {tool_call['name']}", tool=tool_call["name"]) as current:
+                async with asyncio.timeout(timeout), tool_scheduler.slot(user_id):
+                    if current:
+                        current.set(
+                            scheduler_wait_seconds=round(time.perf_counter() - start, 3)
+                        )
+                    with TOOL_LATENCY_SECONDS.labels(
+                        tool_call["name"]
+                    ).time(), profile_section(tool=tool_call["name"]):
+                        tool_result = await self.tools_dict[tool_call["name"]].ainvoke(
+                            tool_call["args"]
+                        )
             return ToolMessage(
                 content=str(tool_result),
                 name=tool_call["name"],
                 tool_call_id=tool_call["id"],
             )
+        except TimeoutError:
+            return ToolMessage(
+                content=f"Error executing tool {tool_call['name']}: it did not complete in the time available for the research.",
+                name=tool_call["name"],
+                tool_call_id=tool_call["id"],
+            )
         except Exception as e:
             return ToolMessage(
                 content=f"Error executing tool {tool_call['name']}: {e}",
@@ -172,21 +209,30 @@ class WorkflowNodes:
                 tool_call_id=tool_call["id"],
             )
 
-    def tools_node(self, state: AgentState) -> dict[str, Any]:
-        """Node that executes tool calls based on the plan. It runs them asynchronously to reduce latency."""
+    async def tools_node(
+        self, state: AgentState, config: RunnableConfig
+    ) -> dict[str, Any]:
+        """Node that executes tool calls based on the plan. It runs them concurrently to reduce latency.
 
-        async def run_tool_calls() -> list[ToolMessage]:
-            tasks = [
-                self.__execute_tool_call(tool_call)
+        If the run is cancelled, the pending tool calls are cancelled with it.
+        """
+        user_id = config["configurable"].get("user_id", "anonymous")
+        timeout = get_step_timeout(config)
+        outputs = await asyncio.gather(
+            *[
+                self.__execute_tool_call(tool_call, user_id, timeout)
                 for tool_call in state["messages"][-1].tool_calls
             ]
-            return await asyncio.gather(*tasks)
+        )
+        return {"messages": list(outputs)}
 
-        outputs = asyncio.run(run_tool_calls())
-        return {"messages": outputs}
+    async def agent_node(
+        self, state: AgentState, config: RunnableConfig
+    ) -> dict[str, Any]:
+        """Node that uses the LLM with tools to process results.
 
-    def agent_node(self, state: AgentState) -> dict[str, Any]:
-        """Node that uses the LLM with tools to process results."""
+        When the query is close to its deadline, or the step times out, the LLM must answer without tools.
+        """
         system_prompt = SystemMessage(
             content=agent_prompt.format(
                 tools=self.__format_tools_description(),
@@ -195,14 +241,33 @@ class WorkflowNodes:
             )
         )
         messages = get_agent_messages(state)
-        response = self.agent_llm.invoke([system_prompt] + messages)
+        if get_remaining_time(config) > QUERY_ANSWER_RESERVE:
+            try:
+                response = await self.agent_llm.ainvoke(
+                    [system_prompt] + messages,
+                    node="agent",
+                    timeout=get_step_timeout(config),
+                )
+                return {"messages": [response]}
+            except TimeoutError as e:
+                logger.warning(f"{e} Forcing a final answer.")
+
+        logger.info("The query is close to its deadline, forcing a final answer")
+        response = await self.final_answer_llm.ainvoke(
+            [system_prompt] + messages + [SystemMessage(content=final_answer_prompt)],
+            node="agent",
+            timeout=get_answer_timeout(config),
+        )
         return {"messages": [response]}
 
-    def judge_node(self, state: AgentState) -> dict[str, Any]:
+    async def judge_node(
+        self, state: AgentState, config: RunnableConfig
+    ) -> dict[str, Any]:
         """Node that evaluates the quality of the final answer."""
         # End execution if the LLM failed twice
         num_feedback_requests = state.get("num_feedback_requests", 0)
         if num_feedback_requests >= MAX_FEEDBACK_REQUESTS:
+            FEEDBACK_LOOPS.labels("limit").inc()
             return {"is_good_answer": True}
 
         system_prompt = SystemMessage(
@@ -211,10 +276,20 @@ class WorkflowNodes:
                 custom_instructions=self.__format_custom_instructions(),
             )
         )
-        response: JudgeOutput = self.judge_llm.invoke(
-            [system_prompt] + state["messages"]
-        )
+        try:
+            response: JudgeOutput = await self.judge_llm.ainvoke(
+                [system_prompt] + state["messages"],
+                node="judge",
+                timeout=get_step_timeout(config),
+            )
+        except TimeoutError as e:
+            logger.warning(f"{e} Accepting the answer.")
+            FEEDBACK_LOOPS.labels("timeout").inc()
+            return {"is_good_answer": True}
 
+        FEEDBACK_LOOPS.labels(
+            "accepted" if response.is_good_answer else "feedback"
+        ).inc()
         output = {
             "is_good_answer": response.is_good_answer,
             "num_feedback_requests": num_feedback_requests + 1,
@@ -0,0 +1,185 @@
+"""Profile the cold start of the backend.
+
+Imports the server module in fresh interpreters with `-X importtime`, reports the slowest imports and checks
+that the heavy dependencies are not imported at startup. Optionally starts the server and measures the time
+until it answers its first request. Exits with an error when a budget is exceeded, so it can run in CI.
+
+Usage:
+    python profile_startup.py --runs 5 --max-import-seconds 1.0
+    python profile_startup.py --serve --max-startup-seconds 5 --json startup.json
+"""
+
+import argparse
+import json
+import os
+import re
+import statistics
+import subprocess
+import sys
+import time
+import urllib.error
+import urllib.request
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).parent
+
+# Dependencies that must only be imported on first use or by the warm-up
+HEAVY_MODULES = [
+    "langgraph",
+    "langchain_openai",
+    "langchain_community",
+    "faiss",
+    "pdfplumber",
+    "cloudscraper",
+    "bs4",
+    "exa_py",
+]
+
+IMPORT_TIME_PATTERN = re.compile(r"^import time:\s+\d+ \|\s+(\d+) \|\s+(\S+)$")
+
+
+def profile_imports(module: str) -> dict[str, float]:
+    """Import a module in a fresh interpreter, returning the cumulative import time in seconds per module."""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=BACKEND_DIR,
+        capture_output=True,
+        text=True,
+    )
+    if result.returncode:
+        raise RuntimeError(f"Failed to import {module}:\n{result.stderr}")
+
+    times = {}
+    for line in result.stderr.splitlines():
+        if match := IMPORT_TIME_PATTERN.match(line):
+            cumulative, name = match.groups()
+            times[name] = max(times.get(name, 0.0), int(cumulative) / 1e6)
+    return times
+
+
+def measure_startup(port: int, timeout: float) -> float:
+    """Start the server and return the seconds until it answers its liveness endpoint."""
+    env = {**os.environ, "SERVER_PORT": str(port), "SERVER_WORKERS": "1"}
+    start = time.perf_counter()
+    process = subprocess.Popen(
+        [sys.executable, "main.py"],
+        cwd=BACKEND_DIR,
+        env=env,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+    try:
+        while time.perf_counter() - start < timeout:
+            if process.poll() is not None:
+                raise RuntimeError(f"The server exited with code {process.returncode}")
+            try:
+                with urllib.request.urlopen(
+                    f"http://localhost:{port}/health/live", timeout=1
+                ):
+                    return time.perf_counter() - start
+            except (urllib.error.URLError, ConnectionError):
+                time.sleep(0.05)
+        raise TimeoutError(f"The server did not start within {timeout} seconds")
+    finally:
+        process.terminate()
+        process.wait()
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Profile the cold start of the backend."
+    )
+    parser.add_argument(
+        "--module", default="server.server", help="Module imported at startup."
+    )
+    parser.add_argument(
+        "--runs", type=int, default=5, help="Fresh interpreters to average over."
+    )
+    parser.add_argument(
+        "--top", type=int, default=15, help="Slowest imports to report."
+    )
+    parser.add_argument(
+        "--max-import-seconds",
+        type=float,
+        default=None,
+        help="Fail if the median import time of the module exceeds this.",
+    )
+    parser.add_argument(
+        "--serve",
+        action="store_true",
+        help="Also measure the time until the server answers its first request.",
+    )
+    parser.add_argument(
+        "--port", type=int, default=8765, help="Port of the server started by --serve."
+    )
+    parser.add_argument(
+        "--max-startup-seconds",
+        type=float,
+        default=None,
+        help="Fail if the server takes longer to answer its first request.",
+    )
+    parser.add_argument(
+        "--json", type=Path, default=None, help="Write the results to a JSON file."
+    )
+    args = parser.parse_args()
+
+    runs = [profile_imports(args.module) for _ in range(args.runs)]
+    medians = {
+        name: statistics.median(run.get(name, 0.0) for run in runs)
+        for name in set().union(*runs)
+    }
+    import_seconds = medians[args.module]
+    heavy_imported = sorted(name for name in medians if name in HEAVY_MODULES)
+
+    print(
+        f"Import time of {args.module}: {import_seconds:.3f}s (median of {args.runs})"
+    )
+    print("\nSlowest imports:")
+    slowest = sorted(
+        (item for item in medians.items() if item[0] != args.module),
+        key=lambda item: item[1],
+        reverse=True,
+    )
+    for name, seconds in slowest[: args.top]:
+        print(f"  {seconds:7.3f}s  {name}")
+    if heavy_imported:
+        print(f"\nHeavy modules imported at startup: {', '.join(heavy_imported)}")
+
+    results = {
+        "module": args.module,
+        "import_seconds": import_seconds,
+        "heavy_imported": heavy_imported,
+        "slowest": dict(slowest[: args.top]),
+    }
+    if args.serve:
+        startup_seconds = measure_startup(
+            args.port, timeout=max(60.0, args.max_startup_seconds or 0)
+        )
+        results["startup_seconds"] = startup_seconds
+        print(f"\nTime to first request: {startup_seconds:.3f}s")
+
+    if args.json:
+        args.json.write_text(json.dumps(results, indent=2))
+
+    failures = []
+    if heavy_imported:
+        failures.append("heavy modules are imported at startup")
+    if args.max_import_seconds and import_seconds > args.max_import_seconds:
+        failures.append(
+            f"import time {import_seconds:.3f}s exceeds {args.max_import_seconds}s"
+        )
+    if (
+        args.serve
+        and args.max_startup_seconds
+        and results["startup_seconds"] > args.max_startup_seconds
+    ):
+        failures.append(
+            f"startup time {results['startup_seconds']:.3f}s exceeds {args.max_startup_seconds}s"
+        )
+    if failures:
+        print(f"\nFAILED: {'; '.join(failures)}", file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
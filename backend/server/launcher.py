@@ -0,0 +1,176 @@
+import asyncio
+import multiprocessing
+import os
+import shutil
+import signal
+import socket
+import sys
+import tempfile
+import time
+from multiprocessing.context import SpawnProcess
+
+import uvicorn
+from nexusai.config import (
+    SERVER_HOST,
+    SERVER_PORT,
+    SERVER_WORKERS,
+    SHUTDOWN_DRAIN_TIMEOUT,
+    SHUTDOWN_GRACE_PERIOD,
+    validate_config,
+)
+from nexusai.utils.logger import logger, stop_logger
+from prometheus_client import multiprocess
+from server.lifecycle import worker_state
+
+APP = "server.server:app"
+STARTUP_FAILURE = 3  # exit code of a worker that failed to start, as in uvicorn
+
+
+class GracefulServer(uvicorn.Server):
+    """A uvicorn server that drains its research runs before shutting down.
+
+    On the first SIGTERM or SIGINT, the worker stops being ready and accepting research runs, and waits up to
+    `SHUTDOWN_DRAIN_TIMEOUT` seconds for the in-flight ones before closing the connections. A second signal
+    shuts it down immediately. Interrupted runs are checkpointed, so clients can resume them on another worker.
+    """
+
+    drain_task: asyncio.Task | None = None
+
+    async def serve(self, sockets: list[socket.socket] | None = None) -> None:
+        self.loop = asyncio.get_running_loop()
+        await super().serve(sockets)
+
+    def handle_exit(self, sig: int, frame) -> None:
+        if not self.started or worker_state.draining:
+            super().handle_exit(sig, frame)
+            return
+        worker_state.draining = True
+        self.loop.call_soon_threadsafe(self.__start_drain, sig)
+
+    def __start_drain(self, sig: int) -> None:
+        self.drain_task = self.loop.create_task(self.__drain(sig))
+
+    async def __drain(self, sig: int) -> None:
+        await worker_state.drain(SHUTDOWN_DRAIN_TIMEOUT)
+        super().handle_exit(sig, None)
+
+
+def _serve(config: uvicorn.Config, sock: socket.socket) -> None:
+    """Entry point of a worker process."""
+    config.configure_logging()
+    server = GracefulServer(config)
+    try:
+        server.run(sockets=[sock])
+    except KeyboardInterrupt:
+        pass
+    finally:
+        # Worker processes exit without running the atexit handlers
+        stop_logger()
+    if not server.started:
+        sys.exit(STARTUP_FAILURE)
+
+
+class Supervisor:
+    """Runs the server in several worker processes sharing the listening socket.
+
+    Workers that die are replaced. On SIGTERM or SIGINT, the signal is forwarded to the workers so that
+    they drain, and those still running after the drain and grace periods are killed.
+    """
+
+    def __init__(self, config: uvicorn.Config, num_workers: int):
+        self.config = config
+        self.num_workers = num_workers
+        self.context = multiprocessing.get_context("spawn")
+        self.socket = config.bind_socket()
+        self.workers: list[SpawnProcess] = []
+        self.signals: list[int] = []
+
+    def __spawn(self) -> SpawnProcess:
+        worker = self.context.Process(target=_serve, args=(self.config, self.socket))
+        worker.start()
+        logger.info(f"Started worker {worker.pid}")
+        return worker
+
+    def __reap(self, worker: SpawnProcess) -> None:
+        worker.join()
+        if "PROMETHEUS_MULTIPROC_DIR" in os.environ:
+            multiprocess.mark_process_dead(worker.pid)
+
+    def __forward(self, sig: int) -> None:
+        for worker in self.workers:
+            if worker.is_alive():
+                os.kill(worker.pid, sig)
+
+    def run(self) -> None:
+        for sig in (signal.SIGTERM, signal.SIGINT):
+            signal.signal(sig, lambda sig, frame: self.signals.append(sig))
+
+        logger.info(
+            f"Starting {self.num_workers} workers on {SERVER_HOST}:{SERVER_PORT}"
+        )
+        self.workers = [self.__spawn() for _ in range(self.num_workers)]
+        while not self.signals:
+            time.sleep(0.5)
+            for i, worker in enumerate(self.workers):
+                if worker.is_alive():
+                    continue
+                self.__reap(worker)
+                if worker.exitcode == STARTUP_FAILURE:
+                    logger.error(f"Worker {worker.pid} failed to start, stopping")
+                    self.signals.append(signal.SIGTERM)
+                    break
+                logger.warning(
+                    f"Worker {worker.pid} died with exit code {worker.exitcode}, restarting it"
+                )
+                self.workers[i] = self.__spawn()
+
+        self.shutdown()
+
+    def shutdown(self) -> None:
+        """Drain the workers, forwarding any further signal, and kill those past the deadline."""
+        logger.info(f"Shutting down {len(self.workers)} workers")
+        forwarded = 0
+        deadline = time.monotonic() + SHUTDOWN_DRAIN_TIMEOUT + SHUTDOWN_GRACE_PERIOD
+        while any(worker.is_alive() for worker in self.workers):
+            while forwarded < len(self.signals):
+                self.__forward(self.signals[forwarded])
+                forwarded += 1
+            if time.monotonic() > deadline:
+                logger.warning("Workers did not stop in time, killing them")
+                for worker in self.workers:
+                    worker.kill()
+                break
+            time.sleep(0.1)
+
+        for worker in self.workers:
+            self.__reap(worker)
+        self.socket.close()
+
+
+def run() -> None:
+    """Serve the API with `SERVER_WORKERS` processes, or in this process if there is only one."""
+    validate_config()
+    config = uvicorn.Config(
+        APP,
+        host=SERVER_HOST,
+        port=SERVER_PORT,
+        timeout_graceful_shutdown=SHUTDOWN_GRACE_PERIOD,
+    )
+    if SERVER_WORKERS <= 1:
+        GracefulServer(config).run()
+        return
+
+    # Aggregate the Prometheus metrics of the workers through files in a shared directory
+    metrics_dir = os.environ.get("PROMETHEUS_MULTIPROC_DIR")
+    if metrics_dir:
+        shutil.rmtree(metrics_dir, ignore_errors=True)
+        os.makedirs(metrics_dir)
+    else:
+        os.environ["PROMETHEUS_MULTIPROC_DIR"] = tempfile.mkdtemp(
+            prefix="nexusai-metrics-"
+        )
+    try:
+        Supervisor(config, SERVER_WORKERS).run()
+    finally:
+        if not metrics_dir:
+            shutil.rmtree(os.environ["PROMETHEUS_MULTIPROC_DIR"], ignore_errors=True)
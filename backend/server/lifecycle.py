@@ -0,0 +1,145 @@
+import asyncio
+import importlib
+import os
+import time
+from contextlib import contextmanager
+from typing import Iterator
+
+from nexusai.cache.connection import get_async_redis_client, get_redis_client
+from nexusai.config import LIVENESS_MAX_LOOP_LAG, READINESS_REDIS_TIMEOUT
+from nexusai.utils.logger import logger
+from nexusai.utils.metrics import EVENT_LOOP_LAG_SECONDS
+
+# Modules imported on first use, by the server (the agent and paper pipeline) and by the libraries
+# (e.g. faiss by the FAISS vector store)
+WARM_UP_MODULES = [
+    "nexusai.agent",
+    "nexusai.chat",
+    "nexusai.utils.messages",
+    "faiss",
+    "pdfminer.high_level",
+    "pdfminer.layout",
+]
+
+
+class WorkerState:
+    """Lifecycle of this worker, reported by the health endpoints and used to drain it on shutdown."""
+
+    heartbeat_interval = 1.0  # seconds
+
+    def __init__(self):
+        self.started_at = time.time()
+        self.ready = False
+        self.draining = False
+        self.active_runs = 0
+        self.idle = asyncio.Event()
+        self.idle.set()
+        self.loop_lag = 0.0
+
+    @property
+    def state(self) -> str:
+        if self.draining:
+            return "draining"
+        return "ready" if self.ready else "starting"
+
+    @contextmanager
+    def track_run(self) -> Iterator[None]:
+        """Count a research run as in flight while the block runs."""
+        self.active_runs += 1
+        self.idle.clear()
+        try:
+            yield
+        finally:
+            self.active_runs -= 1
+            if not self.active_runs:
+                self.idle.set()
+
+    async def drain(self, timeout: float) -> None:
+        """Stop accepting research runs and wait up to `timeout` seconds for the in-flight ones."""
+        self.draining = True
+        logger.info(
+            f"Draining worker {os.getpid()} with {self.active_runs} research runs in flight"
+        )
+        try:
+            await asyncio.wait_for(self.idle.wait(), timeout)
+        except TimeoutError:
+            logger.warning(
+                f"Drain timeout of {timeout}s exceeded, interrupting {self.active_runs} research runs"
+            )
+
+    async def monitor_loop(self) -> None:
+        """Measure how late the event loop runs a periodic heartbeat."""
+        while True:
+            start = time.perf_counter()
+            await asyncio.sleep(self.heartbeat_interval)
+            self.loop_lag = time.perf_counter() - start - self.heartbeat_interval
+            EVENT_LOOP_LAG_SECONDS.set(self.loop_lag)
+
+    def is_alive(self) -> bool:
+        return self.loop_lag < LIVENESS_MAX_LOOP_LAG
+
+    async def is_ready(self) -> bool:
+        """Whether the worker accepts new research runs: warmed up, not draining and connected to Redis."""
+        if not self.ready or self.draining:
+            return False
+        try:
+            await asyncio.wait_for(
+                get_async_redis_client().ping(), READINESS_REDIS_TIMEOUT
+            )
+            return True
+        except Exception as e:
+            logger.warning(f"Worker not ready, Redis is unreachable: {e}")
+            return False
+
+    def status(self) -> dict:
+        return {
+            "pid": os.getpid(),
+            "state": self.state,
+            "active_runs": self.active_runs,
+            "uptime": round(time.time() - self.started_at, 1),
+            "loop_lag": round(self.loop_lag, 3),
+        }
+
+
+worker_state = WorkerState()
+
+
+def _warm_up_sync() -> None:
+    """Blocking part of the warm-up, run in a thread."""
+    for module in WARM_UP_MODULES:
+        importlib.import_module(module)
+
+    import tiktoken
+    from nexusai.llm.pool import get_pool
+
+    for tier in ("small", "large", "embedding"):
+        get_pool(tier)
+
+    get_redis_client().ping()
+
+    # Load the tokenizers of the embedding models, which are downloaded on first use
+    for deployment in get_pool("embedding").deployments:
+        model = deployment.client.tiktoken_model_name or deployment.client.model
+        try:
+            tiktoken.encoding_for_model(model)
+        except KeyError:
+            tiktoken.get_encoding("cl100k_base")
+
+
+async def warm_up() -> None:
+    """Prepare the worker in the background, then mark it as ready to receive traffic.
+
+    Imports the modules loaded lazily, connects to Redis and creates the LLM and embedding clients,
+    so that the first requests are not slower. Failures are logged and left to the readiness checks.
+    """
+    start = time.perf_counter()
+    try:
+        await asyncio.gather(
+            get_async_redis_client().ping(), asyncio.to_thread(_warm_up_sync)
+        )
+        logger.info(
+            f"Worker {os.getpid()} warmed up in {time.perf_counter() - start:.2f}s"
+        )
+    except Exception as e:
+        logger.error(f"Error warming up worker {os.getpid()}: {e}")
+    worker_state.ready = True
@@ -1,15 +1,57 @@
+from enum import StrEnum, auto
+
+from nexusai.config import JOBS_MAX_URLS
 from nexusai.models.llm import ModelProviderType, ProviderDetails
-from nexusai.utils.messages import AgentMessage
+from nexusai.models.outputs import AgentMessage, PaperOutput
 from pydantic import BaseModel, Field
 
 
+class QueryPolicy(StrEnum):
+    """How a connection handles a query received while another one is running."""
+
+    reject = auto()
+    queue = auto()
+    parallel = auto()
+
+
 class PapersRequest(BaseModel):
     urls: list[str] = Field(..., max_length=10)
 
 
+class PaperJobRequest(BaseModel):
+    urls: list[str] = Field(..., min_length=1, max_length=JOBS_MAX_URLS)
+
+
+class PaperJobResponse(BaseModel):
+    job_id: str
+
+
+class PaperStreamItem(BaseModel):
+    """A line of the /papers/stream response: the paper created from a URL or the reason it failed.
+
+    `url` is the URL as sent by the client, and `canonical_url` the URL it was processed under.
+    """
+
+    url: str
+    canonical_url: str | None = None
+    paper: PaperOutput | None = None
+    error: str | None = None
+
+
 class MessageRequest(BaseModel):
+    # Only used to seed a new session, the server keeps the history afterwards
     history: list[AgentMessage] | None = None
     query: str | None = None
     custom_instructions: list[str] = []
     model_provider: ModelProviderType = ModelProviderType.default
     provider_details: ProviderDetails | None = None
+    # Cancel the research in progress
+    cancel: bool = False
+
+
+class ProfilingRequest(BaseModel):
+    """Profile the research runs of a session and/or a fraction of all runs, for `duration` seconds."""
+
+    session_id: str | None = None
+    sample_rate: float = Field(0.0, ge=0.0, le=1.0)
+    duration: int = Field(3600, gt=0)
@@ -1,18 +1,80 @@
 import asyncio
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import TYPE_CHECKING, AsyncIterator
+from uuid import uuid4
 
-from fastapi import FastAPI, HTTPException, Query, WebSocket
+from fastapi import FastAPI, Header, HTTPException, Query, WebSocket
 from fastapi.middleware.cors import CORSMiddleware
-from nexusai.agent import process_query
-from nexusai.chat import process_paper
-from nexusai.config import FRONTEND_URL
+from fastapi.responses import (
+    HTMLResponse,
+    JSONResponse,
+    PlainTextResponse,
+    Response,
+    StreamingResponse,
+)
+from nexusai.cache.session_store import SessionStore
+from nexusai.config import (
+    FRONTEND_URL,
+    METRICS_ENABLED,
+    PAPERS_CONCURRENCY,
+    SESSION_HISTORY_LIMIT,
+    WS_MAX_PARALLEL_QUERIES,
+    WS_MAX_QUEUED_QUERIES,
+    WS_QUERY_POLICY,
+    validate_config,
+)
+from nexusai.jobs.paper_jobs import PaperJobQueue, PaperWorkerPool
+from nexusai.models.jobs import PaperJob
 from nexusai.models.outputs import AgentMessage, AgentMessageType, PaperOutput
+from nexusai.scheduling.fair_scheduler import Priority, run_scheduler, tool_scheduler
 from nexusai.utils.logger import logger
-from server.models import MessageRequest, PapersRequest
-from server.utils import validate_jwt
+from nexusai.utils.metrics import generate_metrics
+from nexusai.utils.profiler import list_profiles, set_profiling_settings
+from nexusai.utils.strings import canonicalize_url
+from nexusai.utils.tracing import list_traces, load_trace
+from prometheus_client import CONTENT_TYPE_LATEST
+from server.lifecycle import warm_up, worker_state
+from server.models import (
+    MessageRequest,
+    PaperJobRequest,
+    PaperJobResponse,
+    PapersRequest,
+    PaperStreamItem,
+    ProfilingRequest,
+    QueryPolicy,
+)
+from server.utils import get_user_id, validate_admin_key, validate_jwt
+from server.waterfall import render_waterfall
 from server.websocket_manager import WebSocketManager
 
+if TYPE_CHECKING:
+    from langchain_core.messages import BaseMessage
+
+# The agent, the paper pipeline and their dependencies (langchain, langgraph, FAISS, pdfplumber...) are
+# imported on first use, or by the warm-up once the worker is serving, so that workers start quickly.
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Validate the configuration, warm up the worker in the background and run the paper job workers."""
+    validate_config()
+    warm_up_task = asyncio.create_task(warm_up())
+    loop_monitor = asyncio.create_task(worker_state.monitor_loop())
+    worker_pool = PaperWorkerPool()
+    if worker_pool.num_workers:
+        worker_pool.start()
+    yield
+    warm_up_task.cancel()
+    loop_monitor.cancel()
+    await worker_pool.stop()
+
+
 # FastAPI app
-app = FastAPI()
+app = FastAPI(lifespan=lifespan)
+
+# Sent to clients when a draining worker refuses new research runs
+SHUTDOWN_MESSAGE = "The server is restarting. Reconnect to start a new research."
 
 # WebSocket manager
 manager = WebSocketManager()
@@ -32,19 +94,50 @@ async def http_root():
     return "🚀 NexusAI is up and running!"
 
 
+@app.get("/health/live")
+async def http_liveness() -> JSONResponse:
+    """Report whether the worker is alive, i.e. its event loop is not blocked."""
+    return JSONResponse(
+        worker_state.status(), status_code=200 if worker_state.is_alive() else 503
+    )
+
+
+@app.get("/health/ready")
+async def http_readiness() -> JSONResponse:
+    """Report whether the worker accepts new research runs."""
+    ready = await worker_state.is_ready()
+    return JSONResponse(worker_state.status(), status_code=200 if ready else 503)
+
+
+@app.get("/metrics")
+async def http_metrics() -> Response:
+    """Expose the Prometheus metrics of the workers."""
+    if not METRICS_ENABLED:
+        raise HTTPException(status_code=404, detail="Metrics are disabled")
+    return Response(generate_metrics(), media_type=CONTENT_TYPE_LATEST)
+
+
 @app.post("/papers")
 async def http_create_papers(
     request: PapersRequest, token: str = Query(None)
 ) -> list[PaperOutput]:
     """Create papers from URLs concurrently."""
+    from nexusai.chat import process_paper
+
     logger.info("Validating token...")
-    if not token or not validate_jwt(token):
+    if not token or (claims := validate_jwt(token)) is None:
         logger.error("Missing or invalid token")
         raise HTTPException(status_code=401, detail="Missing or invalid token")
 
     try:
-        # Process papers concurrently
-        tasks = [process_paper(url) for url in request.urls]
+        # Process papers concurrently, as bulk work of the user
+        user_id = get_user_id(claims)
+
+        async def process(url: str) -> PaperOutput | None:
+            async with run_scheduler.slot(user_id, Priority.bulk):
+                return await process_paper(url)
+
+        tasks = [process(url) for url in request.urls]
         papers = await asyncio.gather(*tasks)
         return [paper for paper in papers if paper]
     except Exception as e:
@@ -52,66 +145,354 @@ async def http_create_papers(
         raise HTTPException(status_code=500, detail="Error processing papers")
 
 
+async def stream_papers(urls: list[str], user_id: str) -> AsyncIterator[str]:
+    """Process papers with bounded concurrency, yielding each result as an NDJSON line as soon as it completes."""
+    from nexusai.chat import process_paper
+
+    semaphore = asyncio.Semaphore(PAPERS_CONCURRENCY)
+
+    async def process(url: str) -> PaperStreamItem:
+        async with semaphore, run_scheduler.slot(user_id, Priority.bulk):
+            try:
+                if paper := await process_paper(url):
+                    return PaperStreamItem(url=url, canonical_url=url, paper=paper)
+                return PaperStreamItem(
+                    url=url, canonical_url=url, error="Failed to download the paper"
+                )
+            except Exception as e:
+                logger.error(f"Error processing paper {url}: {e}")
+                return PaperStreamItem(
+                    url=url, canonical_url=url, error="Failed to process the paper"
+                )
+
+    # Identical URLs in the batch are processed once, and each URL sent gets its own line
+    urls_by_canonical_url: dict[str, list[str]] = {}
+    for url in urls:
+        urls_by_canonical_url.setdefault(canonicalize_url(url), []).append(url)
+    tasks = [asyncio.create_task(process(url)) for url in urls_by_canonical_url]
+    try:
+        for next_item in asyncio.as_completed(tasks):
+            item = await next_item
+            for url in urls_by_canonical_url[item.canonical_url]:
+                yield item.model_copy(update={"url": url}).model_dump_json(
+                    exclude_none=True
+                ) + "\n"
+    finally:
+        # Stop the remaining papers if the client went away
+        for task in tasks:
+            task.cancel()
+
+
+@app.post("/papers/stream")
+async def http_stream_papers(
+    request: PapersRequest, token: str = Query(None)
+) -> StreamingResponse:
+    """Create papers from URLs, streaming each paper or error as NDJSON as soon as it is ready."""
+    logger.info("Validating token...")
+    if not token or (claims := validate_jwt(token)) is None:
+        logger.error("Missing or invalid token")
+        raise HTTPException(status_code=401, detail="Missing or invalid token")
+
+    return StreamingResponse(
+        stream_papers(request.urls, get_user_id(claims)),
+        media_type="application/x-ndjson",
+    )
+
+
+@app.post("/papers/jobs")
+async def http_create_paper_job(
+    request: PaperJobRequest, token: str = Query(None)
+) -> PaperJobResponse:
+    """Queue papers to be processed in the background by the paper job workers."""
+    logger.info("Validating token...")
+    if not token or (claims := validate_jwt(token)) is None:
+        logger.error("Missing or invalid token")
+        raise HTTPException(status_code=401, detail="Missing or invalid token")
+
+    job_id = await PaperJobQueue().submit(request.urls, get_user_id(claims))
+    return PaperJobResponse(job_id=job_id)
+
+
+@app.get("/papers/jobs/{job_id}")
+async def http_get_paper_job(job_id: str, token: str = Query(None)) -> PaperJob:
+    """Get the status of a paper job and the papers processed so far. Only the user who submitted it can see it."""
+    logger.info("Validating token...")
+    if not token or (claims := validate_jwt(token)) is None:
+        logger.error("Missing or invalid token")
+        raise HTTPException(status_code=401, detail="Missing or invalid token")
+
+    if job := await PaperJobQueue().get(job_id, get_user_id(claims)):
+        return job
+    raise HTTPException(status_code=404, detail="Job not found")
+
+
+@app.get("/papers/jobs/{job_id}/stream")
+async def http_stream_paper_job(
+    job_id: str, token: str = Query(None)
+) -> StreamingResponse:
+    """Stream the items of a paper job as NDJSON as they complete or fail. Only the user who submitted it can see it."""
+    logger.info("Validating token...")
+    if not token or (claims := validate_jwt(token)) is None:
+        logger.error("Missing or invalid token")
+        raise HTTPException(status_code=401, detail="Missing or invalid token")
+
+    queue = PaperJobQueue()
+    if not await queue.get(job_id, get_user_id(claims)):
+        raise HTTPException(status_code=404, detail="Job not found")
+
+    async def stream_items() -> AsyncIterator[str]:
+        async for item in queue.watch(job_id):
+            yield item.model_dump_json(exclude_none=True) + "\n"
+
+    return StreamingResponse(stream_items(), media_type="application/x-ndjson")
+
+
+def check_admin_key(key: str | None) -> None:
+    if not validate_admin_key(key):
+        logger.error("Missing or invalid admin key")
+        raise HTTPException(status_code=403, detail="Missing or invalid admin key")
+
+
+@app.post("/admin/profiling")
+async def http_enable_profiling(
+    request: ProfilingRequest, x_admin_key: str | None = Header(None)
+) -> ProfilingRequest:
+    """Profile the research runs of a session and/or a sample of all runs, in all the workers."""
+    check_admin_key(x_admin_key)
+    await set_profiling_settings(
+        request.session_id, request.sample_rate, request.duration
+    )
+    logger.info(f"Profiling enabled: {request.model_dump_json()}")
+    return request
+
+
+@app.delete("/admin/profiling")
+async def http_disable_profiling(x_admin_key: str | None = Header(None)) -> None:
+    """Stop profiling new research runs."""
+    check_admin_key(x_admin_key)
+    await set_profiling_settings(None, 0.0, 0)
+    logger.info("Profiling disabled")
+
+
+@app.get("/admin/profiles")
+async def http_list_profiles(x_admin_key: str | None = Header(None)) -> list[str]:
+    """List the profiles stored by this worker's host, most recent first."""
+    check_admin_key(x_admin_key)
+    return [path.name for path in list_profiles()]
+
+
+@app.get("/admin/profiles/{name}")
+async def http_get_profile(
+    name: str, x_admin_key: str | None = Header(None)
+) -> PlainTextResponse:
+    """Get a profile as collapsed stacks, to render with flamegraph.pl or speedscope."""
+    check_admin_key(x_admin_key)
+    if path := next((p for p in list_profiles() if p.name == name), None):
+        return PlainTextResponse(path.read_text())
+    raise HTTPException(status_code=404, detail="Profile not found")
+
+
+@app.get("/admin/scheduler")
+async def http_get_scheduler(x_admin_key: str | None = Header(None)) -> dict:
+    """Get the slots in use and the per-user queues of this worker's schedulers."""
+    check_admin_key(x_admin_key)
+    return {
+        scheduler.name: scheduler.stats()
+        for scheduler in (run_scheduler, tool_scheduler)
+    }
+
+
+@app.get("/admin/traces")
+async def http_list_traces(x_admin_key: str | None = Header(None)) -> list[str]:
+    """List the ids of the traces stored by this worker's host, most recent first."""
+    check_admin_key(x_admin_key)
+    return [path.stem.rsplit("-", 1)[-1] for path in list_traces()]
+
+
+@app.get("/admin/traces/{trace_id}")
+async def http_get_trace(trace_id: str, x_admin_key: str | None = Header(None)) -> dict:
+    """Get the spans of a trace in the OTLP/JSON format."""
+    check_admin_key(x_admin_key)
+    if trace := await asyncio.to_thread(load_trace, trace_id):
+        return trace
+    raise HTTPException(status_code=404, detail="Trace not found")
+
+
+@app.get("/admin/traces/{trace_id}/waterfall")
+async def http_get_trace_waterfall(
+    trace_id: str, x_admin_key: str | None = Header(None)
+) -> HTMLResponse:
+    """Show the spans of a trace as a waterfall."""
+    check_admin_key(x_admin_key)
+    if trace := await asyncio.to_thread(load_trace, trace_id):
+        return HTMLResponse(render_waterfall(trace))
+    raise HTTPException(status_code=404, detail="Trace not found")
+
+
 @app.websocket("/ws")
 async def ws_process_query(websocket: WebSocket):
-    """Chat with the agent through a websocket."""
+    """Chat with the agent through a websocket.
+
+    The conversation is stored server-side under the `session_id` query parameter and the user of the token, so
+    clients only send new queries and can reconnect to any worker to resume the session.
+
+    The `query_policy` query parameter sets how queries received while another one is running are handled:
+    rejected, queued, or run in parallel.
+    """
 
     async def send_intermediate_message(message: AgentMessage):
-        """Callback function to send intermediate messages to the client."""
-        await manager.send_message(message.model_dump(), websocket)
+        """Callback function to send intermediate messages to the client without waiting for them to be sent."""
+        connection.send(message.model_dump())
+
+    def send_error(content: str):
+        connection.send(
+            AgentMessage(
+                order=0,
+                type=AgentMessageType.error,
+                content=content,
+            ).model_dump()
+        )
+
+    async def run_query(request: MessageRequest):
+        """Process a query, store it in the session and send the final message."""
+        nonlocal messages
+        from nexusai.agent import process_query
+        from nexusai.utils.messages import build_messages
+
+        with worker_state.track_run():
+            if messages is None:
+                messages = build_messages(await session.load())
+
+            # Process the query using the agent's workflow, resuming it if it was interrupted
+            run_id, resume = await session.start_run(request.query)
+            completed = False
+            try:
+                async with run_scheduler.slot(user_id, Priority.interactive):
+                    result: AgentMessage = await process_query(
+                        query=request.query,
+                        messages=messages,
+                        message_callback=send_intermediate_message,
+                        custom_instructions=request.custom_instructions,
+                        model_provider=request.model_provider,
+                        provider_details=request.provider_details,
+                        session_id=session.session_id,
+                        run_id=run_id,
+                        resume=resume,
+                        user_id=user_id,
+                    )
+                completed = result.type != AgentMessageType.error
+            finally:
+                await session.finish_run(run_id, completed)
+            new_messages = [
+                AgentMessage(
+                    order=await session.length(),
+                    type=AgentMessageType.human,
+                    content=request.query,
+                ),
+                result,
+            ]
+            await session.append(*new_messages)
+            messages = (messages + build_messages(new_messages))[
+                -SESSION_HISTORY_LIMIT:
+            ]
+
+            # Send final message
+            connection.send(result.model_dump())
 
     # Validate token
     token = websocket.query_params.get("token")
     logger.info("Validating token...")
-    if not token or not validate_jwt(token):
+    if not token or (claims := validate_jwt(token)) is None:
         logger.error("Missing or invalid token")
         await websocket.close(code=4001, reason="Missing or invalid token")
         return
+    try:
+        policy = QueryPolicy(
+            websocket.query_params.get("query_policy", WS_QUERY_POLICY)
+        )
+    except ValueError as e:
+        await websocket.close(code=4000, reason=str(e))
+        return
+    if worker_state.draining:
+        await websocket.close(code=1012, reason=SHUTDOWN_MESSAGE)
+        return
 
     # Connect and process messages
-    await manager.connect(websocket)
-    history = []
+    user_id = get_user_id(claims)
+    connection = await manager.connect(websocket)
+    session = SessionStore(
+        websocket.query_params.get("session_id") or str(uuid4()), user_id
+    )
+    messages: list[BaseMessage] | None = None  # Loaded lazily on the first query
+
+    # Queries run as tasks while the socket keeps being read, so that disconnects and
+    # cancel messages stop the workflow, its downloads and its pending LLM requests.
+    running: set[asyncio.Task] = set()
+    queued: deque[MessageRequest] = deque()
+    receive_task: asyncio.Task | None = None
     try:
         while True:
+            receive_task = receive_task or asyncio.create_task(connection.receive())
+            done, _ = await asyncio.wait(
+                {receive_task, *running}, return_when=asyncio.FIRST_COMPLETED
+            )
+            for task in done & running:
+                running.remove(task)
+                if not task.cancelled() and (e := task.exception()):
+                    logger.error(f"Error processing query: {e}")
+            if queued and not running:
+                if worker_state.draining:
+                    queued.clear()
+                    send_error(SHUTDOWN_MESSAGE)
+                else:
+                    running.add(asyncio.create_task(run_query(queued.popleft())))
+            if receive_task not in done:
+                continue
+
             # Receive and validate message
-            data = await manager.receive_message(websocket)
+            data = receive_task.result()
+            receive_task = None
+            if data is None:
+                break
             try:
                 request = MessageRequest(**data)
             except ValueError as e:
                 logger.error(e)
-                await manager.send_message(
-                    AgentMessage(
-                        order=0,
-                        type=AgentMessageType.error,
-                        content=str(e),
-                    ).model_dump(),
-                    websocket,
-                )
+                send_error(str(e))
                 continue
 
-            history = request.history or history
+            if request.cancel:
+                if running or queued:
+                    logger.info("Cancelling queries at the client's request")
+                    for task in running:
+                        task.cancel()
+                    running.clear()
+                    queued.clear()
+                    send_error("The research was cancelled.")
+                continue
+
+            if request.history and await session.seed(request.history):
+                messages = None
             if request.query:
-                # Process the query using the agent's workflow
-                result: AgentMessage = await process_query(
-                    query=request.query,
-                    history=history,
-                    message_callback=send_intermediate_message,
-                    custom_instructions=request.custom_instructions,
-                    model_provider=request.model_provider,
-                    provider_details=request.provider_details,
-                )
-                history.append(
-                    AgentMessage(
-                        order=len(history),
-                        type=AgentMessageType.human,
-                        content=request.query,
+                if worker_state.draining:
+                    send_error(SHUTDOWN_MESSAGE)
+                elif not running or (
+                    policy == QueryPolicy.parallel
+                    and len(running) < WS_MAX_PARALLEL_QUERIES
+                ):
+                    running.add(asyncio.create_task(run_query(request)))
+                elif (
+                    policy == QueryPolicy.queue and len(queued) < WS_MAX_QUEUED_QUERIES
+                ):
+                    queued.append(request)
+                else:
+                    send_error(
+                        "A research is already in progress. Wait for it to complete or cancel it."
                     )
-                )
-                history.append(result)
-
-                # Send final message
-                await manager.send_message(result.model_dump(), websocket)
     except Exception as e:
         logger.error(f"Error with websocket: {e}")
     finally:
-        await manager.disconnect(websocket)
+        for task in (*running, receive_task):
+            if task and not task.done():
+                task.cancel()
+        await manager.disconnect(connection)
@@ -1,11 +1,22 @@
+import hmac
+
 from jose import JWTError, jwt
-from nexusai.config import NEXTAUTH_SECRET
+from nexusai.config import ADMIN_API_KEY, NEXTAUTH_SECRET
 
 
-def validate_jwt(token: str) -> bool:
-    """Validate jwt."""
+def validate_jwt(token: str) -> dict | None:
+    """Validate jwt, returning its claims or None if it is invalid."""
     try:
-        jwt.decode(token, NEXTAUTH_SECRET, algorithms=["HS256"])
-        return True
+        return jwt.decode(token, NEXTAUTH_SECRET, algorithms=["HS256"])
     except JWTError:
-        return False
+        return None
+
+
+def get_user_id(claims: dict) -> str:
+    """Identify the user of a token, from the standard `sub` claim or the `userId` set by the frontend."""
+    return str(claims.get("sub") or claims.get("userId") or "anonymous")
+
+
+def validate_admin_key(key: str | None) -> bool:
+    """Check the key of an admin request. Admin endpoints are disabled when `ADMIN_API_KEY` is not set."""
+    return bool(ADMIN_API_KEY and key) and hmac.compare_digest(key, ADMIN_API_KEY)
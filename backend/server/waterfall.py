@@ -0,0 +1,76 @@
+from html import escape
+
+STYLE = """
+body { font-family: sans-serif; font-size: 13px; margin: 16px; }
+table { border-collapse: collapse; width: 100%; }
+td { padding: 2px 6px; white-space: nowrap; border-bottom: 1px solid #eee; }
+td.timeline { width: 60%; position: relative; }
+.bar { position: absolute; top: 4px; height: 12px; min-width: 1px; background: #4a90d9; }
+.bar.client { background: #e08a3c; }
+.bar.error { background: #d9534f; }
+.duration { text-align: right; color: #555; }
+"""
+
+
+def _attribute_value(value: dict) -> str:
+    return str(next(iter(value.values()), ""))
+
+
+def render_waterfall(trace: dict) -> str:
+    """Render a trace in the OTLP/JSON format as an HTML waterfall of its spans, in tree order."""
+    spans = [
+        span
+        for resource_spans in trace.get("resourceSpans", [])
+        for scope_spans in resource_spans.get("scopeSpans", [])
+        for span in scope_spans.get("spans", [])
+    ]
+    if not spans:
+        return "<p>Empty trace</p>"
+
+    children: dict[str | None, list[dict]] = {}
+    span_ids = {span["spanId"] for span in spans}
+    for span in sorted(spans, key=lambda span: int(span["startTimeUnixNano"])):
+        # Spans whose parent was dropped are shown at the root
+        parent_id = span.get("parentSpanId")
+        children.setdefault(parent_id if parent_id in span_ids else None, []).append(
+            span
+        )
+
+    start = min(int(span["startTimeUnixNano"]) for span in spans)
+    end = max(int(span["endTimeUnixNano"]) for span in spans)
+    total = max(end - start, 1)
+
+    rows = []
+    stack = [(span, 0) for span in reversed(children.get(None, []))]
+    while stack:
+        span, depth = stack.pop()
+        span_start = int(span["startTimeUnixNano"])
+        duration = int(span["endTimeUnixNano"]) - span_start
+        attributes = ", ".join(
+            f"{attribute['key']}={_attribute_value(attribute['value'])}"
+            for attribute in span.get("attributes", [])
+        )
+        classes = ["bar"]
+        if span.get("kind") == 3:
+            classes.append("client")
+        if span.get("status", {}).get("code") == 2:
+            classes.append("error")
+            attributes += f" error={span['status'].get('message', '')}"
+        rows.append(
+            f'<tr title="{escape(attributes)}">'
+            f'<td style="padding-left: {6 + depth * 16}px">{escape(span["name"])}</td>'
+            f'<td class="duration">{duration / 1e6:.1f} ms</td>'
+            f'<td class="timeline"><div class="{" ".join(classes)}" '
+            f'style="left: {(span_start - start) / total * 100:.2f}%; width: {duration / total * 100:.2f}%">'
+            f"</div></td></tr>"
+        )
+        stack.extend(
+            (child, depth + 1) for child in reversed(children.get(span["spanId"], []))
+        )
+
+    trace_id = escape(spans[0]["traceId"])
+    return (
+        f"<!DOCTYPE html><html><head><title>Trace {trace_id}</title><style>{STYLE}</style></head>"
+        f"<body><h3>Trace {trace_id}: {total / 1e9:.2f}s, {len(spans)} spans</h3>"
+        f"<table>{''.join(rows)}</table></body></html>"
+    )
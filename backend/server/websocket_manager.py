@@ -1,34 +1,133 @@
 import asyncio
+from collections import deque
 
-from fastapi import WebSocket
+from fastapi import WebSocket, WebSocketDisconnect
+from nexusai.config import WS_RECEIVE_QUEUE_SIZE, WS_SEND_QUEUE_SIZE
+from nexusai.models.outputs import AgentMessageType
 from nexusai.utils.logger import logger
+from nexusai.utils.metrics import WS_ACTIVE_SESSIONS
+
+
+class WebSocketConnection:
+    """A WebSocket connection with dedicated send and receive tasks.
+
+    Outgoing messages go through a bounded queue, so a slow client never blocks the agent.
+    When the queue is full, intermediate messages are coalesced with the last queued one or dropped,
+    while final and error messages are always delivered.
+    """
+
+    critical_types = (AgentMessageType.final, AgentMessageType.error)
+
+    def __init__(self, websocket: WebSocket):
+        self.websocket = websocket
+        self.outbox: deque[dict] = deque()
+        self.outbox_event = asyncio.Event()
+        self.inbox: asyncio.Queue[dict | None] = asyncio.Queue(
+            maxsize=WS_RECEIVE_QUEUE_SIZE
+        )
+        self.num_coalesced = 0
+        self.num_dropped = 0
+        self.tasks: list[asyncio.Task] = []
+
+    def start(self):
+        """Start the send and receive tasks."""
+        self.tasks = [
+            asyncio.create_task(self.__send_loop()),
+            asyncio.create_task(self.__receive_loop()),
+        ]
+
+    async def close(self):
+        """Stop the send and receive tasks."""
+        for task in self.tasks:
+            task.cancel()
+        await asyncio.gather(*self.tasks, return_exceptions=True)
+        if self.num_coalesced or self.num_dropped:
+            logger.warning(
+                f"Slow client: {self.num_coalesced} messages coalesced and {self.num_dropped} dropped"
+            )
+
+    def send(self, data: dict):
+        """Queue a message for the client without waiting for it to be sent."""
+        if len(self.outbox) >= WS_SEND_QUEUE_SIZE and not self.__is_critical(data):
+            last = self.outbox[-1]
+            if (
+                not self.__is_critical(last)
+                and last["type"] == data["type"]
+                and last.get("tool_name") == data.get("tool_name")
+            ):
+                last["content"] += "\n\n" + data["content"]
+                self.num_coalesced += 1
+                self.outbox_event.set()
+                return
+
+            # Make room by dropping the oldest intermediate message
+            oldest = next(
+                (item for item in self.outbox if not self.__is_critical(item)), None
+            )
+            if oldest is None:
+                self.num_dropped += 1
+                return
+            self.outbox.remove(oldest)
+            self.num_dropped += 1
+
+        self.outbox.append(data)
+        self.outbox_event.set()
+
+    async def receive(self) -> dict | None:
+        """Receive the next message, or None if the client disconnected."""
+        return await self.inbox.get()
+
+    def __is_critical(self, data: dict) -> bool:
+        return data.get("type") in self.critical_types
+
+    async def __send_loop(self):
+        try:
+            while True:
+                while not self.outbox:
+                    self.outbox_event.clear()
+                    await self.outbox_event.wait()
+                await self.websocket.send_json(self.outbox.popleft())
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.warning(f"Stopped sending messages to the client: {e}")
+
+    async def __receive_loop(self):
+        try:
+            while True:
+                await self.inbox.put(await self.websocket.receive_json())
+        except asyncio.CancelledError:
+            raise
+        except WebSocketDisconnect:
+            logger.info("Client disconnected")
+        except Exception as e:
+            logger.error(f"Error receiving messages from the client: {e}")
+        await self.inbox.put(None)
 
 
 class WebSocketManager:
     """Manages WebSocket connections."""
 
     def __init__(self):
-        self.active_connections: list[WebSocket] = []
+        self.active_connections: list[WebSocketConnection] = []
         self.lock = asyncio.Lock()
 
-    async def connect(self, websocket: WebSocket):
+    async def connect(self, websocket: WebSocket) -> WebSocketConnection:
         """Accepts the WebSocket connection and adds it to the active connections."""
         await websocket.accept()
+        connection = WebSocketConnection(websocket)
+        connection.start()
         async with self.lock:
-            self.active_connections.append(websocket)
+            self.active_connections.append(connection)
+        WS_ACTIVE_SESSIONS.inc()
+        return connection
 
-    async def disconnect(self, websocket: WebSocket):
+    async def disconnect(self, connection: WebSocketConnection):
         """Removes the WebSocket connection from the active connections."""
+        await connection.close()
         try:
             async with self.lock:
-                self.active_connections.remove(websocket)
+                self.active_connections.remove(connection)
+            WS_ACTIVE_SESSIONS.dec()
         except ValueError:
             logger.warning(f"Attempted to remove non-existent WebSocket connection")
-
-    async def send_message(self, data: dict, websocket: WebSocket):
-        """Sends data to a specific WebSocket connection."""
-        await websocket.send_json(data)
-
-    async def receive_message(self, websocket: WebSocket) -> dict:
-        """Receives data from a specific WebSocket connection."""
-        return await websocket.receive_json()
@@ -0,0 +1,41 @@
+import os
+
+import fakeredis
+import pytest
+import redis
+import redis.asyncio
+
+# The backend reads its configuration on import
+os.environ.setdefault("OPENAI_API_KEY", "test")
+os.environ.setdefault("REDIS_URL", "redis://localhost:6379")
+os.environ.setdefault("NEXTAUTH_SECRET", "test")
+os.environ.setdefault("FRONTEND_URL", "http://localhost:3000")
+os.environ.pop("PROMETHEUS_MULTIPROC_DIR", None)
+
+from nexusai.cache.connection import get_async_redis_client, get_redis_client
+
+
+@pytest.fixture(autouse=True)
+def redis_server(monkeypatch) -> fakeredis.FakeServer:
+    """Serve the Redis clients of the backend from an in-memory server, empty for each test."""
+    server = fakeredis.FakeServer()
+    monkeypatch.setattr(
+        redis.Redis,
+        "from_url",
+        lambda url, **kwargs: fakeredis.FakeRedis(server=server, **kwargs),
+    )
+    monkeypatch.setattr(
+        redis.asyncio.Redis,
+        "from_url",
+        lambda url, **kwargs: fakeredis.FakeAsyncRedis(server=server, **kwargs),
+    )
+    get_redis_client.cache_clear()
+    get_async_redis_client.cache_clear()
+    yield server
+    get_redis_client.cache_clear()
+    get_async_redis_client.cache_clear()
+
+
+@pytest.fixture
+def redis_client(redis_server) -> redis.Redis:
+    return get_redis_client()
@@ -0,0 +1,87 @@
+from langgraph.checkpoint.base import empty_checkpoint
+from nexusai.cache.checkpointer import RedisCheckpointSaver
+from nexusai.config import (
+    CHECKPOINT_MAX_BYTES,
+    CHECKPOINT_MAX_PER_RUN,
+    CHECKPOINT_TTL,
+)
+
+
+def config(thread_id: str, checkpoint_id: str | None = None) -> dict:
+    configurable = {"thread_id": thread_id, "checkpoint_ns": ""}
+    if checkpoint_id:
+        configurable["checkpoint_id"] = checkpoint_id
+    return {"configurable": configurable}
+
+
+def put(saver: RedisCheckpointSaver, thread_id: str, parent: str | None = None):
+    checkpoint = empty_checkpoint()
+    return saver.put(config(thread_id, parent), checkpoint, {"step": 0}, {})
+
+
+def test_put_and_resume_the_latest_checkpoint():
+    saver = RedisCheckpointSaver()
+    first = put(saver, "user:session:run")
+    saver.put_writes(first, [("messages", "hello")], "task")
+    second = put(saver, "user:session:run", first["configurable"]["checkpoint_id"])
+
+    latest = saver.get_tuple(config("user:session:run"))
+    assert latest.config == second
+    assert latest.parent_config == first
+    assert saver.get_tuple(first).pending_writes == [("task", "messages", "hello")]
+    assert saver.get_tuple(config("other:session:run")) is None
+
+
+def test_only_the_latest_checkpoints_are_kept(redis_client):
+    saver = RedisCheckpointSaver()
+    configs = [put(saver, "thread") for _ in range(CHECKPOINT_MAX_PER_RUN + 3)]
+
+    kept = [item.config for item in saver.list(config("thread"))]
+    assert len(kept) == CHECKPOINT_MAX_PER_RUN
+    assert configs[-1] in kept and configs[0] not in kept
+    assert saver.get_tuple(configs[0]) is None
+    assert len(redis_client.keys("checkpoint:thread:*")) == CHECKPOINT_MAX_PER_RUN + 1
+
+
+def test_keys_expire(redis_client):
+    saver = RedisCheckpointSaver()
+    checkpoint = put(saver, "thread")
+    saver.put_writes(checkpoint, [("messages", "hello")], "task")
+
+    keys = redis_client.keys("checkpoint:thread:*")
+    assert len(keys) == 3
+    assert all(0 < redis_client.ttl(key) <= CHECKPOINT_TTL for key in keys)
+
+
+def test_delete_thread(redis_client):
+    saver = RedisCheckpointSaver()
+    checkpoint = put(saver, "thread")
+    saver.put_writes(checkpoint, [("messages", "hello")], "task")
+    put(saver, "other")
+
+    saver.delete_thread("thread")
+    assert not redis_client.keys("checkpoint:thread:*")
+    assert saver.get_tuple(config("other")) is not None
+
+
+def test_oversized_checkpoints_are_skipped(monkeypatch):
+    monkeypatch.setattr("nexusai.cache.checkpointer.CHECKPOINT_MAX_BYTES", 1)
+    saver = RedisCheckpointSaver()
+    put(saver, "thread")
+    assert saver.get_tuple(config("thread")) is None
+
+
+def test_skipped_checkpoints_keep_the_parents_resolvable(monkeypatch):
+    saver = RedisCheckpointSaver()
+    first = put(saver, "thread")
+    monkeypatch.setattr("nexusai.cache.checkpointer.CHECKPOINT_MAX_BYTES", 1)
+    skipped = put(saver, "thread", first["configurable"]["checkpoint_id"])
+    assert skipped == first
+    monkeypatch.setattr(
+        "nexusai.cache.checkpointer.CHECKPOINT_MAX_BYTES", CHECKPOINT_MAX_BYTES
+    )
+
+    third = put(saver, "thread", skipped["configurable"]["checkpoint_id"])
+    latest = saver.get_tuple(third)
+    assert latest.parent_config == first
+    assert saver.get_tuple(latest.parent_config) is not None
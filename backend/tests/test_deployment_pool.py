@@ -0,0 +1,94 @@
+import asyncio
+
+import httpx
+import pytest
+from nexusai.llm.pool import Deployment, DeploymentPool
+from openai import APIConnectionError, RateLimitError
+
+REQUEST = httpx.Request("POST", "https://llm.test/chat/completions")
+
+
+def rate_limit_error(retry_after: str) -> RateLimitError:
+    response = httpx.Response(
+        429, request=REQUEST, headers={"retry-after": retry_after}
+    )
+    return RateLimitError("Rate limited", response=response, body=None)
+
+
+def pool(*names: str, weights: dict[str, float] = {}, **kwargs) -> DeploymentPool:
+    return DeploymentPool(
+        "test",
+        [
+            Deployment(name, client=None, weight=weights.get(name, 1.0))
+            for name in names
+        ],
+        hedge=False,
+        **kwargs,
+    )
+
+
+def test_requests_go_to_the_least_loaded_deployment():
+    deployments = pool("a", "b", weights={"b": 2.0})
+    picked = [deployments.acquire().name for _ in range(6)]
+    assert picked.count("a") == 2 and picked.count("b") == 4
+
+
+def test_failover_on_rate_limits_and_connection_errors():
+    deployments = pool("a", "b", "c")
+    calls = []
+
+    async def call(deployment: Deployment) -> str:
+        calls.append(deployment.name)
+        if deployment.name == "a":
+            raise rate_limit_error("30")
+        if deployment.name == "b":
+            raise APIConnectionError(request=REQUEST)
+        return deployment.name
+
+    assert asyncio.run(deployments.acall(call)) == "c"
+    assert calls == ["a", "b", "c"]
+    assert [deployment.is_healthy for deployment in deployments.deployments] == [
+        False,
+        False,
+        True,
+    ]
+    assert all(deployment.outstanding == 0 for deployment in deployments.deployments)
+
+    # Unhealthy deployments are skipped by the next requests
+    calls.clear()
+    assert asyncio.run(deployments.acall(call)) == "c"
+    assert calls == ["c"]
+
+
+def test_other_errors_are_raised_without_failover():
+    deployments = pool("a", "b")
+    calls = []
+
+    def call(deployment: Deployment) -> str:
+        calls.append(deployment.name)
+        raise ValueError("Invalid request")
+
+    with pytest.raises(ValueError):
+        deployments.call(call)
+    assert calls == ["a"]
+    assert deployments.deployments[0].is_healthy
+
+
+def test_attempts_are_bounded():
+    deployments = pool("a", "b", max_attempts=3)
+    calls = []
+
+    def call(deployment: Deployment) -> str:
+        calls.append(deployment.name)
+        raise APIConnectionError(request=REQUEST)
+
+    with pytest.raises(APIConnectionError):
+        deployments.call(call)
+    assert calls == ["a", "b", "a"]
+
+
+def test_the_deployment_recovering_first_is_used_when_all_fail():
+    deployments = pool("a", "b")
+    deployments.release(deployments.acquire(), rate_limit_error("60"))
+    deployments.release(deployments.acquire(), rate_limit_error("5"))
+    assert deployments.acquire().name == "b"
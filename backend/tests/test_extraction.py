@@ -0,0 +1,69 @@
+import pytest
+from benchmarks.fixtures import make_html, make_paper
+from nexusai.utils.extraction import extract_html_text
+
+PARSERS = ["lxml", "html.parser"]
+
+
+@pytest.fixture(scope="module")
+def paper() -> dict:
+    return make_paper("extraction", 4)
+
+
+@pytest.mark.parametrize("parser", PARSERS)
+def test_publisher_pages_keep_the_article(paper, parser):
+    text = extract_html_text(make_html(paper).decode(), parser=parser)
+    lines = text.splitlines()
+    assert lines[0] == paper["title"]
+    for name, paragraphs in paper["sections"]:
+        assert name in lines
+        assert paragraphs[0] in lines
+    assert "References" not in lines
+    assert paper["references"][0] not in text
+    assert "Related articles" not in text
+    assert "Copyright" not in text
+    assert "window.analytics" not in text
+
+
+@pytest.mark.parametrize("parser", PARSERS)
+def test_full_pages_keep_everything_but_scripts(paper, parser):
+    text = extract_html_text(
+        make_html(paper).decode(), main_content=False, parser=parser
+    )
+    assert paper["references"][0] in text
+    assert "Copyright" in text
+    assert "window.analytics" not in text
+
+
+@pytest.mark.parametrize("parser", PARSERS)
+def test_headers_and_forms_inside_the_content_are_kept(parser):
+    paragraph = "The method improves retrieval accuracy on every benchmark. " * 20
+    html = (
+        "<html><body><header><a href='/'>Publisher</a> Sign in</header>"
+        "<form id='aspnetForm'><div class='page'>"
+        f"<header><h1>Paper title</h1><p>A. Author</p></header><p>{paragraph}</p>"
+        f"<section><header><h2>2 Method</h2></header><p>{paragraph}</p></section>"
+        "</div></form></body></html>"
+    )
+    lines = extract_html_text(html, parser=parser).splitlines()
+    assert lines[:2] == ["Paper title", "A. Author"]
+    assert "2 Method" in lines
+    assert "Sign in" not in lines
+
+
+@pytest.mark.parametrize("parser", PARSERS)
+def test_pages_left_almost_empty_keep_their_text(parser):
+    paragraph = "The method improves retrieval accuracy on every benchmark. " * 20
+    html = (
+        "<html><body><nav>Home</nav>"
+        f"<div class='content social-share-enabled'><h1>Paper title</h1><p>{paragraph}</p></div>"
+        "</body></html>"
+    )
+    text = extract_html_text(html, parser=parser)
+    assert "Paper title" in text and paragraph.strip() in text
+
+
+@pytest.mark.parametrize("parser", PARSERS)
+def test_empty_pages(parser):
+    assert extract_html_text("", parser=parser) == ""
+    assert extract_html_text("<html><body></body></html>", parser=parser) == ""
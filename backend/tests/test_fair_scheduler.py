@@ -0,0 +1,92 @@
+import asyncio
+from collections import Counter
+
+import pytest
+import server.utils
+from fastapi import HTTPException
+from nexusai.config import SCHEDULER_WEIGHTS
+from nexusai.scheduling.fair_scheduler import FairScheduler, Priority, run_scheduler
+from server.server import http_get_scheduler
+
+
+async def serve(scheduler: FairScheduler, requests: list[tuple[str, Priority]]):
+    """Queue the requests behind a held slot, returning the order in which they are served."""
+    served = []
+
+    async def request(user_id: str, priority: Priority):
+        async with scheduler.slot(user_id, priority):
+            served.append((user_id, priority))
+            await asyncio.sleep(0)
+
+    await scheduler.acquire("holder", Priority.interactive)
+    tasks = [asyncio.create_task(request(*item)) for item in requests]
+    await asyncio.sleep(0)
+    scheduler.release()
+    await asyncio.gather(*tasks)
+    return served
+
+
+def test_users_are_served_in_turn():
+    requests = [("greedy", Priority.interactive)] * 6 + [
+        ("alice", Priority.interactive),
+        ("bob", Priority.interactive),
+    ]
+    served = asyncio.run(serve(FairScheduler("test", 1), requests))
+    # The other users do not wait behind all the requests of the greedy user
+    assert [user for user, _ in served[:3]] == ["greedy", "alice", "bob"]
+
+
+def test_slots_are_shared_by_priority_weight():
+    requests = [("alice", Priority.bulk)] * 20 + [("alice", Priority.interactive)] * 20
+    served = asyncio.run(serve(FairScheduler("test", 1), requests))
+    window = Counter(priority for _, priority in served[:10])
+    ratio = SCHEDULER_WEIGHTS["interactive"] / SCHEDULER_WEIGHTS["bulk"]
+    assert window[Priority.bulk] >= 1
+    assert abs(window[Priority.interactive] / window[Priority.bulk] - ratio) <= 1
+
+
+def test_queue_depths_and_cancellation():
+    async def run():
+        scheduler = FairScheduler("test", 1)
+        await scheduler.acquire("holder", Priority.interactive)
+        waiting = asyncio.create_task(scheduler.acquire("alice", Priority.bulk))
+        await asyncio.sleep(0)
+        assert scheduler.queue_depths() == {("alice", Priority.bulk): 1}
+
+        waiting.cancel()
+        await asyncio.sleep(0)
+        assert scheduler.queue_depths() == {}
+        scheduler.release()
+        assert scheduler.in_use == 0
+
+    asyncio.run(run())
+
+
+def test_queue_depths_are_exposed_to_admins(monkeypatch):
+    monkeypatch.setattr(server.utils, "ADMIN_API_KEY", "secret")
+    monkeypatch.setattr(run_scheduler, "capacity", 1)
+
+    async def run():
+        with pytest.raises(HTTPException):
+            await http_get_scheduler(x_admin_key="wrong")
+
+        await run_scheduler.acquire("holder", Priority.interactive)
+        tasks = [
+            asyncio.create_task(run_scheduler.acquire(user_id, Priority.interactive))
+            for user_id in ["greedy", "greedy", "alice"]
+        ]
+        await asyncio.sleep(0)
+        stats = await http_get_scheduler(x_admin_key="secret")
+        assert stats["runs"]["in_use"] == 1
+        assert stats["runs"]["queues"] == [
+            {"user_id": "greedy", "priority": Priority.interactive, "depth": 2},
+            {"user_id": "alice", "priority": Priority.interactive, "depth": 1},
+        ]
+        assert stats["tools"]["queues"] == []
+
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        run_scheduler.release()
+
+    asyncio.run(run())
@@ -0,0 +1,106 @@
+import asyncio
+import time
+from types import SimpleNamespace
+
+import pytest
+from nexusai.config import LLM_MAX_CONCURRENCY
+from nexusai.llm.governor import RateLimitGovernor
+
+
+@pytest.fixture
+def frozen_window(monkeypatch):
+    """Keep the requests of a test in the same minute window."""
+    now = time.time()
+    monkeypatch.setattr(
+        "nexusai.llm.governor.time",
+        SimpleNamespace(time=lambda: now, perf_counter=time.perf_counter),
+    )
+
+
+def test_requests_within_the_quotas_are_admitted(redis_client, frozen_window):
+    async def run():
+        governor = RateLimitGovernor(
+            "gpt", tokens_per_minute=1000, requests_per_minute=2
+        )
+        first = await governor.acquire(300)
+        await governor.release(first, 500)
+        await governor.acquire(300)
+        assert governor.in_flight == 1
+
+        # The requests per minute are used up
+        with pytest.raises(TimeoutError):
+            await asyncio.wait_for(governor.acquire(100), 0.2)
+        assert governor.in_flight == 1
+        window = first.window
+        assert int(redis_client.get(f"ratelimit:gpt:{window}:tokens")) == 800
+        assert int(redis_client.get(f"ratelimit:gpt:{window}:requests")) == 2
+
+    asyncio.run(run())
+
+
+def test_requests_above_the_tokens_per_minute_wait(frozen_window):
+    async def run():
+        governor = RateLimitGovernor(
+            "gpt", tokens_per_minute=1000, requests_per_minute=100
+        )
+        await governor.acquire(900)
+        with pytest.raises(TimeoutError):
+            await asyncio.wait_for(governor.acquire(200), 0.2)
+
+    asyncio.run(run())
+
+
+def test_rate_limits_block_every_worker():
+    async def run():
+        governor = RateLimitGovernor(
+            "gpt", tokens_per_minute=1000, requests_per_minute=100
+        )
+        await governor.throttle(retry_after=0.3)
+
+        other_worker = RateLimitGovernor("gpt", 1000, 100)
+        start = time.perf_counter()
+        await other_worker.acquire(100)
+        assert time.perf_counter() - start >= 0.2
+
+    asyncio.run(run())
+
+
+def test_concurrency_is_adapted_aimd():
+    async def run():
+        governor = RateLimitGovernor(
+            "gpt", tokens_per_minute=10**6, requests_per_minute=10**6
+        )
+        assert governor.concurrency == LLM_MAX_CONCURRENCY
+
+        # Halved on every 429
+        for _ in range(3):
+            await governor.acquire(10)
+            await governor.throttle(retry_after=0.001)
+        assert governor.concurrency == LLM_MAX_CONCURRENCY / 8
+        await asyncio.sleep(0.01)
+
+        # Grows back by one request per round of successful calls
+        concurrency = governor.concurrency
+        for _ in range(int(concurrency)):
+            await governor.release(await governor.acquire(10), None)
+        assert governor.concurrency == pytest.approx(concurrency + 1, abs=0.1)
+
+    asyncio.run(run())
+
+
+def test_in_flight_requests_are_bounded_by_the_concurrency():
+    async def run():
+        governor = RateLimitGovernor(
+            "gpt", tokens_per_minute=10**6, requests_per_minute=10**6
+        )
+        governor.concurrency = 2.0
+        await governor.acquire(10)
+        await governor.acquire(10)
+        with pytest.raises(TimeoutError):
+            await asyncio.wait_for(governor.acquire(10), 0.1)
+
+        await governor.discard()
+        await asyncio.wait_for(governor.acquire(10), 0.1)
+        assert governor.in_flight == 2
+
+    asyncio.run(run())
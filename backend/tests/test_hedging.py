@@ -0,0 +1,71 @@
+import asyncio
+
+from langchain_core.messages import AIMessage, HumanMessage
+from nexusai.llm.pool import Deployment, DeploymentPool, PooledLLM
+from nexusai.utils.limits import ResourceLimiter
+
+
+class FakeLLM:
+    def __init__(self, name: str, latency: float, calls: list[str]):
+        self.name = name
+        self.latency = latency
+        self.calls = calls
+
+    async def ainvoke(self, messages) -> AIMessage:
+        self.calls.append(self.name)
+        await asyncio.sleep(self.latency)
+        return AIMessage(content=self.name)
+
+
+def pooled_llm(latencies: dict[str, float], calls: list[str]) -> PooledLLM:
+    return PooledLLM(
+        DeploymentPool(
+            "test",
+            [
+                Deployment(name, client=FakeLLM(name, latency, calls))
+                for name, latency in latencies.items()
+            ],
+        )
+    )
+
+
+def test_slow_calls_are_hedged_on_another_deployment(monkeypatch):
+    monkeypatch.setattr("nexusai.llm.pool.get_hedge_delay", lambda node, timeout: 0.1)
+    calls = []
+    llm = pooled_llm({"slow": 1.0, "fast": 0.01}, calls)
+
+    result = asyncio.run(llm.ainvoke([HumanMessage("Hi")], node="test"))
+    assert result.content == "fast"
+    assert calls == ["slow", "fast"]
+
+
+def test_calls_are_not_hedged_on_the_same_deployment(monkeypatch):
+    monkeypatch.setattr("nexusai.llm.pool.get_hedge_delay", lambda node, timeout: 0.1)
+    calls = []
+    llm = pooled_llm({"slow": 0.3}, calls)
+
+    result = asyncio.run(llm.ainvoke([HumanMessage("Hi")], node="test"))
+    assert result.content == "slow"
+    assert calls == ["slow"]
+
+
+def test_waiting_for_a_slot_does_not_trigger_hedges(monkeypatch):
+    monkeypatch.setattr("nexusai.llm.pool.get_hedge_delay", lambda node, timeout: 0.1)
+    limiter = ResourceLimiter("llm", 1)
+    monkeypatch.setattr("nexusai.llm.pool.llm_limiter", limiter)
+    calls = []
+    llm = pooled_llm({"a": 0.05, "b": 0.05}, calls)
+
+    async def run():
+        async def hold_slot():
+            async with limiter:
+                await asyncio.sleep(0.3)
+
+        holder = asyncio.create_task(hold_slot())
+        await asyncio.sleep(0)
+        result = await llm.ainvoke([HumanMessage("Hi")], node="test")
+        await holder
+        return result
+
+    assert asyncio.run(run()).content == "a"
+    assert calls == ["a"]
@@ -0,0 +1,51 @@
+import threading
+
+from langchain_core.embeddings import Embeddings
+from nexusai.config import MAX_PAGES
+from nexusai.llm.pool import Deployment, DeploymentPool, PooledEmbeddings
+from nexusai.tools.paper_downloader import PaperDownloader
+
+
+class FakeEmbeddings(Embeddings):
+    """Embeds texts by their word counts. Its async methods fail, like a client used from another loop."""
+
+    words = ["retrieval", "model", "benchmark", "appendix"]
+
+    def embed_documents(self, texts: list[str]) -> list[list[float]]:
+        return [self.embed_query(text) for text in texts]
+
+    def embed_query(self, text: str) -> list[float]:
+        return [float(text.count(word)) + 0.01 for word in self.words]
+
+    async def aembed_documents(self, texts: list[str]) -> list[list[float]]:
+        raise RuntimeError("Event loop is closed")
+
+
+def test_pages_are_filtered_from_concurrent_threads(monkeypatch):
+    pool = DeploymentPool("embedding", [Deployment("embedding", FakeEmbeddings())])
+    monkeypatch.setattr(
+        "nexusai.tools.paper_downloader.get_embeddings", lambda: PooledEmbeddings(pool)
+    )
+    pages = [f"page {i} about the model" for i in range(MAX_PAGES + 5)]
+    pages[-1] = "retrieval"
+    results, errors = [], []
+
+    def download():
+        try:
+            downloader = PaperDownloader("retrieval")
+            results.append(downloader._PaperDownloader__filter_pages(pages))
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=download) for _ in range(2)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert not errors
+    assert len(results) == 2
+    for filtered in results:
+        assert len(filtered) == MAX_PAGES
+        assert filtered[-1] == pages[-1]
+    assert pool.deployments[0].outstanding == 0
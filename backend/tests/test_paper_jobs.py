@@ -0,0 +1,119 @@
+import asyncio
+import time
+
+import pytest
+from nexusai.jobs.paper_jobs import PaperJobQueue, PaperWorkerPool
+from nexusai.models.jobs import PaperJobItem, PaperJobStatus
+from nexusai.models.outputs import PaperOutput
+from pydantic import ValidationError
+from server.models import PaperJobRequest
+
+
+def test_jobs_are_only_visible_to_their_owner():
+    async def run():
+        queue = PaperJobQueue()
+        job_id = await queue.submit(["https://arxiv.org/abs/1234.5678"], "alice")
+        assert (await queue.get(job_id, "alice")).items[0].url == (
+            "https://arxiv.org/pdf/1234.5678"
+        )
+        assert await queue.get(job_id, "mallory") is None
+        assert await queue.get(job_id) is not None
+        assert await queue.get("unknown", "alice") is None
+
+    asyncio.run(run())
+
+
+def test_empty_batches_are_rejected(redis_client):
+    with pytest.raises(ValueError):
+        asyncio.run(PaperJobQueue().submit([], "alice"))
+    assert not redis_client.keys("jobs:*")
+    with pytest.raises(ValidationError):
+        PaperJobRequest(urls=[])
+
+
+def test_entries_are_leased_in_order():
+    async def run():
+        queue = PaperJobQueue()
+        job_id = await queue.submit(["https://a.org", "https://b.org"], "alice")
+        first, data = await queue.next()
+        assert data == {"job_id": job_id, "url": "https://a.org", "user_id": "alice"}
+        assert (await queue.next())[1]["url"] == "https://b.org"
+        assert await queue.next(timeout=0.1, poll_interval=0.05) is None
+
+        await queue.done(first)
+        assert await queue.redis.llen(queue.processing_key) == 1
+
+    asyncio.run(run())
+
+
+def test_expired_leases_are_requeued(redis_client):
+    async def run():
+        queue = PaperJobQueue()
+        await queue.submit(["https://a.org"], "alice")
+        entry, _ = await queue.next()
+        assert await queue.requeue_expired() == 0
+
+        # The worker stopped without finishing the entry
+        redis_client.zadd(queue.leases_key, {entry: 0})
+        assert await queue.requeue_expired() == 1
+        assert not await queue.renew(entry)
+        assert await queue.redis.llen(queue.processing_key) == 0
+        assert (await queue.next())[0] == entry
+
+    asyncio.run(run())
+
+
+def test_leases_are_renewed(redis_client):
+    async def run():
+        queue = PaperJobQueue()
+        await queue.submit(["https://a.org"], "alice")
+        entry, _ = await queue.next()
+        redis_client.zadd(queue.leases_key, {entry: time.time() + 1})
+        assert await queue.renew(entry)
+        assert await queue.requeue_expired() == 0
+        assert redis_client.zscore(queue.leases_key, entry) > time.time() + 1
+
+    asyncio.run(run())
+
+
+def test_watch_yields_finished_items():
+    async def run():
+        queue = PaperJobQueue()
+        job_id = await queue.submit(["https://a.org", "https://b.org"], "alice")
+        await queue.update(
+            job_id, PaperJobItem(url="https://a.org", status=PaperJobStatus.failed)
+        )
+        await queue.update(
+            job_id, PaperJobItem(url="https://b.org", status=PaperJobStatus.failed)
+        )
+        items = [item async for item in queue.watch(job_id, poll_interval=0.01)]
+        assert {item.url for item in items} == {"https://a.org", "https://b.org"}
+
+    asyncio.run(run())
+
+
+def test_workers_renew_the_leases_of_slow_papers(monkeypatch):
+    monkeypatch.setattr("nexusai.jobs.paper_jobs.JOBS_LEASE_TIMEOUT", 0.3)
+
+    async def process_paper(url: str) -> PaperOutput:
+        await asyncio.sleep(1)
+        return PaperOutput(title="Title", authors="Authors", summary="Summary", url=url)
+
+    monkeypatch.setattr("nexusai.chat.process_paper", process_paper)
+
+    async def run():
+        queue = PaperJobQueue()
+        job_id = await queue.submit(["https://a.org"], "alice")
+        pool = PaperWorkerPool(num_workers=1)
+        pool.start()
+        try:
+            for _ in range(8):
+                await asyncio.sleep(0.15)
+                assert await queue.requeue_expired() == 0
+            job = await queue.get(job_id)
+            assert job.status == PaperJobStatus.completed
+            assert job.items[0].attempts == 1
+        finally:
+            await pool.stop()
+
+    asyncio.run(run())
@@ -0,0 +1,39 @@
+import asyncio
+import json
+
+from nexusai.models.outputs import PaperOutput
+from server.server import stream_papers
+
+
+def test_each_url_sent_gets_its_own_line(monkeypatch):
+    processed = []
+
+    async def process_paper(url: str) -> PaperOutput | None:
+        processed.append(url)
+        if "missing" in url:
+            return None
+        return PaperOutput(title="Title", authors="Authors", summary="Summary", url=url)
+
+    monkeypatch.setattr("nexusai.chat.process_paper", process_paper)
+
+    async def run() -> list[dict]:
+        urls = [
+            "https://arxiv.org/abs/1234.5678",
+            "https://arxiv.org/pdf/1234.5678/",
+            "https://example.com/missing",
+        ]
+        return [json.loads(line) async for line in stream_papers(urls, "alice")]
+
+    items = sorted(asyncio.run(run()), key=lambda item: item["url"])
+    assert sorted(processed) == [
+        "https://arxiv.org/pdf/1234.5678",
+        "https://example.com/missing",
+    ]
+    assert [item["url"] for item in items] == [
+        "https://arxiv.org/abs/1234.5678",
+        "https://arxiv.org/pdf/1234.5678/",
+        "https://example.com/missing",
+    ]
+    assert items[0]["canonical_url"] == items[1]["canonical_url"]
+    assert items[0]["paper"] == items[1]["paper"]
+    assert items[2]["error"] == "Failed to download the paper"
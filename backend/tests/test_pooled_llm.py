@@ -0,0 +1,68 @@
+import asyncio
+
+import pytest
+from langchain_core.exceptions import OutputParserException
+from langchain_core.messages import AIMessage, HumanMessage
+from langchain_core.runnables import RunnableLambda
+from nexusai.llm.governor import RateLimitGovernor
+from nexusai.llm.pool import Deployment, DeploymentPool, PooledLLM
+from pydantic import BaseModel
+
+USAGE = {"input_tokens": 120, "output_tokens": 30, "total_tokens": 150}
+
+
+class Answer(BaseModel):
+    text: str
+
+
+class FakeStructuredLLM:
+    """Answers with a tool call parsed into the schema, like the OpenAI chat models."""
+
+    def __init__(self, parsing_error: Exception | None = None):
+        self.parsing_error = parsing_error
+
+    def with_structured_output(self, schema, include_raw: bool = False):
+        assert include_raw
+
+        async def invoke(messages) -> dict:
+            return {
+                "raw": AIMessage(content="", usage_metadata=USAGE),
+                "parsed": None if self.parsing_error else schema(text="answer"),
+                "parsing_error": self.parsing_error,
+            }
+
+        return RunnableLambda(invoke)
+
+
+def pooled_llm(client) -> tuple[PooledLLM, RateLimitGovernor]:
+    governor = RateLimitGovernor(
+        "gpt", tokens_per_minute=10**6, requests_per_minute=100
+    )
+    deployment = Deployment("gpt", client=client, governor=governor)
+    return PooledLLM(DeploymentPool("test", [deployment], hedge=False)), governor
+
+
+def test_structured_outputs_record_their_token_usage(redis_client):
+    llm, governor = pooled_llm(FakeStructuredLLM())
+
+    async def run():
+        result = await llm.with_structured_output(Answer).ainvoke([HumanMessage("Hi")])
+        raw = await llm.with_structured_output(Answer, include_raw=True).ainvoke(
+            [HumanMessage("Hi")]
+        )
+        return result, raw
+
+    result, raw = asyncio.run(run())
+    assert result == Answer(text="answer")
+    assert raw["raw"].usage_metadata == USAGE
+    # The estimates reserved by the governor were corrected with the actual usage
+    (key,) = redis_client.keys("ratelimit:gpt:*:tokens")
+    assert int(redis_client.get(key)) == 2 * USAGE["total_tokens"]
+    assert governor.in_flight == 0
+
+
+def test_structured_output_parsing_errors_are_raised():
+    llm, governor = pooled_llm(FakeStructuredLLM(OutputParserException("Invalid")))
+    with pytest.raises(OutputParserException):
+        asyncio.run(llm.with_structured_output(Answer).ainvoke([HumanMessage("Hi")]))
+    assert governor.in_flight == 0
@@ -0,0 +1,22 @@
+from collections import Counter
+
+import pytest
+from nexusai.utils.profiler import RunProfile
+
+
+def test_profiles_are_saved_in_the_profiles_directory(tmp_path, monkeypatch):
+    monkeypatch.setattr("nexusai.utils.profiler.PROFILES_DIR", str(tmp_path))
+    for session_id in ["../../etc/passwd", "..", "/tmp/x", "a\\..\\b"]:
+        run = RunProfile(session_id, "run")
+        run.samples = Counter({"node;tool 1": 3})
+        path = run.save()
+        assert path.parent == tmp_path.resolve()
+        assert path.read_text() == "node;tool 1 3\n"
+
+
+def test_paths_outside_the_profiles_directory_are_rejected(tmp_path, monkeypatch):
+    monkeypatch.setattr("nexusai.utils.profiler.PROFILES_DIR", str(tmp_path))
+    monkeypatch.setattr(RunProfile, "name", "../escaped")
+    with pytest.raises(ValueError):
+        RunProfile("session", "run").save()
+    assert not (tmp_path.parent / "escaped.folded").exists()
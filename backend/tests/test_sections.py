@@ -0,0 +1,107 @@
+import pytest
+from benchmarks.fixtures import make_paper, make_pdf
+from nexusai.utils.extraction import (
+    extract_pdf_pages,
+    label_sections,
+    select_pages,
+)
+
+
+def labels(pages: list[str]) -> list[str]:
+    """The labels of the sections, in order and without repeats across pages."""
+    result = []
+    for parts in label_sections(pages):
+        for label, _ in parts:
+            if not result or result[-1] != label:
+                result.append(label)
+    return result
+
+
+def section_labels(*lines: str) -> list[str]:
+    return labels(["\n".join(lines)])
+
+
+@pytest.fixture(scope="module")
+def paper() -> dict:
+    return make_paper("sections", 6)
+
+
+@pytest.fixture(scope="module")
+def pdf_pages(paper) -> list[str]:
+    return extract_pdf_pages(make_pdf(paper))
+
+
+def test_paper_sections_are_labelled(pdf_pages):
+    assert labels(pdf_pages) == [
+        "front",
+        "abstract",
+        "introduction",
+        "background",
+        "methods",
+        "results",
+        "discussion",
+        "conclusion",
+        "references",
+        "appendix",
+    ]
+
+
+def test_references_and_appendix_are_dropped(paper, pdf_pages):
+    pages = select_pages(label_sections(pdf_pages))
+    text = "\n".join(pages)
+    assert paper["title"] in text
+    assert paper["sections"][-1][1][-1].split()[-1] in text
+    assert "References" not in text.splitlines()
+    assert paper["appendix"][0][0] not in text
+    assert len(pages) < len(pdf_pages)
+    assert len(text) < 0.8 * sum(len(page) for page in pdf_pages)
+
+
+def test_all_sections_are_kept_when_too_little_would_be_left(paper):
+    # A heading misread at the start of the paper labels all the text as references
+    paragraphs = [
+        paragraph for _, section in paper["sections"] for paragraph in section
+    ]
+    pages = ["References\n" + paragraphs[0]] + paragraphs[1:]
+    assert select_pages(label_sections(pages)) == pages
+
+
+def test_appendix_headings():
+    for heading in ["Appendix", "APPENDIX", "Appendix B", "Appendix B: Proofs"]:
+        assert section_labels("1 Introduction", "Text", heading, "Text") == [
+            "introduction",
+            "appendix",
+        ]
+    for line in ["Appendix B shows that the method converges", "Appendix shows"]:
+        assert section_labels("1 Introduction", line) == ["introduction"]
+
+
+def test_numbered_headings_after_the_references_start_the_appendix():
+    assert section_labels(
+        "6 Conclusion", "References", "[1] A. Author.", "7 Proofs", "Text"
+    ) == ["conclusion", "references", "appendix"]
+    assert section_labels(
+        "References",
+        "[1] A. Author.",
+        "A Proofs",
+        "Text",
+        "B Additional Experiments",
+        "8 Extensions",
+    ) == ["references", "appendix", "body"]
+
+
+def test_ambiguous_words_only_start_sections_when_numbered():
+    for word in ["Model", "Analysis", "Summary"]:
+        assert section_labels("1 Introduction", word, "Text") == ["introduction"]
+    assert section_labels("1 Introduction", "3 Model", "4 Analysis", "5 Summary") == [
+        "introduction",
+        "methods",
+        "discussion",
+        "conclusion",
+    ]
+
+
+def test_long_lines_are_not_headings():
+    assert section_labels(
+        "1 Introduction", "Results of the experiments on all the benchmarks"
+    ) == ["introduction"]
@@ -0,0 +1,94 @@
+import asyncio
+
+from nexusai.cache.session_store import SessionStore
+from nexusai.config import SESSION_MAX_MESSAGES, SESSION_MAX_RUNS
+from nexusai.models.outputs import AgentMessage, AgentMessageType
+
+
+def message(order: int) -> AgentMessage:
+    return AgentMessage(order=order, type=AgentMessageType.human, content=f"{order}")
+
+
+def test_sessions_are_namespaced_by_user():
+    async def run():
+        await SessionStore("session", "alice").append(message(0))
+        assert await SessionStore("session", "alice").length() == 1
+        assert await SessionStore("session", "mallory").length() == 0
+
+        await SessionStore("session", "alice").start_run("query")
+        _, resumed = await SessionStore("session", "mallory").start_run("query")
+        assert not resumed
+
+    asyncio.run(run())
+
+
+def test_append_keeps_the_latest_messages():
+    async def run():
+        session = SessionStore("session", "alice")
+        await session.append(*[message(i) for i in range(SESSION_MAX_MESSAGES + 5)])
+        assert await session.length() == SESSION_MAX_MESSAGES
+        loaded = await session.load(limit=1)
+        assert loaded[0].order == SESSION_MAX_MESSAGES + 4
+
+    asyncio.run(run())
+
+
+def test_seed_only_fills_empty_sessions():
+    async def run():
+        session = SessionStore("session", "alice")
+        assert await session.seed([message(0), message(1)])
+        assert not await session.seed([message(2)])
+        assert [m.order for m in await session.load()] == [0, 1]
+
+    asyncio.run(run())
+
+
+def test_interrupted_runs_resume_until_finished():
+    async def run():
+        session = SessionStore("session", "alice")
+        run_id, resumed = await session.start_run("query")
+        assert not resumed
+        await session.finish_run(run_id, completed=False)
+        assert await session.start_run("query") == (run_id, True)
+        await session.finish_run(run_id)
+        assert (await session.start_run("query"))[1] is False
+
+    asyncio.run(run())
+
+
+def test_parallel_runs_are_resumed_separately():
+    async def run():
+        # Two queries run in parallel, then the connection drops
+        session = SessionStore("session", "alice")
+        first, _ = await session.start_run("first")
+        second, _ = await session.start_run("second")
+        same_query, resumed = await session.start_run("first")
+        assert not resumed and same_query not in (first, second)
+
+        # After a reconnect, each run resumes under its own id
+        reconnected = SessionStore("session", "alice")
+        assert await reconnected.start_run("second") == (second, True)
+        await reconnected.finish_run(second)
+        resumed = {(await reconnected.start_run("first"))[0] for _ in range(2)}
+        assert resumed == {first, same_query}
+        assert (await reconnected.start_run("second"))[1] is False
+
+    asyncio.run(run())
+
+
+def test_only_the_latest_interrupted_runs_are_kept():
+    async def run():
+        session = SessionStore("session", "alice")
+        run_ids = []
+        for i in range(SESSION_MAX_RUNS + 2):
+            run_id, _ = await session.start_run(f"query {i}")
+            await session.finish_run(run_id, completed=False)
+            run_ids.append(run_id)
+        reconnected = SessionStore("session", "alice")
+        assert (await reconnected.start_run("query 0"))[1] is False
+        assert await reconnected.start_run(f"query {SESSION_MAX_RUNS + 1}") == (
+            run_ids[-1],
+            True,
+        )
+
+    asyncio.run(run())
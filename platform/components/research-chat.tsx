@@ -137,13 +137,16 @@ export default function ResearchChat({ researchId, initialMessage }: ChatProps)
 
     // Initialize WebSocket with token
     console.log('Initializing WebSocket')
-    ws.current = new WebSocket(`${publicConfig.wsUrl}/ws?token=${token}`)
+    // The research id doubles as the session id, so the backend can resume the conversation on reconnect
+    const sessionParam = researchId ? `&session_id=${researchId}` : ''
+    ws.current = new WebSocket(`${publicConfig.wsUrl}/ws?token=${token}${sessionParam}`)
 
     ws.current.onopen = () => {
       console.log('WebSocket connected')
       setIsConnected(true)
 
       const filteredMessages = messages.filter(m => m.type === AgentMessageType.human || m.type === AgentMessageType.final)
+      // The history only seeds new sessions, the backend ignores it if the session already exists
       console.log(`Sending ${filteredMessages.length} previous messages to ws server`)
       if (initialMessage && !initialMessageSent.current) {
         handleInitialMessage(filteredMessages)
@@ -14,9 +14,12 @@ export interface PaperOutput {
 }
 
 export interface MessageRequest {
+    // Only used to seed a new session, the backend stores the history afterwards
     history?: AgentMessage[];
     query?: string;
     custom_instructions?: string[];
     model_provider?: ModelProviderType;
     provider_details?: ProviderDetails | null;
+    // Cancel the research in progress
+    cancel?: boolean;
 }